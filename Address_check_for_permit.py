@@ -1,14 +1,26 @@
 import csv
-import requests
 import json
 import os
+import sys
 from shapely.geometry import Point, shape
+from geocode import get_census_coordinates, use_store, Deadline, known_no_match, remember_no_match
+from address_parser import canonical_address
+from address_index import AddressIndex, install_completer, pick
+from permit_store import PermitStore, polygons_hash
+from profiling import traced, start_from_argv
+from zip_table import zip_township
+from street_segments import segment_township, record_point
+from resolve_queue import provisional_township, enqueue, report_changes, RetryWorker
+from Permit_cost import census_resolver, census_township
+import warmup
+import metrics
 
 # -------------------------------
 # Config
 # -------------------------------
 BASE_DIR = r"C:\Users\cef\WHY_HVAC_Permit_Scripts"
 PERMIT_FILE = os.path.join(BASE_DIR, "Permit_fee_check.txt")
+RESOLVE_BUDGET = 3.0  # seconds per address before asking for the township
 
 POLYGONS = {
     "Williamsville": os.path.join(BASE_DIR, "williamsville.geojson"),
@@ -27,6 +39,7 @@ POLYGONS = {
 # -------------------------------
 # Utilities
 # -------------------------------
+@traced()
 def load_permit_data(txt_file):
     permit_dict = {}
     with open(txt_file, newline="", encoding="utf-8") as f:
@@ -36,6 +49,7 @@ def load_permit_data(txt_file):
             permit_dict[key] = row
     return permit_dict
 
+@traced()
 def load_polygons(polygon_map):
     loaded = {}
     for name, path in polygon_map.items():
@@ -50,35 +64,6 @@ def load_polygons(polygon_map):
             continue
     return loaded
 
-def get_census_coordinates(address):
-    url = "https://geocoding.geo.census.gov/geocoder/locations/onelineaddress"
-    params = {"address": address, "benchmark": "Public_AR_Current", "format": "json"}
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-        coords = data['result']['addressMatches'][0]['coordinates']
-        return coords['x'], coords['y']
-    except Exception:
-        return None, None
-
-def get_census_municipality(address):
-    lon, lat = get_census_coordinates(address)
-    if lon is None:
-        return None
-    geo_url = "https://geocoding.geo.census.gov/geocoder/geographies/coordinates"
-    geo_params = {"x": lon, "y": lat, "benchmark": "Public_AR_Current", "vintage": "Current_Current", "format": "json"}
-    try:
-        geo_response = requests.get(geo_url, params=geo_params, timeout=10)
-        geo_data = geo_response.json()
-        geographies = geo_data['result']['geographies']
-        if 'Places' in geographies and geographies['Places']:
-            return geographies['Places'][0]['NAME']
-        elif 'County Subdivisions' in geographies and geographies['County Subdivisions']:
-            return geographies['County Subdivisions'][0]['NAME']
-        return None
-    except Exception:
-        return None
-
 def get_work_type():
     while True:
         work = input("Enter work type (F = Furnace, AC = AC, FAC = Furnace+AC, B = Boiler): ").strip().upper()
@@ -140,17 +125,54 @@ def check_permit(township, work_type, permit_data):
 # Main Loop
 # -------------------------------
 if __name__ == "__main__":
-    permit_data = load_permit_data(PERMIT_FILE)
-    polygons = load_polygons(POLYGONS)
+    start_from_argv()  # --profile
+    refresh = "--refresh" in sys.argv  # ignore cached answers and look every address up again
+    offline_first = "--offline-first" in sys.argv  # Census down: provisional township, checked in the background
+    # Load while the first address is being typed
+    warmup.start("fee table", load_permit_data, PERMIT_FILE)
+    warmup.start("polygons", load_polygons, POLYGONS)
+    warmup.prepare_census()
+    store = PermitStore()
+    use_store(store)
+    permit_data = polygons = retry_worker = None
+    index = AddressIndex.load(store)  # addresses resolved before, for completion
+    if index and install_completer(index):
+        print(f" {len(index)} saved addresses: press Tab to complete (or end with ? to list them).")
+    elif index:
+        print(f" {len(index)} saved addresses: end what you've typed with ? to list them.")
 
     while True:
         address = input("\nAddress (or D to done): ").strip()
         if address.upper() == "D":
             break
+        if address.endswith("?"):
+            address = pick(index, address)
+            if not address:
+                continue
+        if polygons is None:
+            permit_data, polygons = warmup.get("fee table"), warmup.get("polygons")
+            polygons_key = polygons_hash(polygons)
+            known_townships = [row["Township"].strip() for row in permit_data.values()]
+            if offline_first:
+                retry_worker = RetryWorker(store, census_resolver(polygons, polygons_key, store))
+                retry_worker.start()
+
+        deadline = Deadline(RESOLVE_BUDGET)
+        lon = lat = township = None
+        if not refresh:
+            township = index.township(address, polygons_key)  # resolved before
+            if township:
+                print(f"Township (saved lookup): {township}")
+            if not township:
+                township, _ = zip_township(address, polygons_key)  # ZIP wholly inside one jurisdiction
+            if not township:
+                township, _ = segment_township(address, store, polygons_key, polygons)  # neighbours on the street
+            if not township:
+                no_match = known_no_match(address)  # Census can't place it; typed in last time
+                township = no_match[1] if no_match else None
 
-        lon, lat = get_census_coordinates(address)
-        township = None
-
+        if not township:
+            lon, lat = get_census_coordinates(address, quiet=True, deadline=deadline, refresh=refresh)
         if lon is not None and lat is not None:
             point = Point(lon, lat)
             matched_polygon_name = None
@@ -162,12 +184,43 @@ if __name__ == "__main__":
                 except Exception:
                     continue
             if matched_polygon_name:
-                township = matched_polygon_name
+                township, source = matched_polygon_name, "polygon"
             else:
-                township = get_census_municipality(address)
+                # Same rule as Permit_cost.py (County Subdivision first): the answer is saved for both
+                township, source = census_township(lon, lat, quiet=True, deadline=deadline)
+                source = f"Census {source}"
+            if township:
+                record_point(address, township, lon, lat, polygons, store, polygons_key)
+            if township and canonical_address(address):
+                store.put_township(canonical_address(address), polygons_key, township, source)
+                index.add(address, township, polygons_key)
 
         if not township:
-            township = input(" Could not determine township. Enter manually: ").strip()
+            if not deadline.allows_request():
+                reason = "out of time"
+            elif lon is None:
+                reason = "no address match" if known_no_match(address) else "geocode failed"
+            else:
+                reason = "no Census match"
+            township, guess = None, None
+            if offline_first and reason in ("out of time", "geocode failed"):
+                township, guess = provisional_township(address, store, polygons_key, known_townships)
+                if township:
+                    print(f" Census isn't answering; provisional township from the {guess}.")
+            if not township:
+                metrics.MANUAL_FALLBACKS.inc(reason)
+                township = input(" Could not determine township. Enter manually: ").strip()
+            if township and reason in ("no address match", "no Census match"):
+                remember_no_match(address, township)
+            elif offline_first and reason in ("out of time", "geocode failed"):
+                enqueue(store, None, address, township, guess)  # checked with Census once it answers
 
         work_type = get_work_type()
         check_permit(township, work_type, permit_data)
+        store.flush()
+        if retry_worker is not None:
+            report_changes(store)  # earlier provisional answers Census has since corrected
+
+    if retry_worker is not None:
+        retry_worker.stop()
+    store.close()
@@ -1,11 +1,11 @@
 import os
 import re
-import io
 from datetime import datetime
-from pdfrw import PdfReader, PdfWriter, PageMerge
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
+from pdf_output import finish_pdf
+from form_fill import fill_template, load_template, signature_image
+from job_records import iter_job_records
+from warmup import prepare_permit
+from address_parser import parse_address
 
 # --- File Locations ---
 TEMPLATE = "Cheektowaga permit.pdf"
@@ -13,127 +13,83 @@ INPUT = "Customer_data.txt"
 SIGNATURE = "signature.png"
 OUTPUT_DIR = r"\\RPIDCROOT\RedirectedFolders\cef\Desktop"
 
-# --- Read Customer Data ---
-with open(INPUT, "r") as f:
-    lines = [line.strip() for line in f if line.strip()]
-
-customer_name = lines[0]
-
-# Street address (number + street only)
-street_address_full = lines[1].split(",")[0].strip()
-
-# Zip last 3 digits
-zip_match = re.search(r"\b\d{5}\b", lines[1])
-zip_last3 = zip_match.group(0)[-3:] if zip_match else ""
-
-# Format phone number: XXX XXX-XXXX
-phone_number_raw = lines[2].replace("(", "").replace(")", "").replace(" ", "  ")
-phone_number = f"{phone_number_raw[:3]} {phone_number_raw[3:]}"  # keeps the dash in the remaining part
-
-# --- Today's Date ---
-today = datetime.today()
-month = str(today.month).zfill(2)
-day = str(today.day).zfill(2)
-year = str(today.year)[-2:]
-
 # --- Prompts ---
-estimated_cost = input("Enter estimated cost: ")
-
-boiler_input = input("Replacing a boiler? (y/n): ").strip().lower()
-boiler_check = boiler_input in ["y", "yes"]
-
-if not boiler_check:
-    furnace_check = True  # automatically yes if no boiler
-else:
-    furnace_input = input("Furnace/ductwork work? (y/n): ").strip().lower()
-    furnace_check = furnace_input in ["y", "yes"]
-
-# --- Load Template ---
-template_pdf = PdfReader(TEMPLATE)
-page0 = template_pdf.pages[0]
-try:
-    llx = float(page0.MediaBox[0])
-    lly = float(page0.MediaBox[1])
-    urx = float(page0.MediaBox[2])
-    ury = float(page0.MediaBox[3])
-    page_width_pts = urx - llx
-    page_height_pts = ury - lly
-except Exception:
-    page_width_pts, page_height_pts = letter
-
-def to_points_top_origin(x_in_inches, y_in_inches):
-    """Convert inches from top-left to PDF points (bottom-left origin)."""
-    x_pts = x_in_inches * 72.0
-    y_pts_from_top = y_in_inches * 72.0
-    y_pts = page_height_pts - y_pts_from_top
-    return x_pts, y_pts
-
-# --- Create Overlay ---
-packet = io.BytesIO()
-c = canvas.Canvas(packet, pagesize=(page_width_pts, page_height_pts))
-c.setFont("Helvetica", 10)
-
-# Text fields
-c.drawString(*to_points_top_origin(0.56, 3.60), customer_name)
-c.drawString(*to_points_top_origin(0.56, 3.18), street_address_full)
-c.drawString(*to_points_top_origin(7.5, 3.19), zip_last3)
-c.drawString(*to_points_top_origin(5.02, 3.62), phone_number)
-c.drawString(*to_points_top_origin(6.82, 8.07), estimated_cost)
-
-# Today's date split MM/DD/YY
-c.drawString(*to_points_top_origin(6.57, 9.59), month)
-c.drawString(*to_points_top_origin(6.9, 9.59), day)
-c.drawString(*to_points_top_origin(7.46, 9.59), year)
-
-# Signature
-try:
-    sig = ImageReader(SIGNATURE)
-    c.drawImage(sig, *to_points_top_origin(0.55, 9.96), width=100, height=50, mask="auto")
-except Exception as e:
-    print(f" Could not add signature image: {e}")
-
-# Checkboxes
-checkbox_size = 8
-if boiler_check:
-    c.rect(*to_points_top_origin(1.68, 4.74), checkbox_size, checkbox_size, fill=1)
-if furnace_check:
-    c.rect(*to_points_top_origin(2.41, 5.05), checkbox_size, checkbox_size, fill=1)
-
-c.save()
-packet.seek(0)
-overlay_pdf = PdfReader(packet)
-
-# --- Merge Overlay ---
-for page, overlay in zip(template_pdf.pages, overlay_pdf.pages):
-    merger = PageMerge(page)
-    merger.add(overlay).render()
-
-# --- Output File ---
-customer_last_name = customer_name.split()[-1]
-output_filename = f"{customer_last_name} Cheektowaga permit.pdf"
-output_path = os.path.join(OUTPUT_DIR, output_filename)
-
-PdfWriter().write(output_path, template_pdf)
-print(f" PDF created and saved as '{output_path}'")
-
-# --- Print Automatically if Wanted ---
-print_now = input("Do you want to print this PDF? (y/n): ").strip().lower()
-if print_now == "y":
-    try:
-        os.startfile(output_path, "print")
-        print(" Sent to printer.")
-    except Exception as e:
-        print(f" Could not print file: {e}")
-else:
-    print(" Printing skipped.")
-
-# --- Optionally Delete ---
-delete_pdf = input(f"Do you want to delete '{output_filename}' from Desktop? (y/n): ").strip().lower()
-if delete_pdf == "y":
-    try:
-        os.remove(output_path)
-        print(f" '{output_filename}' deleted from Desktop.")
-    except Exception as e:
-        print(f" Could not delete file: {e}")
-else:
-    print(f" '{output_filename}' kept on Desktop.")
+def ask_questions(job):
+    answers = {"estimated_cost": job.estimated_cost or input("Enter estimated cost: ")}
+
+    boiler_input = input("Replacing a boiler? (y/n): ").strip().lower()
+    answers["boiler_check"] = boiler_input in ["y", "yes"]
+
+    if not answers["boiler_check"]:
+        answers["furnace_check"] = True  # automatically yes if no boiler
+    else:
+        furnace_input = input("Furnace/ductwork work? (y/n): ").strip().lower()
+        answers["furnace_check"] = furnace_input in ["y", "yes"]
+    return answers
+
+# --- Answers for unattended (pipeline) runs ---
+def batch_answers(job, quote):
+    return {
+        "estimated_cost": job.estimated_cost,
+        "boiler_check": job.work_type == "B",
+        "furnace_check": job.work_type != "B",
+    }
+
+# --- Fill the permit for one job ---
+def build_permit(job, answers, template_pdf=None):
+    address = parse_address(job.job_address)
+
+    # Street address (number + street only)
+    street_address_full = address.street_line
+
+    # Zip last 3 digits
+    zip_last3 = address.zip[-3:]
+
+    # Phone number split into area code and XXX-XXXX (the form has two boxes)
+    digits = re.sub(r"\D", "", job.phone)
+    area_code = digits[:3]
+    rest_number = f"{digits[3:6]}-{digits[6:]}"
+
+    # Today's Date
+    today = datetime.today()
+    month = str(today.month).zfill(2)
+    day = str(today.day).zfill(2)
+    year = str(today.year)[-2:]
+
+    # Form fields: name -> (value, x, y) with x/y in inches (overlay fallback only)
+    text_fields = {
+        "undefined_11": (job.customer_name, 0.56, 3.60),
+        "undefined_10": (street_address_full, 0.56, 3.18),
+        "Cheektowaga NY 14": (zip_last3, 7.5, 3.19),
+        "undefined_12": (area_code, 5.02, 3.62),
+        "undefined_13": (rest_number, 5.37, 3.62),
+        "undefined_22": (answers["estimated_cost"], 6.82, 8.07),
+        # Today's date split MM/DD/YY
+        "undefined_24": (month, 6.57, 9.59),
+        "undefined_25": (day, 6.9, 9.59),
+        "20_2": (year, 7.46, 9.59),
+    }
+    checkboxes = {
+        "Boiler": (answers["boiler_check"], 1.68, 4.74),
+        "Furnace  Ductwork": (answers["furnace_check"], 2.41, 5.05),
+    }
+
+    def draw_signature(c, to_points_top_origin):
+        try:
+            sig = signature_image(SIGNATURE)
+            c.drawImage(sig, *to_points_top_origin(0.55, 9.96), width=100, height=50, mask="auto")
+        except Exception as e:
+            print(f" Could not add signature image: {e}")
+
+    template_pdf = template_pdf or load_template(TEMPLATE)
+    fill_template(template_pdf, text_fields, checkboxes, font_size=10, draw_extra=draw_signature)
+    return template_pdf
+
+def output_path(job):
+    return os.path.join(OUTPUT_DIR, f"{job.last_name} Cheektowaga permit.pdf")
+
+if __name__ == "__main__":
+    prepare_permit(TEMPLATE, SIGNATURE)  # loads in the background while the questions are answered
+    for job in iter_job_records(INPUT):
+        answers = ask_questions(job)
+        finish_pdf(build_permit(job, answers), output_path(job))
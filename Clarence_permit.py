@@ -1,117 +1,73 @@
 import os
-import io
 import datetime
-from pdfrw import PdfReader, PdfWriter, PageMerge
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from pdf_output import finish_pdf
+from form_fill import fill_template, load_template
+from job_records import iter_job_records
+from warmup import prepare_permit
+from address_parser import parse_address
 
 TEMPLATE = "Clarence HVAC permit.pdf"
 INPUT = "Customer_data.txt"
 OUTPUT_DIR = r"\\RPIDCROOT\RedirectedFolders\cef\Desktop"
 
-# --- Read Customer Data ---
-with open(INPUT, "r") as f:
-    lines = [line.strip() for line in f if line.strip()]
-
-# --- Split address ---
-address_parts = [part.strip() for part in lines[1].split(",")]
-if len(address_parts) >= 3:
-    job_address = address_parts[0]
-    city_state_zip = f"{address_parts[1]}, {address_parts[2]}"
-else:
-    job_address = lines[1]
-    city_state_zip = ""
-
-# --- Second address logic ---
-second_address = lines[6] if len(lines) > 6 else job_address
-
 # --- Prompt for variable fields ---
-job_description = input("Enter Job Description: ")
-job_cost = input("Enter Job Cost Estimate: ")
-
-# --- Today's date ---
-today = datetime.date.today().strftime("%m/%d/%Y")
-
-# --- Data Map ---
-data = {
-    "today": today,
-    "job_description": job_description,
-    "job_cost": job_cost,
-    "date_of_job": lines[4],
-    "job_address": job_address,
-    "name": lines[0],
-    "second_address": second_address,
-    "phone": lines[2],
-}
-
-# --- Load template ---
-template_pdf = PdfReader(TEMPLATE)
-page0 = template_pdf.pages[0]
-try:
-    llx = float(page0.MediaBox[0])
-    lly = float(page0.MediaBox[1])
-    urx = float(page0.MediaBox[2])
-    ury = float(page0.MediaBox[3])
-    page_width_pts = urx - llx
-    page_height_pts = ury - lly
-except Exception:
-    page_width_pts, page_height_pts = letter
-
-def to_points_top_origin(x_in_inches, y_in_inches):
-    x_pts = x_in_inches * 72.0
-    y_pts_from_top = y_in_inches * 72.0
-    y_pts = page_height_pts - y_pts_from_top
-    return x_pts, y_pts
-
-# --- Create overlay ---
-packet = io.BytesIO()
-c = canvas.Canvas(packet, pagesize=(page_width_pts, page_height_pts))
-c.setFont("Helvetica", 10)
-
-c.drawString(*to_points_top_origin(1.88, 1.41), data["today"])
-c.drawString(*to_points_top_origin(6.69, 8.19), data["today"])
-c.drawString(*to_points_top_origin(2.65, 2.02), data["job_description"])
-c.drawString(*to_points_top_origin(2.4, 2.55), f"${data['job_cost']}")
-c.drawString(*to_points_top_origin(5.57, 2.53), data["date_of_job"])
-c.drawString(*to_points_top_origin(2.28, 2.93), data["job_address"])
-c.drawString(*to_points_top_origin(2.28, 3.24), data["name"])
-c.drawString(*to_points_top_origin(2.28, 3.51), data["second_address"])
-c.drawString(*to_points_top_origin(2.28, 3.8), data["phone"])
-
-c.save()
-packet.seek(0)
-overlay_pdf = PdfReader(packet)
-
-# --- Merge overlay onto template ---
-for page, overlay in zip(template_pdf.pages, overlay_pdf.pages):
-    merger = PageMerge(page)
-    merger.add(overlay).render()
+def ask_questions(job):
+    return {
+        "job_description": job.job_description or input("Enter Job Description: "),
+        "job_cost": job.estimated_cost or input("Enter Job Cost Estimate: "),
+    }
+
+# --- Answers for unattended (pipeline) runs ---
+def batch_answers(job, quote):
+    return {"job_description": job.job_description, "job_cost": job.estimated_cost}
+
+# --- Fill the permit for one job ---
+def build_permit(job, answers, template_pdf=None):
+    # --- Split address ---
+    job_address = parse_address(job.job_address).street_line or job.job_address
+
+    # --- Second address logic ---
+    second_address = job.secondary_address or job_address
+
+    # --- Today's date ---
+    today = datetime.date.today().strftime("%m/%d/%Y")
+
+    # --- Data Map ---
+    data = {
+        "today": today,
+        "job_description": answers["job_description"],
+        "job_cost": answers["job_cost"],
+        "date_of_job": job.install_date,
+        "job_address": job_address,
+        "name": job.customer_name,
+        "second_address": second_address,
+        "phone": job.phone,
+    }
+
+    # --- Form fields: name -> (value, x, y) with x/y in inches (overlay fallback only) ---
+    text_fields = {
+        "Date of Application": (data["today"], 1.88, 1.41),
+        "Date": (data["today"], 6.69, 8.19),
+        "Description of Proposed Work": (data["job_description"], 2.65, 2.02),
+        "Estimated Value of Work": (f"${data['job_cost']}", 2.4, 2.55),
+        "Date of Installation": (data["date_of_job"], 5.57, 2.53),
+        "Job Address": (data["job_address"], 2.28, 2.93),
+        "Property Owner Name": (data["name"], 2.28, 3.24),
+        "Property Owner Address": (data["second_address"], 2.28, 3.51),
+        "Text2": (data["phone"], 2.28, 3.8),
+    }
+
+    # --- Fill template ---
+    template_pdf = template_pdf or load_template(TEMPLATE)
+    fill_template(template_pdf, text_fields, {}, font_size=10)
+    return template_pdf
 
 # --- Output file path ---
-customer_last_name = lines[0].split()[-1]
-output_filename = os.path.join(OUTPUT_DIR, f"{customer_last_name} Clarence permit.pdf")
-PdfWriter().write(output_filename, template_pdf)
-
-print(f" PDF created and saved as '{output_filename}'")
-
-# --- Ask to print ---
-print_now = input("Do you want to print this PDF? (y/n): ").strip().lower()
-if print_now == "y":
-    try:
-        os.startfile(output_filename, "print")
-        print(" Sent to printer.")
-    except Exception as e:
-        print(f" Printing failed: {e}")
-else:
-    print(" Printing skipped.")
-
-# --- Ask to delete ---
-delete_pdf = input(f"Do you want to delete '{output_filename}'? (y/n): ").strip().lower()
-if delete_pdf == "y":
-    try:
-        os.remove(output_filename)
-        print(f"🗑️ '{output_filename}' deleted.")
-    except Exception as e:
-        print(f" Could not delete file: {e}")
-else:
-    print(f" '{output_filename}' kept.")
+def output_path(job):
+    return os.path.join(OUTPUT_DIR, f"{job.last_name} Clarence permit.pdf")
+
+if __name__ == "__main__":
+    prepare_permit(TEMPLATE)  # loads in the background while the questions are answered
+    for job in iter_job_records(INPUT):
+        answers = ask_questions(job)
+        finish_pdf(build_permit(job, answers), output_path(job))
@@ -2,12 +2,23 @@
 # Hellow 
 # -------------------------------
 import csv
-import re
-import requests
 import json
 import os
 import math
+import sys
 from shapely.geometry import Point, shape
+from job_records import iter_job_records
+from address_parser import parse_address, looks_like_address, canonical_address
+from geocode import get_census_coordinates, get_census_geographies, get_census_municipality, use_store, Deadline, \
+    known_no_match, remember_no_match
+from permit_store import PermitStore, polygons_hash
+from zip_table import zip_township
+from street_segments import segment_township, record_point
+from resolve_queue import provisional_township, enqueue, report_changes, RetryWorker
+from profiling import traced, start_from_argv
+import metrics
+import warmup
+import price_table as price_tables
 
 # -------------------------------
 # Config: paths to your files
@@ -15,6 +26,7 @@ from shapely.geometry import Point, shape
 BASE_DIR = r"C:\Users\cef\WHY_HVAC_Permit_Scripts"
 CUSTOMER_FILE = os.path.join(BASE_DIR, "Customer_data.txt")
 PERMIT_FILE = os.path.join(BASE_DIR, "Permit_fee_check.txt")
+RESOLVE_BUDGET = 3.0  # seconds per address (all lookups together) before asking for the township
 
 # List of polygon files you asked for (file must exist at these paths)
 # The left side is a friendly name (used to override), the right side is filename on Desktop
@@ -35,6 +47,7 @@ POLYGONS = {
 # -------------------------------
 # Utility: load permit CSV
 # -------------------------------
+@traced()
 def load_permit_data(txt_file):
     permit_dict = {}
     with open(txt_file, newline="", encoding="utf-8") as f:
@@ -44,51 +57,10 @@ def load_permit_data(txt_file):
             permit_dict[key] = row
     return permit_dict
 
-# -------------------------------
-# Geocode (Census) functions
-# -------------------------------
-def get_census_coordinates(address):
-    url = "https://geocoding.geo.census.gov/geocoder/locations/onelineaddress"
-    params = {"address": address, "benchmark": "Public_AR_Current", "format": "json"}
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-    except Exception as e:
-        print(" Census geocode request failed:", e)
-        return None, None
-
-    try:
-        coords = data['result']['addressMatches'][0]['coordinates']
-        return coords['x'], coords['y']
-    except (KeyError, IndexError):
-        return None, None
-
-def get_census_municipality(address):
-    lon, lat = get_census_coordinates(address)
-    if lon is None:
-        return None
-    geo_url = "https://geocoding.geo.census.gov/geocoder/geographies/coordinates"
-    geo_params = {"x": lon, "y": lat, "benchmark": "Public_AR_Current", "vintage": "Current_Current", "format": "json"}
-    try:
-        geo_response = requests.get(geo_url, params=geo_params, timeout=10)
-        geo_data = geo_response.json()
-    except Exception as e:
-        print(" Census geography request failed:", e)
-        return None
-
-    try:
-        geographies = geo_data['result']['geographies']
-        if 'Places' in geographies and geographies['Places']:
-            return geographies['Places'][0]['NAME']
-        elif 'County Subdivisions' in geographies and geographies['County Subdivisions']:
-            return geographies['County Subdivisions'][0]['NAME']
-        return None
-    except (KeyError, IndexError):
-        return None
-
 # -------------------------------
 # Load polygon files into memory
 # -------------------------------
+@traced()
 def load_polygons(polygon_map):
     loaded = {}
     for name, path in polygon_map.items():
@@ -110,10 +82,8 @@ def load_polygons(polygon_map):
 def extract_address_from_file(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         lines = [line.strip() for line in f if line.strip()]
-    # permissive: line starting with number and containing a 5-digit ZIP somewhere
-    addr_pattern = re.compile(r"^\d+.*\d{5}")
     for line in lines:
-        if addr_pattern.search(line):
+        if looks_like_address(line):
             return line
     return None
 
@@ -131,49 +101,78 @@ def get_ac_type():
             return ac_type
         print("Invalid input. Try again.")
 
+def get_installation_cost(township):
+    while True:
+        try:
+            return float(input(f"Enter installation cost for {township}: "))
+        except ValueError:
+            print("Invalid number, try again.")
+
 # -------------------------------
 # Permit logic 
 # -------------------------------
+SPECIAL_CALC_TOWNS = ["amherst", "niagara falls city", "north tonawanda city"]
+
 def normalize_township(name: str) -> str:
     """Ensure consistent naming for lookups."""
     return name.strip().lower()
 
-def check_permit(township, work_type, permit_data):
+def safe_float(val):
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        return 0.0
+
+def price_table(permit_data):
+    """Every quote for this fee table, precomputed (price_table.py); rebuilt when its contents change."""
+    return price_tables.table_for(permit_data, compute_permit, SPECIAL_CALC_TOWNS)
+
+def calc_permit(township, work_type, permit_data, ac_type=None, installation_cost=None):
+    """
+    Work out whether a permit is needed and its price without prompting.
+    Returns a dict: township, found, special, required, price, notes and needs, where
+    needs is "ac_type" or "installation_cost" when that answer is missing (price is then
+    only a placeholder) and None once the quote is complete.
+    Answered from the price table; anything it doesn't cover is worked out by compute_permit.
+    """
+    quote = price_table(permit_data).quote(township, normalize_township(township), work_type, ac_type, installation_cost)
+    if quote is None:
+        quote = compute_permit(township, work_type, permit_data, ac_type, installation_cost)
+    return quote
+
+def compute_permit(township, work_type, permit_data, ac_type=None, installation_cost=None):
+    """calc_permit worked out from the fee table row and the special-calc formulas."""
     key = normalize_township(township)
+    quote = {"township": township, "found": True, "special": False, "required": False,
+             "price": 0.0, "notes": [], "needs": None}
 
     # First, handle special calculation towns
-    if township.lower() in ["amherst town", "niagara falls city", "north tonawanda city"]:
-        price = special_calc_price(township, work_type, permit_data)
+    if key in SPECIAL_CALC_TOWNS:
+        price = special_calc_price(township, work_type, permit_data, ac_type, installation_cost, quote)
         if price is not None:
-            print(f"Township detected: {township} (special calc)")
-            print(f"Permit required? Yes")
-            print(f"Permit price: ${price:.2f}")
-            return
+            quote.update(special=True, required=True, price=price)
+            return quote
+        if quote["needs"]:
+            quote.update(special=True, required=True, price=None)
+            return quote
 
     # Fallback to regular CSV logic
     data = permit_data.get(key)
     if not data:
-        print(f" Township '{township}' not found in permit list.")
-        return
+        quote.update(found=False, required=None, price=None)
+        quote["notes"].append(f"Township '{township}' not found in permit list.")
+        return quote
 
     permit_required = False
-    ac_permit_required = False
     ask_ac_type = False
     price = 0.0
 
-    def safe_float(val):
-        try:
-            return float(val)
-        except (ValueError, TypeError):
-            return 0.0
-
     furnace_val = safe_float(data.get("Furnace_Cost"))
     ac_new_val = safe_float(data.get("AC_New_Cost"))
     ac_replace_val = safe_float(data.get("AC_Replace_Cost"))
     boiler_val = safe_float(data.get("Boiler_Cost"))
-    fac_val = safe_float(data.get("FAC_Cost"))
-    separate = data.get("Separate", "").strip().lower() == "yes"
-    special = data.get("Special_Calc", "").strip().lower() == "yes"
+    separate = (data.get("Separate") or "").strip().lower() == "yes"
+    special = (data.get("Special_Calc") or "").strip().lower() == "yes"
 
     # Base permit logic
     if work_type == "F":
@@ -181,8 +180,7 @@ def check_permit(township, work_type, permit_data):
         price = furnace_val
 
     elif work_type == "AC":
-        ac_permit_required = ac_new_val > 0 or ac_replace_val > 0 or special
-        permit_required = ac_permit_required
+        permit_required = ac_new_val > 0 or ac_replace_val > 0 or special
         if ac_new_val != ac_replace_val:
             ask_ac_type = True
             price = max(ac_new_val, ac_replace_val)
@@ -201,25 +199,29 @@ def check_permit(township, work_type, permit_data):
 
     # AC type selection (applies before any special fee)
     if ask_ac_type:
-        ac_type = get_ac_type()
-        print(f"AC type selected: {'New' if ac_type == 'N' else 'Replacement'}")
-        if work_type == "AC":
+        if ac_type not in ["N", "R"]:
+            quote["needs"] = "ac_type"
+        elif work_type == "AC":
             price = ac_new_val if ac_type == "N" else ac_replace_val
         elif work_type == "FAC" and separate:
             price = furnace_val + (ac_new_val if ac_type == "N" else ac_replace_val)
 
-    print(f"Township detected: {township}")
-    print(f"Permit required? {'Yes' if permit_required else 'No'}")
-    print(f"Permit price: ${price:.2f}")
+    quote.update(required=permit_required, price=price)
+    return quote
+
 # -------------------------------
 # Special Permit Cost Calculation
 # -------------------------------
-def special_calc_price(township, work_type, permit_data):
+def special_calc_price(township, work_type, permit_data, ac_type=None, installation_cost=None, quote=None):
+    """Price for the towns with their own formula, or None (quote["needs"] says if an answer is missing)."""
     key = normalize_township(township)
+    quote = quote if quote is not None else {"notes": [], "needs": None}
 
-    if township.lower() == "amherst":
+    if key == "amherst":
         # Amherst: use CSV as before
-        data = permit_data[key]
+        data = permit_data.get(key)
+        if data is None:
+            return None
         try:
             furnace_cost = float(data.get("Furnace_Cost") or 0)
             ac_new_cost = float(data.get("AC_New_Cost") or 0)
@@ -228,14 +230,16 @@ def special_calc_price(township, work_type, permit_data):
             fac_cost = float(data.get("FAC_Cost") or 0)
             extra_fee = 1.75
         except ValueError:
-            print("⚠️ Invalid numbers in CSV for Amherst")
+            quote["notes"].append("⚠️ Invalid numbers in CSV for Amherst")
             return None
 
         if work_type == "F":
             return furnace_cost + extra_fee
         elif work_type == "AC":
             if ac_new_cost != ac_replace_cost:
-                ac_type = get_ac_type()
+                if ac_type not in ["N", "R"]:
+                    quote["needs"] = "ac_type"
+                    return None
                 return (ac_new_cost if ac_type == "N" else ac_replace_cost) + extra_fee
             else:
                 return ac_new_cost + extra_fee
@@ -244,122 +248,281 @@ def special_calc_price(township, work_type, permit_data):
         elif work_type == "B":
             return boiler_cost + extra_fee
 
-    elif township.lower() == "niagara falls city":
-        # Ask for cost
-        total_cost = None
-        while total_cost is None:
-            try:
-                total_cost = float(input("Enter installation cost for Niagara Falls City: "))
-            except ValueError:
-                print("Invalid number, try again.")
+    elif key == "niagara falls city":
+        if installation_cost is None:
+            quote["needs"] = "installation_cost"
+            return None
         # Round up to next 1000
-        rounded = math.ceil(total_cost / 1000) * 1000
+        rounded = math.ceil(installation_cost / 1000) * 1000
         price = 25 + max(0, (rounded - 1000) // 1000 * 10)
-        print("calculation = 25 for first $1000 and $10 for remaining fractions of 1000")
-        print(f"                 25.0 plus {price - 25.0} = {price}")
+        quote["notes"].append("calculation = 25 for first $1000 and $10 for remaining fractions of 1000")
+        quote["notes"].append(f"                 25.0 plus {price - 25.0} = {price}")
         return price
 
-    elif township.lower() == "north tonawanda city":
-        total_cost = None
-        while total_cost is None:
-            try:
-                total_cost = float(input("Enter installation cost for North Tonawanda: "))
-            except ValueError:
-                print("Invalid number, try again.")
+    elif key == "north tonawanda city":
+        if installation_cost is None:
+            quote["needs"] = "installation_cost"
+            return None
         # Round up to next 1000
-        rounded = math.ceil(total_cost / 1000) * 1000
+        rounded = math.ceil(installation_cost / 1000) * 1000
         additional_units = max(0, (rounded) // 1000)  # only above first 1000
         price = 35 + additional_units * 8
-        print("calculation = 35 base price and $8 * total cost/1000")
-        print(f"                 35.0 plus {price - 35.0} = {price}")
-        print("Check with North Tonawanada town if smoke detectors and COs are needed: if yes, add 75")
+        quote["notes"].append("calculation = 35 base price and $8 * total cost/1000")
+        quote["notes"].append(f"                 35.0 plus {price - 35.0} = {price}")
+        quote["notes"].append("Check with North Tonawanada town if smoke detectors and COs are needed: if yes, add 75")
         return price
 
     # Default: not a special calc
     return None
+
+def township_notes(township):
+    notes = []
+    if township.strip().lower() in ["clarence town", "orchard park town"]:
+        notes.append(" print signed estimate invoice ")
+    if township.strip().lower() in ["north tonawanda city"]:
+        notes.append("inspection: will send info to Jeff L")
+    if township.strip().lower() in ["niagara falls city"]:
+        notes.append("inspection: will send pics")
+    if township.strip().lower() in ["cheektowaga town"]:
+        notes.append("Permit is for heating elements and brand new ACs only")
+    return notes
+
+def check_permit(township, work_type, permit_data, ac_type=None, installation_cost=None):
+    """Interactive version of calc_permit: asks for whatever it is missing, then prints the quote."""
+    while True:
+        quote = calc_permit(township, work_type, permit_data, ac_type, installation_cost)
+        if quote["needs"] == "ac_type":
+            ac_type = get_ac_type()
+            print(f"AC type selected: {'New' if ac_type == 'N' else 'Replacement'}")
+        elif quote["needs"] == "installation_cost":
+            installation_cost = get_installation_cost(township)
+        else:
+            break
+
+    for note in quote["notes"]:
+        print(note)
+    if quote["found"]:
+        print(f"Township detected: {township}{' (special calc)' if quote['special'] else ''}")
+        print(f"Permit required? {'Yes' if quote['required'] else 'No'}")
+        print(f"Permit price: ${quote['price']:.2f}")
+    return quote
+
 # -------------------------------
-# Main flow
+# Township resolution
 # -------------------------------
-if __name__ == "__main__":
-    # Load data
-    permit_data = load_permit_data(PERMIT_FILE)
-    polygons = load_polygons(POLYGONS)
-
-    # Extract address from customer file
-    address = extract_address_from_file(CUSTOMER_FILE)
-    if not address:
-        print("Could not find an address in the customer file.")
-        raise SystemExit(1)
+def polygon_township(lon, lat, polygons):
+    """Name of the override polygon containing the point, or None."""
+    point = Point(lon, lat)
+    for name, geom in polygons.items():
+        try:
+            if geom.intersects(point):
+                metrics.POLYGON_OVERRIDES.inc(name)
+                return name
+        except Exception as e:
+            print(f" Error testing polygon {name}: {e}")
+    return None
 
-    # Geocode to lon/lat
-    lon, lat = get_census_coordinates(address)
-    township = None
+def census_township(lon, lat, quiet=False, deadline=None):
+    """(township, source) from Census geographies, favoring County Subdivision; (None, reason) if not found."""
+    geographies = get_census_geographies(lon, lat, quiet, deadline)
+    if geographies is None:
+        out_of_time = deadline is not None and not deadline.allows_request()
+        return None, "out of time" if out_of_time else "request failed"
+    return township_from_geographies(geographies)
+
+def township_from_geographies(geographies):
+    if geographies.get('County Subdivisions'):
+        return geographies['County Subdivisions'][0]['NAME'], "County Subdivision"
+    if geographies.get('Places'):
+        return geographies['Places'][0]['NAME'], "Place"
+    return None, "no match"
+
+def queue_provisional(address, store, polygons_key, job_number=None, known_townships=()):
+    """Census isn't answering: use a provisional township and queue the address to check later."""
+    township, guess = provisional_township(address, store, polygons_key, known_townships)
+    if township:
+        print(f"Township (provisional, from the {guess}): {township}")
+    else:
+        metrics.MANUAL_FALLBACKS.inc("census unreachable")
+        township = input(" Nothing known nearby either. Enter the township manually: ").strip()
+    metrics.RESOLUTIONS.inc("provisional")
+    if store is not None:
+        enqueue(store, job_number, address, township, guess)
+        print(" Queued to check with Census once it answers (python resolve_queue.py status).")
+    return township
+
+def census_resolver(polygons, polygons_key, store=None):
+    """resolver(address) -> (township, source) without prompting, for retrying queued lookups."""
+    def resolve(address):
+        lon, lat = get_census_coordinates(address, quiet=True)
+        if lon is None:
+            return None, "no address match" if known_no_match(address) else "geocode failed"
+        township, source = polygon_township(lon, lat, polygons), "polygon"
+        if not township:
+            township, source = census_township(lon, lat, quiet=True)
+            if not township:
+                return None, source
+            source = f"Census {source}"
+        key = canonical_address(address)
+        if store is not None and key:
+            store.put_township(key, polygons_key, township, source)
+            record_point(address, township, lon, lat, polygons, store, polygons_key)
+        return township, source
+    return resolve
+
+def resolve_township(address, polygons, store=None, polygons_key=None, budget=RESOLVE_BUDGET, refresh=False,
+                     offline_first=False, job_number=None, known_townships=()):
+    """
+    Map the address to a township: saved lookup, the ZIP fast path, known street ranges
+    and townships typed in for addresses Census can't match, then geocode once and check
+    the polygons before Census. refresh=True skips all of those and asks Census again.
+    Every lookup shares one budget: once it is spent the next Census call is skipped
+    and the township is asked for, so no address waits longer than about budget seconds.
+    With offline_first, an unreachable Census gives a provisional answer instead
+    (resolve_queue.py) and the address is queued, with its job number, to check later.
+    """
+    deadline = Deadline(budget)
+    key = canonical_address(address)
+    if not refresh:
+        # Someone already resolved this address against the same polygons
+        if store is not None and key:
+            saved = store.get_township(key, polygons_key)
+            if saved:
+                print(f"Township (saved lookup, {saved[1]}): {saved[0]}")
+                metrics.RESOLUTIONS.inc("saved")
+                return saved[0]
+
+        # The ZIP lies wholly inside one jurisdiction (zip_jurisdictions.json), so nothing to look up
+        if polygons_key:
+            township, zip_code = zip_township(address, polygons_key)
+            if township:
+                print(f"Township from ZIP {zip_code}: {township}")
+                metrics.RESOLUTIONS.inc("zip")
+                return township
+
+        # Other house numbers either side of this one on the street resolved the same way
+        township, span = segment_township(address, store, polygons_key, polygons)
+        if township:
+            print(f"Township from street range {span[0]}-{span[1]}: {township}")
+            metrics.RESOLUTIONS.inc("street range")
+            return township
+
+        # Census couldn't place it recently and someone typed the township in
+        no_match = known_no_match(address)
+        if no_match and no_match[1]:
+            print(f"Township entered earlier (Census has no match for this address): {no_match[1]}")
+            metrics.RESOLUTIONS.inc("entered earlier")
+            return no_match[1]
+
+    # Geocode to lon/lat (memory cache, shared store, then Census if there's time)
+    lon, lat = get_census_coordinates(address, deadline=deadline, refresh=refresh)
 
     if lon is None or lat is None:
-        print(" Census geocode failed for address:", address)
+        out_of_time = not deadline.allows_request()
+        no_match = not out_of_time and known_no_match(address) is not None
+        if offline_first and not no_match:
+            print(" Census isn't answering for address:", address)
+            return queue_provisional(address, store, polygons_key, job_number, known_townships)
+        if out_of_time:
+            print(f" No answer from Census within {budget:g} s for address:", address)
+        elif no_match:
+            print(" Census has no match for address (new build?):", address)
+        else:
+            print(" Census geocode failed for address:", address)
+        metrics.RESOLUTIONS.inc("manual")
+        metrics.MANUAL_FALLBACKS.inc("out of time" if out_of_time else "no address match" if no_match else "geocode failed")
+        township = input("Enter the township manually: ").strip()
+        print(f"Township entered manually: {township}")
+        if no_match and township:
+            remember_no_match(address, township)  # next time, straight to this answer
+        return township
+
+    # Check polygons first — override Census if inside a polygon
+    township = polygon_township(lon, lat, polygons)
+    if township:
+        print(f"Township detected from polygon: {township}")
+        metrics.RESOLUTIONS.inc("polygon")
+        if store is not None and key:
+            store.put_township(key, polygons_key, township, "polygon")
+            record_point(address, township, lon, lat, polygons, store, polygons_key)
+        return township
+
+    # Fallback to Census municipality (favor County Subdivision if available)
+    township, source = census_township(lon, lat, deadline=deadline)
+    if township:
+        print(f"Township detected from Census ({source}): {township}")
+        metrics.RESOLUTIONS.inc(source)
+        if store is not None and key:
+            store.put_township(key, polygons_key, township, f"Census {source}")
+            record_point(address, township, lon, lat, polygons, store, polygons_key)
+    elif source in ("request failed", "out of time") and offline_first:
+        print(" Census isn't answering.")
+        township = queue_provisional(address, store, polygons_key, job_number, known_townships)
+    elif source in ("request failed", "out of time"):
+        if source == "out of time":
+            print(f" No answer from Census within {budget:g} s.")
+        metrics.RESOLUTIONS.inc("manual")
+        metrics.MANUAL_FALLBACKS.inc("out of time" if source == "out of time" else "geographies request failed")
         township = input("Enter the township manually: ").strip()
         print(f"Township entered manually: {township}")
     else:
-        # Check polygons first — override Census if inside a polygon
-        point = Point(lon, lat)
-        matched_polygon_name = None
-        for name, geom in polygons.items():
-            try:
-                if geom.intersects(point):
-                    matched_polygon_name = name
-                    break
-            except Exception as e:
-                print(f" Error testing polygon {name}: {e}")
-
-        if matched_polygon_name:
-            township = matched_polygon_name
-            print(f"Township detected from polygon: {township}")
-        else:
-            # Fallback to Census municipality (favor County Subdivision if available)
-            lon, lat = get_census_coordinates(address)
-            geo_url = "https://geocoding.geo.census.gov/geocoder/geographies/coordinates"
-            geo_params = {
-                "x": lon, "y": lat,
-                "benchmark": "Public_AR_Current",
-                "vintage": "Current_Current",
-                "format": "json"
-            }
-            try:
-                geo_response = requests.get(geo_url, params=geo_params, timeout=10)
-                geo_data = geo_response.json()
-                geographies = geo_data['result']['geographies']
-                if 'County Subdivisions' in geographies and geographies['County Subdivisions']:
-                    township = geographies['County Subdivisions'][0]['NAME']
-                    print(f"Township detected from Census (County Subdivision): {township}")
-                elif 'Places' in geographies and geographies['Places']:
-                    township = geographies['Places'][0]['NAME']
-                    print(f"Township detected from Census (Place): {township}")
-                else:
-                    township = input(" Could not determine township from address. Enter the township manually: ").strip()
-                    print(f"Township entered manually: {township}")
-            except Exception as e:
-                print(" Census geography request failed:", e)
-                township = input("Enter the township manually: ").strip()
-                print(f"Township entered manually: {township}")
-
-    # Prompt user for work type and check permit (including special calcs)
-    work_type = get_work_type()
-
-    # First check if this is a special calc case
-    special_price = special_calc_price(township, work_type, permit_data)
-    if special_price is not None:
-        print(f"Township detected: {township} (special calc)")
-        print(f"Permit required? Yes")
-        print(f"Permit price: ${special_price:.2f}")
-    else:
-        # Use standard permit logic
-        check_permit(township, work_type, permit_data)
-    
-    if township.strip().lower() in ["clarence town", "orchard park town"]:
-        print(" print signed estimate invoice ")
-    if township.strip().lower() in ["north tonawanda city"]:
-        print("inspection: will send info to Jeff L")
-    if township.strip().lower() in ["niagara falls city"]:
-        print("inspection: will send pics")
-    if township.strip().lower() in ["cheektowaga town"]:
-        print("Permit is for heating elements and brand new ACs only")       
\ No newline at end of file
+        metrics.RESOLUTIONS.inc("manual")
+        metrics.MANUAL_FALLBACKS.inc("no Census match")
+        township = input(" Could not determine township from address. Enter the township manually: ").strip()
+        print(f"Township entered manually: {township}")
+        if township:
+            remember_no_match(address, township)
+    return township
+
+# -------------------------------
+# Main flow
+# -------------------------------
+if __name__ == "__main__":
+    start_from_argv()  # --profile: timing summary and permit_profile.json at the end
+    refresh = "--refresh" in sys.argv  # look every address up again, ignoring saved and cached answers
+    offline_first = "--offline-first" in sys.argv  # Census down: provisional township, checked in the background
+
+    # Load data (side by side, while the connection to Census is opened)
+    warmup.start("fee table", load_permit_data, PERMIT_FILE)
+    warmup.start("polygons", load_polygons, POLYGONS)
+    warmup.prepare_census()
+    store = PermitStore()
+    use_store(store)
+    permit_data, polygons = warmup.get("fee table"), warmup.get("polygons")
+    polygons_key = polygons_hash(polygons)
+    report_changes(store)  # queued lookups (anyone's) whose final township turned out different
+    retry_worker = None
+    if offline_first:
+        retry_worker = RetryWorker(store, census_resolver(polygons, polygons_key, store))
+        retry_worker.start()
+    known_townships = [row["Township"].strip() for row in permit_data.values()]
+
+    # One pass per job (Customer_data.txt holds one; a CSV/JSONL export can hold a whole day)
+    for job in iter_job_records(CUSTOMER_FILE):
+        address = job.job_address.strip()
+        if not address:
+            print(f"Could not find an address for {job.customer_name or 'this job'}.")
+            continue
+        parsed = parse_address(address)
+        if parsed.confidence < 0.7:
+            print(f" Address looks incomplete (street '{parsed.street}', city '{parsed.city}', ZIP '{parsed.zip}'); check it before filing.")
+        if job.customer_name:
+            print(f"\n--- {job.customer_name}: {address} ---")
+
+        township = resolve_township(address, polygons, store, polygons_key, refresh=refresh,
+                                    offline_first=offline_first, job_number=job.job_number, known_townships=known_townships)
+        for job_number, town, _, price, issued in store.permits_at(canonical_address(address)):
+            print(f" Permit already filed here: job {job_number or '?'}, {town}, ${price or 0:.2f} on {issued[:10]}")
+
+        # Prompt user for work type (unless the export has it) and check permit (including special calcs)
+        work_type = job.work_type if job.work_type in ["F", "AC", "FAC", "B"] else get_work_type()
+        installation_cost = safe_float(job.installation_cost) if job.installation_cost else None
+        check_permit(township, work_type, permit_data, job.ac_type or None, installation_cost)
+
+        for note in township_notes(township):
+            print(note)
+
+    if retry_worker is not None:
+        retry_worker.stop()
+        report_changes(store)
+    store.close()
@@ -0,0 +1,123 @@
+# -------------------------------
+# Address autocomplete: returning customers and landlords come back with the same
+# addresses, so Address_check_for_permit.py completes them from every address
+# already resolved in permit_store.db and answers a picked one with its saved
+# township, without geocoding.
+#
+# The index is a sorted list of canonical addresses: the completions for what has
+# been typed so far are one bisect plus a short scan, well under a millisecond
+# with tens of thousands of addresses.
+#
+#   Tab          complete the address (where Python has readline)
+#   12 Main?     list the addresses starting "12 MAIN" and pick one by number
+#
+#   python address_index.py "12 main"    try it from the command line
+# -------------------------------
+import bisect
+import threading
+
+from address_parser import canonical_address, canonical_prefix
+
+# -------------------------------
+# Config
+# -------------------------------
+MAX_COMPLETIONS = 10
+
+# -------------------------------
+# Index
+# -------------------------------
+class AddressIndex:
+    def __init__(self, rows=()):
+        """rows: (address key, township, polygons hash), as from PermitStore.resolved_addresses()."""
+        self.townships = {key: (township, polygons_hash) for key, township, polygons_hash in rows if key}
+        self.keys = sorted(self.townships)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, store):
+        return cls(store.resolved_addresses() if store is not None else ())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def complete(self, typed, limit=MAX_COMPLETIONS):
+        """Saved addresses starting with what has been typed, in order."""
+        prefix = canonical_prefix(typed)
+        if not prefix:
+            return []
+        with self.lock:
+            i = bisect.bisect_left(self.keys, prefix)
+            matches = []
+            while i < len(self.keys) and len(matches) < limit and self.keys[i].startswith(prefix):
+                matches.append(self.keys[i])
+                i += 1
+        return matches
+
+    def township(self, address, polygons_hash):
+        """The saved township for an address, if it was resolved with the same override polygons."""
+        saved = self.townships.get(canonical_address(address))
+        return saved[0] if saved and saved[1] == polygons_hash else None
+
+    def add(self, address, township, polygons_hash):
+        """A newly resolved address, offered from the next prompt on."""
+        key = canonical_address(address)
+        if not key or not township:
+            return
+        with self.lock:
+            if key not in self.townships:
+                bisect.insort(self.keys, key)
+            self.townships[key] = (township, polygons_hash)
+
+# -------------------------------
+# Prompting
+# -------------------------------
+try:
+    import readline
+except ImportError:  # Windows without pyreadline3: use the "?" list instead
+    readline = None
+
+def install_completer(index):
+    """Tab-complete input() from the index; False where readline isn't available."""
+    if readline is None:
+        return False
+    def completer(text, state):
+        if state == 0:
+            completer.matches = index.complete(readline.get_line_buffer())
+        return completer.matches[state] if state < len(completer.matches) else None
+    readline.set_completer(completer)
+    readline.set_completer_delims("")  # complete the whole line, not the last word
+    readline.parse_and_bind("tab: complete")
+    return True
+
+def pick(index, typed):
+    """List the completions for typed (ending in '?') and return the one chosen, or None."""
+    matches = index.complete(typed.rstrip("?"))
+    if not matches:
+        print(" No saved addresses start that way.")
+        return None
+    for number, key in enumerate(matches, 1):
+        print(f"  {number}. {key}  ({index.townships[key][0]})")
+    choice = input(" Pick a number (Enter to type the address): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(matches):
+        return matches[int(choice) - 1]
+    return None
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    import sys
+    import time
+    from permit_store import PermitStore
+
+    store = PermitStore()
+    started = time.perf_counter()
+    index = AddressIndex.load(store)
+    print(f" {len(index)} address(es) loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+    for typed in sys.argv[1:]:
+        started = time.perf_counter()
+        matches = index.complete(typed)
+        print(f" '{typed}' ({(time.perf_counter() - started) * 1000:.3f} ms):")
+        for key in matches:
+            print(f"  {key}  ({index.townships[key][0]})")
+    store.close()
@@ -0,0 +1,282 @@
+# -------------------------------
+# One address parser for every script.
+# parse_address("69 N Cayuga Rd Apt 2, Williamsville, NY 14221") splits an address into
+# street, unit, city, state and ZIP and says how sure it is (confidence 0.0 - 1.0).
+#
+#   python address_parser.py                   check address_corpus.json (parts and canonical keys) and time bulk parsing
+#   python address_parser.py "123 Main St ..."  show how one address parses
+# -------------------------------
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+
+# -------------------------------
+# Word lists
+# -------------------------------
+# USPS street suffixes (Publication 28, the ones seen around here): spelled out -> abbreviation
+STREET_SUFFIXES = {
+    "alley": "Aly", "avenue": "Ave", "boulevard": "Blvd", "circle": "Cir", "court": "Ct",
+    "cove": "Cv", "crescent": "Cres", "crossing": "Xing", "drive": "Dr", "expressway": "Expy",
+    "extension": "Ext", "highway": "Hwy", "hollow": "Holw", "lane": "Ln", "loop": "Loop",
+    "parkway": "Pkwy", "path": "Path", "pike": "Pike", "place": "Pl", "point": "Pt",
+    "ridge": "Rdg", "road": "Rd", "row": "Row", "run": "Run", "square": "Sq", "street": "St",
+    "terrace": "Ter", "trail": "Trl", "turnpike": "Tpke", "walk": "Walk", "way": "Way",
+}
+DIRECTIONALS = {
+    "north": "N", "south": "S", "east": "E", "west": "W",
+    "northeast": "NE", "northwest": "NW", "southeast": "SE", "southwest": "SW",
+}
+STATES = {
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL", "IN", "IA",
+    "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM",
+    "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA",
+    "WV", "WI", "WY",
+}
+UNIT_WORDS = ["apartment", "apt", "unit", "suite", "ste", "floor", "fl", "room", "rm", "building",
+              "bldg", "lot", "trlr", "dept"]
+UNIT_ONLY_WORDS = ["upper", "uppr", "lower", "lowr", "rear", "front", "frnt", "basement", "bsmt"]
+
+def _alternation(words):
+    return "|".join(sorted((re.escape(w) for w in words), key=len, reverse=True))
+
+# -------------------------------
+# Compiled patterns (built once at import)
+# -------------------------------
+_SUFFIX = _alternation(list(STREET_SUFFIXES) + list(STREET_SUFFIXES.values()))
+_DIRECTIONAL = _alternation(list(DIRECTIONALS) + list(DIRECTIONALS.values()))
+_DIRECTIONAL_ABBR = _alternation(DIRECTIONALS.values())
+
+SPACE_RE = re.compile(r"\s+")
+COUNTRY_RE = re.compile(r"[\s,]*\b(?:USA|U\.S\.A\.|United States(?: of America)?)\.?\s*$", re.I)
+ZIP_RE = re.compile(r"(?:^|[\s,])(\d{5})(?:-?(\d{4}))?\s*$")
+STATE_RE = re.compile(r"(?:^|[\s,])(New York|N\.Y\.?|[A-Za-z]{2})\.?\s*,?\s*$")
+UNIT_RE = re.compile(
+    rf"[\s,]*(?:\b((?:{_alternation(UNIT_WORDS)})\b\.?\s*#?\s*[\w-]+|(?:{_alternation(UNIT_ONLY_WORDS)}))\b"
+    rf"|(#\s*[\w-]+))\s*$",
+    re.I,
+)
+LEADING_UNIT_RE = re.compile(
+    rf"(?:\b(?:{_alternation(UNIT_WORDS)})\b\.?\s*#?\s*[\w-]+|#\s*[\w-]+|\b(?:{_alternation(UNIT_ONLY_WORDS)})\b)",
+    re.I,
+)
+HOUSE_NUMBER_RE = re.compile(r"^\d+[A-Za-z]?(?:[-/]\d+[A-Za-z]?)?\s+\S")
+SUFFIX_END_RE = re.compile(rf"\b(?:{_SUFFIX})\.?(?:\s+(?:{_DIRECTIONAL})\.?)?$", re.I)
+# No commas: number, at least one name word, a suffix, an optional trailing directional.
+# A spelled-out directional with more words after it starts the city ("Market St North Tonawanda").
+STREET_PREFIX_RE = re.compile(
+    rf"^(\d+[A-Za-z]?(?:[-/]\d+[A-Za-z]?)?\s+(?:\S+\s+)+?(?:{_SUFFIX})\.?"
+    rf"(?:\s+(?:{_DIRECTIONAL_ABBR})\.?(?=\s|$)|\s+(?:{_DIRECTIONAL})\.?$)?)(?=\s|$)",
+    re.I,
+)
+# A suffix right after the matched one means the first was part of the name ("Sturgeon Point Rd")
+NEXT_SUFFIX_RE = re.compile(rf"^(?:{_SUFFIX})\.?(?:\s+(?:{_DIRECTIONAL_ABBR})\.?)?(?=\s|$)", re.I)
+
+# -------------------------------
+# Result
+# -------------------------------
+@dataclass(frozen=True)
+class ParsedAddress:
+    street: str = ""
+    unit: str = ""
+    city: str = ""
+    state: str = ""
+    zip: str = ""
+    confidence: float = 0.0
+
+    @property
+    def street_line(self):
+        """Street with the unit, the way it goes on a permit's address line."""
+        return f"{self.street} {self.unit}".strip()
+
+    @property
+    def city_state_zip(self):
+        city = self.city
+        state_zip = f"{self.state} {self.zip}".strip()
+        return f"{city}, {state_zip}" if city and state_zip else city or state_zip
+
+    @property
+    def one_line(self):
+        return ", ".join(part for part in (self.street_line, self.city, f"{self.state} {self.zip}".strip()) if part)
+
+# -------------------------------
+# Parsing
+# -------------------------------
+def _clean(text):
+    return SPACE_RE.sub(" ", text).strip(" ,.")
+
+def _split_unit(street):
+    match = UNIT_RE.search(street)
+    if not match or match.start() == 0:
+        return street, ""
+    return _clean(street[:match.start()]), _clean(match.group(1) or match.group(2))
+
+def parse_address(text):
+    """Split a one-line (or multi-line) address into its parts. Never raises."""
+    rest = _clean((text or "").replace("\n", ", ").replace("\r", ""))
+    rest = COUNTRY_RE.sub("", rest)
+
+    zip_code = ""
+    match = ZIP_RE.search(rest)
+    if match:
+        zip_code = match.group(1)
+        rest = _clean(rest[:match.start()])
+
+    state = ""
+    match = STATE_RE.search(rest)
+    if match:
+        candidate = match.group(1).replace(".", "").upper()
+        candidate = "NY" if candidate == "NEW YORK" else candidate
+        if candidate in STATES and match.start() > 0:
+            state = candidate
+            rest = _clean(rest[:match.start()])
+
+    parts = [_clean(p) for p in rest.split(",") if _clean(p)]
+    city = ""
+    if len(parts) >= 2 and not UNIT_RE.fullmatch(" " + parts[-1]):
+        city = parts.pop()
+        street = " ".join(parts)
+    else:
+        street = " ".join(parts)
+        match = STREET_PREFIX_RE.match(street)
+        if match and match.end() < len(street):
+            # "69 North Cayuga Road Williamsville": whatever follows the street (and unit) is the city
+            street_part = match.group(1)
+            after_street = street[match.end():].strip()
+            extra = NEXT_SUFFIX_RE.match(after_street)
+            while extra and extra.end() < len(after_street):
+                street_part = f"{street_part} {extra.group(0)}"
+                after_street = after_street[extra.end():].strip()
+                extra = NEXT_SUFFIX_RE.match(after_street)
+            unit_match = LEADING_UNIT_RE.match(after_street)
+            unit_text = unit_match.group(0) if unit_match else ""
+            city = _clean(after_street[len(unit_text):])
+            street = _clean(f"{street_part} {unit_text}")
+
+    street, unit = _split_unit(street)
+
+    confidence = 0.0
+    if HOUSE_NUMBER_RE.match(street):
+        confidence += 0.35
+    if SUFFIX_END_RE.search(street):
+        confidence += 0.15
+    if city:
+        confidence += 0.2
+    if state:
+        confidence += 0.1
+    if zip_code:
+        confidence += 0.2
+    return ParsedAddress(street, unit, city, state, zip_code, round(confidence, 2))
+
+def looks_like_address(text, min_confidence=0.7):
+    return parse_address(text).confidence >= min_confidence
+
+# -------------------------------
+# Canonical form (cache keys, de-duplicating a batch)
+# -------------------------------
+DEFAULT_STATE = "NY"
+_SUFFIX_ABBREVIATIONS = {**{k: v.upper() for k, v in STREET_SUFFIXES.items()},
+                         **{v.lower(): v.upper() for v in STREET_SUFFIXES.values()}}
+_DIRECTIONAL_ABBREVIATIONS = {**{k: v for k, v in DIRECTIONALS.items()},
+                              **{v.lower(): v for v in DIRECTIONALS.values()}}
+PUNCTUATION_RE = re.compile(r"[^\w\s/-]")
+
+def _canonical_words(text):
+    return PUNCTUATION_RE.sub(" ", text).upper().split()
+
+def canonical_street(street):
+    """'69 North Cayuga Road' -> '69 N CAYUGA RD' (USPS abbreviations, no punctuation)."""
+    words = _canonical_words(street)
+    last = len(words) - 1
+    suffix_at = None
+    if last >= 2 and words[last].lower() in _SUFFIX_ABBREVIATIONS:
+        suffix_at = last
+    elif last >= 3 and words[last].lower() in _DIRECTIONAL_ABBREVIATIONS and words[last - 1].lower() in _SUFFIX_ABBREVIATIONS:
+        suffix_at = last - 1
+        words[last] = _DIRECTIONAL_ABBREVIATIONS[words[last].lower()]
+    if suffix_at is not None:
+        words[suffix_at] = _SUFFIX_ABBREVIATIONS[words[suffix_at].lower()]
+    # "N" before the name, but not in "12 West Ave" where West is the name
+    if len(words) > 2 and words[1].lower() in _DIRECTIONAL_ABBREVIATIONS and (suffix_at or len(words)) > 2:
+        words[1] = _DIRECTIONAL_ABBREVIATIONS[words[1].lower()]
+    return " ".join(words)
+
+def canonical_address(text):
+    """
+    One key per physical building: units dropped, USPS abbreviations, upper case.
+    The ZIP only stands in for a missing city, so a retyped address without one still matches.
+    """
+    parsed = text if isinstance(text, ParsedAddress) else parse_address(text)
+    street = canonical_street(parsed.street)
+    if not street:
+        return ""
+    place = " ".join(_canonical_words(parsed.city)) or parsed.zip
+    return ", ".join(part for part in (street, place, parsed.state or DEFAULT_STATE) if part)
+
+def canonical_prefix(text):
+    """The first part of an address as it is being typed, in canonical_address form, for prefix matching."""
+    parts = text.split(",")
+    street = canonical_street(parts[0])
+    if len(parts) == 1:
+        return street + " " if street and text[-1:].isspace() else street
+    return ", ".join([street] + [" ".join(_canonical_words(part)) for part in parts[1:]])
+
+def geocode_query(text):
+    """What to send the geocoder: the address without its unit, in a tidy one-line form."""
+    parsed = text if isinstance(text, ParsedAddress) else parse_address(text)
+    if not parsed.street:
+        return _clean(text) if isinstance(text, str) else ""
+    return ", ".join(part for part in (parsed.street, parsed.city, f"{parsed.state} {parsed.zip}".strip()) if part)
+
+def unique_addresses(addresses):
+    """Group a batch by canonical key: {key: [original addresses]} in first-seen order."""
+    groups = {}
+    for address in addresses:
+        groups.setdefault(canonical_address(address), []).append(address)
+    return groups
+
+# -------------------------------
+# Corpus check + throughput benchmark
+# -------------------------------
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "address_corpus.json")
+FIELDS = ["street", "unit", "city", "state", "zip"]
+
+def check_corpus(corpus):
+    failures = []
+    for case in corpus:
+        parsed = parse_address(case["input"])
+        wrong = {f: (case.get(f, ""), getattr(parsed, f)) for f in FIELDS if getattr(parsed, f) != case.get(f, "")}
+        if "canonical" in case and canonical_address(case["input"]) != case["canonical"]:
+            wrong["canonical"] = (case["canonical"], canonical_address(case["input"]))
+        if wrong:
+            failures.append((case["input"], wrong))
+    return failures
+
+def benchmark(inputs, count):
+    batch = (inputs * (count // len(inputs) + 1))[:count]
+    start = time.perf_counter()
+    for text in batch:
+        parse_address(text)
+    return count / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        parsed = parse_address(" ".join(sys.argv[1:]))
+        for name in FIELDS + ["confidence"]:
+            print(f"{name:>10}: {getattr(parsed, name)}")
+        raise SystemExit(0)
+
+    with open(CORPUS_FILE, encoding="utf-8") as f:
+        corpus = json.load(f)
+    failures = check_corpus(corpus)
+    for text, wrong in failures:
+        print(f"FAIL {text!r}")
+        for name, (want, got) in wrong.items():
+            print(f"       {name}: expected {want!r}, got {got!r}")
+    print(f"{len(corpus) - len(failures)}/{len(corpus)} corpus addresses parsed as expected")
+
+    rate = benchmark([case["input"] for case in corpus], 100_000)
+    print(f"{rate:,.0f} addresses/second")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,227 @@
+# -------------------------------
+# Streaming batch output: many permits into one PDF (or a rolling series of PDFs)
+# without keeping every job's object tree in memory.
+# -------------------------------
+import os
+import sys
+import zlib
+from pdfrw import PdfReader, PdfDict, PdfArray, PdfName
+from pdfrw.pdfwriter import user_fmt
+
+from pdf_output import strip_unused
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def reachable_ids(roots):
+    """ids of every object reachable from roots (used to spot template-owned objects)."""
+    seen = set()
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        if isinstance(obj, PdfDict):
+            seen.add(id(obj))
+            stack.extend(v for k, v in obj.items() if k != "/Parent")
+        elif isinstance(obj, PdfArray):
+            seen.add(id(obj))
+            stack.extend(obj)
+    return seen
+
+def fresh_copy(template_pdf):
+    """
+    A per-job copy of a parsed template that shares all of the template's fonts,
+    images and content streams. Only the dicts a fill mutates are copied.
+    """
+    copy = PdfDict(Root=PdfDict(template_pdf.Root))
+    pages = []
+    for page in template_pdf.pages:
+        new_page = PdfDict(page)
+        resources = PdfDict(page.Resources or {})
+        if resources.XObject is not None:
+            resources.XObject = PdfDict(resources.XObject)
+        new_page.Resources = resources
+        if page.Annots is not None:
+            new_page.Annots = PdfArray(page.Annots)
+        pages.append(new_page)
+    copy.pages = pages
+    return copy
+
+# -------------------------------
+# Streaming writer
+# -------------------------------
+class StreamingPdfWriter:
+    """
+    Appends pages to a PDF file as they are produced.
+
+    Objects reachable from the template passed in are written once and then
+    referenced by every later page; everything else belongs to one job and is
+    forgotten as soon as its page is on disk, so memory stays flat however long
+    the batch gets.
+    """
+
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, path, template_pdf=None):
+        self.path = path
+        self.f = open(path, "wb")
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.offsets = {}
+        self.next_number = 3
+        self.page_numbers = []
+        self.shared_ids = reachable_ids(template_pdf.pages) if template_pdf is not None else set()
+        self.shared = {}  # id -> (object number, object) for template objects, kept for the whole file
+        self.local = {}   # id -> object number for the page being written
+        self.pending = []
+
+    # --- formatting ---
+    def ref(self, obj):
+        key = id(obj)
+        if key in self.shared:
+            return f"{self.shared[key][0]} 0 R"
+        if key in self.local:
+            return f"{self.local[key]} 0 R"
+        number = self.next_number
+        self.next_number += 1
+        if key in self.shared_ids:
+            self.shared[key] = (number, obj)
+        else:
+            self.local[key] = number
+        self.pending.append((number, obj))
+        return f"{number} 0 R"
+
+    def format(self, obj, parent=None):
+        if isinstance(obj, PdfDict):
+            if obj.indirect or obj.stream is not None:
+                return self.ref(obj)
+            return self.format_dict(obj, parent)
+        if isinstance(obj, PdfArray):
+            if getattr(obj, "indirect", False):
+                return self.ref(obj)
+            return "[" + " ".join(self.format(v) for v in obj) + "]"
+        if isinstance(obj, (list, tuple)):
+            return "[" + " ".join(self.format(v) for v in obj) + "]"
+        if isinstance(obj, dict):
+            return self.format_dict(PdfDict(obj), parent)
+        if hasattr(obj, "indirect"):
+            return str(getattr(obj, "encoded", None) or obj)
+        return user_fmt(obj)
+
+    def format_dict(self, obj, parent=None):
+        parts = []
+        for key, value in obj.iteritems():
+            if key == "/Parent" and parent is not None:
+                value_text = parent
+            elif isinstance(value, PdfDict) and value.Type in ("/Page", "/Pages"):
+                continue  # back-links into the template's own page tree (annotation /P etc.)
+            else:
+                value_text = self.format(value)
+            parts.append(f"{getattr(key, 'encoded', None) or key} {value_text}")
+        return "<<" + " ".join(parts) + ">>"
+
+    def write_object(self, number, body, stream=None):
+        self.offsets[number] = self.f.tell()
+        self.f.write(f"{number} 0 obj\n{body}\n".encode("latin-1"))
+        if stream is not None:
+            self.f.write(b"stream\n" + stream + b"\nendstream\n")
+        self.f.write(b"endobj\n")
+
+    def flush_pending(self):
+        while self.pending:
+            number, obj = self.pending.pop()
+            if isinstance(obj, PdfDict) and obj.stream is not None:
+                # Template objects are shared with the next file, so compress into a copy of the header
+                header = PdfDict(obj)
+                data = obj.stream.encode("latin-1")
+                if obj.Filter is None and len(data) > 64:
+                    data = zlib.compress(data, 9)
+                    header.Filter = PdfName.FlateDecode
+                header.Length = len(data)
+                self.write_object(number, self.format_dict(header), data)
+            elif isinstance(obj, PdfDict):
+                self.write_object(number, self.format_dict(obj))
+            else:
+                self.write_object(number, "[" + " ".join(self.format(v) for v in obj) + "]")
+
+    # --- public API ---
+    def add_page(self, page):
+        number = self.next_number
+        self.next_number += 1
+        self.local[id(page)] = number
+        self.write_object(number, self.format_dict(page, parent=f"{self.PAGES} 0 R"))
+        self.flush_pending()
+        self.page_numbers.append(number)
+        self.local.clear()  # this job's objects are on disk; let them go
+
+    def add_pdf(self, pdf):
+        for page in pdf.pages:
+            self.add_page(page)
+
+    def close(self):
+        kids = " ".join(f"{n} 0 R" for n in self.page_numbers)
+        self.write_object(self.PAGES, f"<</Type /Pages /Count {len(self.page_numbers)} /Kids [{kids}]>>")
+        self.write_object(self.CATALOG, f"<</Type /Catalog /Pages {self.PAGES} 0 R>>")
+        xref_offset = self.f.tell()
+        size = self.next_number
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for number in range(1, size):
+            offset = self.offsets.get(number)
+            lines.append(f"{offset:010d} 00000 n \n" if offset is not None else "0000000000 65535 f \n")
+        self.f.write("".join(lines).encode("latin-1"))
+        self.f.write(f"trailer\n<</Size {size} /Root {self.CATALOG} 0 R>>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1"))
+        self.f.close()
+        self.shared.clear()
+        return os.path.getsize(self.path)
+
+class RollingPdfWriter:
+    """Like StreamingPdfWriter but starts a new file every docs_per_file documents."""
+
+    def __init__(self, path_pattern, docs_per_file, template_pdf=None):
+        self.path_pattern = path_pattern  # e.g. "batch_{:03d}.pdf"
+        self.docs_per_file = docs_per_file
+        self.template_pdf = template_pdf
+        self.file_index = 0
+        self.docs_in_file = 0
+        self.writer = None
+        self.paths = []
+
+    def add_pdf(self, pdf):
+        if self.writer is None:
+            self.file_index += 1
+            path = self.path_pattern.format(self.file_index)
+            self.writer = StreamingPdfWriter(path, self.template_pdf)
+            self.paths.append(path)
+        self.writer.add_pdf(pdf)
+        self.docs_in_file += 1
+        if self.docs_in_file >= self.docs_per_file:
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.docs_in_file = 0
+        return self.paths
+
+# -------------------------------
+# Memory check: python batch_writer.py TEMPLATE COUNT OUTPUT
+# -------------------------------
+if __name__ == "__main__":
+    import resource
+    from form_fill import fill_and_flatten
+
+    template_file, count, output = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+    template_pdf = PdfReader(template_file)
+    strip_unused(template_pdf)
+    writer = StreamingPdfWriter(output, template_pdf)
+    for n in range(1, count + 1):
+        job_pdf = fresh_copy(template_pdf)
+        names = [a.T.to_unicode() for p in job_pdf.pages for a in (p.Annots or []) if a.T and a.FT == "/Tx"]
+        fill_and_flatten(job_pdf, {name: f"Job {n} {name}" for name in names}, {})
+        writer.add_pdf(job_pdf)
+        if n in (1, 10, 100) or n % 500 == 0 or n == count:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{n:6d} permits  peak RSS {peak:7.1f} MB")
+    print(f" {writer.close() / 1024:.0f} KB written to '{output}'")
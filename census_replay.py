@@ -0,0 +1,318 @@
+# -------------------------------
+# Local stand-in for the Census geocoder, so lookups can be tested and timed
+# without touching geocoding.geo.census.gov.
+#
+#   python census_replay.py --port 8765 --latency lognormal:120,0.5 --error-rate 0.02
+#   CENSUS_BASE_URL=http://127.0.0.1:8765 python Permit_cost.py
+#
+# Serves the three endpoints the scripts use, answered from census_fixtures.json:
+#   /geocoder/locations/onelineaddress     address -> coordinates
+#   /geocoder/geographies/coordinates      coordinates -> County Subdivision / Place
+#   /geocoder/locations/addressbatch       CSV upload, CSV back (the Census batch format)
+# Addresses are matched by canonical_address(), the same key geocode.py caches on.
+# Latency, HTTP errors and hung requests can be injected; GET /stats shows counts.
+# -------------------------------
+import argparse
+import csv
+import email
+import email.policy
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from address_parser import canonical_address
+
+# -------------------------------
+# Config
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_FILE = os.path.join(BASE_DIR, "census_fixtures.json")
+TEST_ADDRESSES = os.path.join(BASE_DIR, "Test addresses.txt")
+LIVE_BASE_URL = "https://geocoding.geo.census.gov"
+DEFAULT_PORT = 8765
+HANG_SECONDS = 30  # a "timeout" fault holds the request this long (geocode.TIMEOUT is 10)
+
+# -------------------------------
+# Fixtures
+# -------------------------------
+def load_fixtures(path=FIXTURE_FILE):
+    """Index the recorded entries by canonical address and by rounded coordinates."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)["entries"]
+    by_address = {}
+    by_point = {}
+    for entry in entries:
+        by_address[canonical_address(entry["address"])] = entry
+        by_point[point_key(entry["x"], entry["y"])] = entry
+    return entries, by_address, by_point
+
+def point_key(x, y):
+    return round(float(x), 4), round(float(y), 4)
+
+def read_test_addresses(path=TEST_ADDRESSES):
+    """(label, address) pairs from "Test addresses.txt" (a title line, then label / address lines)."""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()][1:]
+    return list(zip(lines[::2], lines[1::2]))
+
+# -------------------------------
+# Faults
+# -------------------------------
+def parse_latency(spec):
+    """
+    Latency distribution in milliseconds -> function(rng) giving seconds:
+      "0" or "50"         fixed
+      "20-200"            uniform
+      "exp:80"            exponential with that mean
+      "lognormal:80,0.5"  lognormal with that median and sigma (long tail, like the real thing)
+    """
+    spec = str(spec).strip()
+    if spec.startswith("exp:"):
+        mean = float(spec[4:]) / 1000
+        return lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0
+    if spec.startswith("lognormal:"):
+        median, sigma = (float(v) for v in spec[len("lognormal:"):].split(","))
+        return lambda rng: rng.lognormvariate(math.log(median / 1000), sigma)
+    if re.fullmatch(r"[\d.]+-[\d.]+", spec):
+        low, high = (float(v) / 1000 for v in spec.split("-"))
+        return lambda rng: rng.uniform(low, high)
+    fixed = float(spec) / 1000
+    return lambda rng: fixed
+
+# -------------------------------
+# Server
+# -------------------------------
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixtures=FIXTURE_FILE, latency="0", error_rate=0.0, timeout_rate=0.0,
+                 hang=HANG_SECONDS, seed=None, verbose=False):
+        super().__init__(address, ReplayHandler)
+        self.entries, self.by_address, self.by_point = load_fixtures(fixtures)
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {"requests": {}, "errors": 0, "timeouts": 0, "misses": 0}
+
+    def count(self, key, endpoint=None):
+        with self.lock:
+            if endpoint:
+                self.stats["requests"][endpoint] = self.stats["requests"].get(endpoint, 0) + 1
+            else:
+                self.stats[key] += 1
+
+    def draw_fault(self):
+        """(delay seconds, fault) for one request; fault is None, "error" or "timeout"."""
+        with self.lock:  # random.Random isn't safe to share between threads
+            delay = self.latency(self.rng)
+            roll = self.rng.random()
+        if roll < self.timeout_rate:
+            return self.hang, "timeout"
+        if roll < self.timeout_rate + self.error_rate:
+            return delay, "error"
+        return delay, None
+
+    # --- answers ---
+    def match(self, address):
+        return self.by_address.get(canonical_address(address))
+
+    def locations(self, address):
+        entry = self.match(address)
+        matches = []
+        if entry:
+            matches.append({"matchedAddress": entry["matched_address"],
+                            "coordinates": {"x": entry["x"], "y": entry["y"]},
+                            "tigerLine": {"side": "L", "tigerLineId": ""}})
+        else:
+            self.count("misses")
+        return {"result": {"input": {"address": {"address": address}}, "addressMatches": matches}}
+
+    def geographies(self, x, y):
+        entry = self.by_point.get(point_key(x, y))
+        geographies = {}
+        if entry:
+            if entry.get("county_subdivision"):
+                geographies["County Subdivisions"] = [{"NAME": entry["county_subdivision"]}]
+            if entry.get("place"):
+                geographies["Places"] = [{"NAME": entry["place"]}]
+            if entry.get("county"):
+                geographies["Counties"] = [{"NAME": entry["county"]}]
+        else:
+            self.count("misses")
+        return {"result": {"input": {"location": {"x": x, "y": y}}, "geographies": geographies}}
+
+    def batch(self, rows):
+        """Census batch rows: id, street, city, state, zip -> CSV in the Census batch result layout."""
+        out = io.StringIO()
+        writer = csv.writer(out, quoting=csv.QUOTE_ALL)
+        for row in rows:
+            if not row:
+                continue
+            row = (row + [""] * 5)[:5]
+            one_line = f"{row[1]}, {row[2]}, {row[3]} {row[4]}".strip(", ")
+            entry = self.match(one_line)
+            if entry:
+                writer.writerow([row[0], one_line, "Match", "Exact", entry["matched_address"],
+                                 f"{entry['x']},{entry['y']}", "", "L"])
+            else:
+                self.count("misses")
+                writer.writerow([row[0], one_line, "No_Match"])
+        return out.getvalue()
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def reply(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timeout) before we answered
+
+    def faulted(self, endpoint):
+        """Apply injected latency/faults; True if the request was answered with an error."""
+        self.server.count(None, endpoint)
+        delay, fault = self.server.draw_fault()
+        if fault == "timeout":
+            self.server.count("timeouts")
+        if delay:
+            time.sleep(delay)
+        if fault == "error":
+            self.server.count("errors")
+            self.reply(self.server.rng.choice([500, 502, 503]), {"errors": ["injected failure"]})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/stats":
+            with self.server.lock:
+                self.reply(200, self.server.stats)
+            return
+        if url.path == "/geocoder/locations/onelineaddress":
+            if self.faulted("onelineaddress"):
+                return
+            if "address" not in params:
+                self.reply(400, {"errors": ["Address cannot be empty"]})
+                return
+            self.reply(200, self.server.locations(params["address"]))
+        elif url.path == "/geocoder/geographies/coordinates":
+            if self.faulted("coordinates"):
+                return
+            try:
+                x, y = float(params["x"]), float(params["y"])
+            except (KeyError, ValueError):
+                self.reply(400, {"errors": ["x and y are required numbers"]})
+                return
+            self.reply(200, self.server.geographies(x, y))
+        else:
+            self.reply(404, {"errors": [f"unknown endpoint {url.path}"]})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/geocoder/locations/addressbatch":
+            self.reply(404, {"errors": [f"unknown endpoint {url.path}"]})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.faulted("addressbatch"):
+            return
+        header = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode("latin-1")
+        message = email.message_from_bytes(header + body, policy=email.policy.default)
+        upload = None
+        if message.is_multipart():
+            for part in message.iter_parts():
+                if part.get_param("name", header="content-disposition") == "addressFile":
+                    upload = part.get_payload(decode=True)
+        if upload is None:
+            self.reply(400, {"errors": ["addressFile is required"]})
+            return
+        rows = list(csv.reader(io.StringIO(upload.decode("utf-8-sig"))))
+        self.reply(200, self.server.batch(rows), "text/csv")
+
+# -------------------------------
+# Running it from other scripts
+# -------------------------------
+def start_replay(port=0, **options):
+    """Start a replay server on a background thread; returns it (server.base_url, server.shutdown())."""
+    server = ReplayServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# -------------------------------
+# Recording fixtures from the live geocoder
+# -------------------------------
+def record_fixtures(path=FIXTURE_FILE):
+    """Look every test address up on the real Census geocoder and save the answers as fixtures."""
+    import geocode
+    geocode.set_base_url(LIVE_BASE_URL)
+    entries = []
+    for label, address in read_test_addresses():
+        lon, lat = geocode.get_census_coordinates(address)
+        if lon is None:
+            print(f" No Census match for {label}: {address} (left out)")
+            continue
+        geographies = geocode.get_census_geographies(lon, lat) or {}
+        first = lambda layer: (geographies.get(layer) or [{}])[0].get("NAME")
+        entries.append({"label": label, "address": address, "matched_address": address.upper(),
+                        "x": lon, "y": lat, "county_subdivision": first("County Subdivisions"),
+                        "place": first("Places"), "county": first("Counties")})
+        print(f" {label:32s} {first('County Subdivisions') or '-':22s} {first('Places') or '-'}")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"note": f"Recorded from {LIVE_BASE_URL}", "entries": entries}, f, indent=1)
+    print(f" {len(entries)} fixtures written to '{path}'")
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded Census geocoder answers locally.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--fixtures", default=FIXTURE_FILE)
+    parser.add_argument("--latency", default="0", help='ms: "50", "20-200", "exp:80" or "lognormal:80,0.5"')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 500/502/503")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of requests held for --hang seconds")
+    parser.add_argument("--hang", type=float, default=HANG_SECONDS)
+    parser.add_argument("--seed", type=int, help="repeatable latency and faults")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--record", action="store_true", help="refresh the fixtures from the live geocoder and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.fixtures)
+    else:
+        server = ReplayServer(("127.0.0.1", args.port), args.fixtures, args.latency, args.error_rate,
+                              args.timeout_rate, args.hang, args.seed, args.verbose)
+        print(f" Serving {len(server.entries)} addresses at {server.base_url}")
+        print(f" Use it with: CENSUS_BASE_URL={server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(f" {json.dumps(server.stats)}")
@@ -0,0 +1,261 @@
+import io
+import threading
+from pdfrw import PdfReader, PageMerge, PdfDict, PdfArray, PdfName
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from profiling import span, traced
+
+# -------------------------------
+# Config
+# -------------------------------
+DEFAULT_FONT_SIZE = 10
+MIN_FONT_SIZE = 6
+TEXT_PADDING = 2  # points between the field border and the text
+
+# -------------------------------
+# Helpers
+# -------------------------------
+parsed_ahead = {}  # path -> Future of the template parsed at startup (warmup.py); handed out once, filling changes it
+signatures = {}    # path -> decoded signature image, shared by every permit
+signature_lock = threading.Lock()
+
+def parse_template(path, data=None):
+    with span("template load", file=path):
+        return PdfReader(path) if data is None else PdfReader(fdata=data)
+
+def load_template(path, data=None):
+    """Parse a permit template from its file, or from its bytes if they were already read."""
+    ahead = parsed_ahead.pop(path, None) if data is None else None
+    if ahead is not None:
+        return ahead.result()
+    return parse_template(path, data)
+
+def signature_image(path):
+    """The signature image, read and decoded once."""
+    with signature_lock:
+        if path not in signatures:
+            with span("signature decode", file=path):
+                image = ImageReader(path)
+                image.getRGBData()  # decode now rather than inside the first drawImage
+            signatures[path] = image
+        return signatures[path]
+
+def page_size(pdf):
+    page0 = pdf.pages[0]
+    try:
+        llx, lly, urx, ury = map(float, page0.MediaBox)
+        return urx - llx, ury - lly
+    except Exception:
+        return letter
+
+def field_name(annot):
+    """Field name of a widget (kids of a radio/checkbox group carry it on the parent)."""
+    while annot is not None:
+        if annot.T is not None:
+            return annot.T.to_unicode()
+        annot = annot.Parent
+    return None
+
+def field_type(annot):
+    while annot is not None:
+        if annot.FT is not None:
+            return annot.FT
+        annot = annot.Parent
+    return None
+
+def has_form_fields(pdf):
+    for page in pdf.pages:
+        for annot in page.Annots or []:
+            if annot.Subtype == "/Widget":
+                return True
+    return False
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def fit_font_size(text, width, font_size):
+    """Shrink the font until the text fits inside the field."""
+    size = font_size
+    while size > MIN_FONT_SIZE and stringWidth(text, "Helvetica", size) > width - 2 * TEXT_PADDING:
+        size -= 0.5
+    return size
+
+def helvetica():
+    return PdfDict(Type=PdfName.Font, Subtype=PdfName.Type1,
+                   BaseFont=PdfName.Helvetica, Encoding=PdfName.WinAnsiEncoding)
+
+def text_appearance(text, width, height, font_size, font):
+    """Build a Form XObject that draws the value the way a viewer would show it."""
+    size = fit_font_size(text, width, min(font_size, height))
+    baseline = (height - size) / 2 + 0.22 * size
+    encoded = text.encode("cp1252", "replace").decode("latin-1")
+    stream = (
+        f"/Tx BMC q BT /Helv {size:.2f} Tf 0 g "
+        f"{TEXT_PADDING} {baseline:.2f} Td ({pdf_escape(encoded)}) Tj ET Q EMC"
+    )
+    xobj = PdfDict(Type=PdfName.XObject, Subtype=PdfName.Form,
+                   BBox=PdfArray([0, 0, width, height]),
+                   Resources=PdfDict(Font=PdfDict(Helv=font)))
+    xobj.stream = stream
+    return xobj
+
+def on_appearance(annot):
+    """The 'checked' appearance stream of a checkbox widget, whatever its on-state is called."""
+    normal = annot.AP.N if annot.AP else None
+    if normal is None or normal.stream is not None:
+        return normal
+    for state, xobj in normal.items():
+        if state != "/Off":
+            return xobj
+    return None
+
+def current_appearance(annot):
+    """What the widget shows right now (used for fields we leave alone)."""
+    normal = annot.AP.N if annot.AP else None
+    if normal is None or normal.stream is not None:
+        return normal
+    state = annot.AS
+    if state is None or state == "/Off":
+        return None
+    return normal[state]
+
+def placement(xobj, rect):
+    """cm operands that map an appearance's BBox onto the widget Rect."""
+    llx, lly, urx, ury = map(float, rect)
+    bbox = [float(v) for v in (xobj.BBox or [0, 0, urx - llx, ury - lly])]
+    bw = (bbox[2] - bbox[0]) or 1.0
+    bh = (bbox[3] - bbox[1]) or 1.0
+    sx = (urx - llx) / bw
+    sy = (ury - lly) / bh
+    return f"{sx:.4f} 0 0 {sy:.4f} {llx - bbox[0] * sx:.2f} {lly - bbox[1] * sy:.2f} cm"
+
+# -------------------------------
+# Fill + flatten in one pass
+# -------------------------------
+@traced("fill fields")
+def fill_and_flatten(pdf, text_values, checkbox_values, font_size=DEFAULT_FONT_SIZE):
+    """
+    Fill the template's own AcroForm fields and bake them into the page.
+    The original page content is left untouched: each page just gets one extra
+    content stream that paints the field appearances as XObjects.
+    Returns the set of field names that were filled.
+    """
+    font = helvetica()
+    filled = set()
+
+    for page_number, page in enumerate(pdf.pages):
+        annots = page.Annots or []
+        keep = PdfArray()
+        draws = []
+        xobjects = PdfDict()
+
+        for annot in annots:
+            if annot.Subtype != "/Widget":
+                keep.append(annot)
+                continue
+            name = field_name(annot)
+            rect = annot.Rect
+            if annot.F is not None and int(annot.F) & 2:  # hidden
+                continue
+
+            ftype = field_type(annot)
+            xobj = None
+            if ftype == "/Tx" and name in text_values:
+                value = str(text_values[name] or "")
+                if value:
+                    width = float(rect[2]) - float(rect[0])
+                    height = float(rect[3]) - float(rect[1])
+                    xobj = text_appearance(value, width, height, font_size, font)
+                filled.add(name)
+            elif ftype == "/Btn" and name in checkbox_values:
+                if checkbox_values[name]:
+                    xobj = on_appearance(annot)
+                filled.add(name)
+            else:
+                xobj = current_appearance(annot)
+
+            if xobj is None:
+                continue
+            if xobj.Subtype is None:
+                xobj.Type = PdfName.XObject
+                xobj.Subtype = PdfName.Form
+            xname = f"FlatField{page_number}_{len(draws)}"
+            xobjects[PdfName(xname)] = xobj
+            draws.append(f"q {placement(xobj, rect)} /{xname} Do Q")
+
+        page.Annots = keep if keep else None
+        if not draws:
+            continue
+
+        resources = page.Resources or PdfDict()
+        page_xobjects = resources.XObject or PdfDict()
+        page_xobjects.update(xobjects)
+        resources.XObject = page_xobjects
+        page.Resources = resources
+
+        # Wrap the original content in q/Q so our drawing starts from a clean graphics state
+        contents = page.Contents
+        streams = list(contents) if isinstance(contents, PdfArray) else ([contents] if contents else [])
+        opener = PdfDict()
+        opener.stream = "q\n"
+        closer = PdfDict()
+        closer.stream = "\nQ\n" + "\n".join(draws) + "\n"
+        page.Contents = PdfArray([opener] + streams + [closer])
+
+    pdf.Root.AcroForm = None
+    return filled
+
+# -------------------------------
+# Overlay fallback (templates without fields)
+# -------------------------------
+def draw_overlay(pdf, text_values, checkbox_values, positions, font_size=DEFAULT_FONT_SIZE,
+                 checkbox_size=8, draw_extra=None):
+    """
+    Draw onto the first page with reportlab and merge it, the way the scripts used to.
+    positions maps field name -> (x, y) in inches from the top-left corner.
+    draw_extra(c, to_points_top_origin) can add things no field covers (signatures).
+    """
+    page_width_pts, page_height_pts = page_size(pdf)
+
+    def to_points_top_origin(x_in_inches, y_in_inches):
+        return x_in_inches * 72.0, page_height_pts - y_in_inches * 72.0
+
+    with span("canvas render"):
+        packet = io.BytesIO()
+        c = canvas.Canvas(packet, pagesize=(page_width_pts, page_height_pts))
+        c.setFont("Helvetica", font_size)
+        for name, value in text_values.items():
+            if value and name in positions:
+                c.drawString(*to_points_top_origin(*positions[name]), str(value))
+        for name, checked in checkbox_values.items():
+            if checked and name in positions:
+                c.rect(*to_points_top_origin(*positions[name]), checkbox_size, checkbox_size, fill=1)
+        if draw_extra:
+            draw_extra(c, to_points_top_origin)
+        c.save()
+        packet.seek(0)
+
+    with span("PageMerge"):
+        overlay_pdf = PdfReader(packet)
+        for page, overlay in zip(pdf.pages, overlay_pdf.pages):
+            PageMerge(page).add(overlay).render()
+
+def fill_template(pdf, text_fields, checkboxes, font_size=DEFAULT_FONT_SIZE,
+                  checkbox_size=8, draw_extra=None):
+    """
+    Use the template's own fields when it has them, otherwise fall back to the overlay.
+    text_fields maps field name -> (text, x, y) and checkboxes maps field name -> (checked, x, y),
+    with x/y in inches from the top-left (only used by the overlay fallback).
+    """
+    text_values = {name: spec[0] for name, spec in text_fields.items()}
+    checkbox_values = {name: spec[0] for name, spec in checkboxes.items()}
+    if has_form_fields(pdf):
+        fill_and_flatten(pdf, text_values, checkbox_values, font_size)
+        if draw_extra:
+            draw_overlay(pdf, {}, {}, {}, font_size, checkbox_size, draw_extra)
+    else:
+        positions = {name: spec[1:] for name, spec in list(text_fields.items()) + list(checkboxes.items())}
+        draw_overlay(pdf, text_values, checkbox_values, positions, font_size, checkbox_size, draw_extra)
+    return pdf
@@ -0,0 +1,302 @@
+# -------------------------------
+# Census geocoder calls shared by Permit_cost.py and Address_check_for_permit.py.
+# Results are cached by canonical address, so "69 N Cayuga Rd, Williamsville, NY 14221",
+# "69 North Cayuga Road Williamsville NY" and the same address with "Apt 2" cost one lookup.
+# With use_store(), results are also kept in the shared permit_store.db so other
+# users (and tomorrow's runs) don't repeat the lookup either.
+# -------------------------------
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+from address_parser import canonical_address, geocode_query
+import metrics
+from profiling import span, traced
+
+# Point CENSUS_BASE_URL at census_replay.py (e.g. http://127.0.0.1:8765) to work offline
+CENSUS_BASE_URL = os.environ.get("CENSUS_BASE_URL", "https://geocoding.geo.census.gov").rstrip("/")
+CENSUS_ADDRESS_URL = CENSUS_BASE_URL + "/geocoder/locations/onelineaddress"
+CENSUS_GEOGRAPHIES_URL = CENSUS_BASE_URL + "/geocoder/geographies/coordinates"
+TIMEOUT = 10
+MIN_REQUEST_SECONDS = 0.2  # not worth starting a Census call with less budget left than this
+
+# Hedging: if a call hasn't answered by the HEDGE_PERCENTILE of recent latencies, send a
+# duplicate and take whichever answers first. CENSUS_HEDGE=1 (or enable_hedging()) turns it on.
+HEDGE_PERCENTILE = 95
+HEDGE_DEFAULT_DELAY = 1.0  # seconds, until HEDGE_MIN_SAMPLES latencies have been seen
+HEDGE_MIN_DELAY = 0.05
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MAX_RATIO = 0.1      # at most one duplicate per 10 requests over time...
+HEDGE_MAX_BURST = 3        # ...and never more than this many saved up
+
+# Addresses Census couldn't match (a new subdivision not in TIGER yet) are remembered for
+# NO_MATCH_TTL_DAYS, along with any township typed in for them, then tried again.
+NO_MATCH_TTL_DAYS = 7
+
+# canonical address -> (lon, lat); (lon, lat) rounded -> geographies dict
+coordinates_cache = {}
+geographies_cache = {}
+no_match_cache = {}  # canonical address -> (when Census had no match, epoch seconds; township typed in or None)
+store = None  # PermitStore shared between users, set by use_store()
+
+hedger = None  # Hedger when hedging is on
+
+# One session for every Census call, so the TLS connection is made once and reused
+# (warm_connection() makes it at startup, before the first lookup needs it)
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_maxsize=32))
+session.mount("http://", HTTPAdapter(pool_maxsize=32))
+
+def use_store(permit_store):
+    global store
+    store = permit_store
+
+def set_base_url(base_url):
+    """Send Census calls somewhere else (the replay server) for the rest of this run."""
+    global CENSUS_BASE_URL, CENSUS_ADDRESS_URL, CENSUS_GEOGRAPHIES_URL
+    CENSUS_BASE_URL = base_url.rstrip("/")
+    CENSUS_ADDRESS_URL = CENSUS_BASE_URL + "/geocoder/locations/onelineaddress"
+    CENSUS_GEOGRAPHIES_URL = CENSUS_BASE_URL + "/geocoder/geographies/coordinates"
+
+# -------------------------------
+# Time budget for one address
+# -------------------------------
+class OutOfTime(Exception):
+    pass
+
+class Deadline:
+    """
+    One address's time budget, shared by every lookup made for it, so the worst case
+    is the budget rather than a 10 s timeout per Census call. Deadline(None) never expires.
+    """
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        return float("inf") if self.expires is None else max(0.0, self.expires - time.monotonic())
+
+    def allows_request(self):
+        return self.remaining() >= MIN_REQUEST_SECONDS
+
+    def timeout(self):
+        return min(TIMEOUT, self.remaining())
+
+# -------------------------------
+# Hedged requests
+# -------------------------------
+class Hedger:
+    """Sends a duplicate of a slow Census call, within a budget of extra requests."""
+    def __init__(self, percentile=HEDGE_PERCENTILE, max_ratio=HEDGE_MAX_RATIO, max_burst=HEDGE_MAX_BURST):
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.max_burst = max_burst
+        self.tokens = 1.0
+        self.latencies = {}  # endpoint -> recent latencies of first attempts
+        self.lock = threading.Lock()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="census")
+
+    def delay(self, endpoint):
+        with self.lock:
+            recent = sorted(self.latencies.get(endpoint, ()))
+        if len(recent) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, recent[min(len(recent) - 1, len(recent) * self.percentile // 100)])
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            self.latencies.setdefault(endpoint, collections.deque(maxlen=200)).append(seconds)
+
+    def take_token(self):
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def get(self, url, params, endpoint, timeout):
+        with self.lock:  # every request earns a fraction of a duplicate
+            self.tokens = min(self.max_burst, self.tokens + self.max_ratio)
+        start = time.perf_counter()
+        primary = self.pool.submit(session.get, url, params=params, timeout=timeout)
+        # The unhedged latency is what the percentile should track, so record the first attempt's
+        primary.add_done_callback(lambda f: f.exception() is None and self.record(endpoint, time.perf_counter() - start))
+        try:
+            return primary.result(timeout=self.delay(endpoint))
+        except concurrent.futures.TimeoutError:
+            pass
+
+        remaining = timeout - (time.perf_counter() - start)
+        if remaining < MIN_REQUEST_SECONDS or not self.take_token():
+            metrics.HEDGES.inc(endpoint, "capped")
+            return primary.result()
+        hedge = self.pool.submit(session.get, url, params=params, timeout=remaining)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    for loser in pending:
+                        # requests can't be interrupted mid-read: drop the loser's answer when it lands
+                        loser.cancel()
+                        loser.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                    metrics.HEDGES.inc(endpoint, "won" if future is hedge else "lost")
+                    return future.result()
+
+def enable_hedging(percentile=HEDGE_PERCENTILE, max_ratio=HEDGE_MAX_RATIO):
+    global hedger
+    hedger = Hedger(percentile, max_ratio)
+
+if os.environ.get("CENSUS_HEDGE", "") not in ("", "0"):
+    enable_hedging()
+
+def warm_connection(timeout=3):
+    """Open the connection to Census (DNS, TCP, TLS) ahead of the first lookup; errors are left for that lookup."""
+    try:
+        with span("census connect"):
+            session.head(CENSUS_BASE_URL + "/geocoder", timeout=timeout)
+    except requests.RequestException:
+        pass
+
+# -------------------------------
+# Negative cache
+# -------------------------------
+def known_no_match(address):
+    """(when Census had no match, township typed in or None) if that was within NO_MATCH_TTL_DAYS, else None."""
+    key = canonical_address(address)
+    if not key:
+        return None
+    entry = no_match_cache.get(key)
+    if entry is None and store is not None:
+        entry = store.get_no_match(key)
+        if entry:
+            no_match_cache[key] = entry
+    if entry is None or time.time() - entry[0] > NO_MATCH_TTL_DAYS * 86400:
+        return None
+    return entry
+
+def remember_no_match(address, township=None):
+    """Census had no answer for the address; township is what the operator entered for it, if anything."""
+    key = canonical_address(address)
+    if not key:
+        return
+    previous = no_match_cache.get(key)
+    if township is None and previous is not None:
+        township = previous[1]  # Census still can't match it, keep what was typed in
+    no_match_cache[key] = (time.time(), township)
+    if store is not None:
+        store.put_no_match(key, geocode_query(address), township)
+
+def forget_no_match(key):
+    no_match_cache.pop(key, None)
+    if store is not None:
+        store.drop_no_match(key)
+
+# -------------------------------
+# Geocode (Census) functions
+# -------------------------------
+def census_get(url, params, endpoint, deadline=None):
+    """One Census HTTP call, timed and counted by endpoint and status; OutOfTime if the budget is spent."""
+    if deadline is not None and not deadline.allows_request():
+        raise OutOfTime(f"{deadline.seconds:g} s budget used up")
+    start = time.perf_counter()
+    status = "error"
+    try:
+        timeout = deadline.timeout() if deadline else TIMEOUT
+        with span("census request", endpoint=endpoint):
+            if hedger is not None:
+                response = hedger.get(url, params, endpoint, timeout)
+            else:
+                response = session.get(url, params=params, timeout=timeout)
+        status = str(response.status_code)
+        return response
+    except requests.Timeout:
+        status = "timeout"
+        raise
+    finally:
+        metrics.CENSUS_REQUESTS.inc(endpoint, status)
+        metrics.CENSUS_SECONDS.observe(time.perf_counter() - start, endpoint)
+
+@traced()
+def get_census_coordinates(address, quiet=False, deadline=None, refresh=False):
+    """
+    (lon, lat) for the address, or (None, None). Addresses Census recently couldn't match
+    come back as (None, None) without a request; refresh=True skips every cache.
+    """
+    key = canonical_address(address)
+    if not refresh:
+        if key and key in coordinates_cache:
+            metrics.GEOCODE_CACHE.inc("memory")
+            return coordinates_cache[key]
+        if key and store is not None:
+            saved = store.get_geocode(key)
+            if saved:
+                metrics.GEOCODE_CACHE.inc("store")
+                coordinates_cache[key] = saved
+                return saved
+        if known_no_match(address):
+            metrics.GEOCODE_CACHE.inc("no match")
+            return None, None
+    metrics.GEOCODE_CACHE.inc("miss")
+
+    query = geocode_query(address)
+    params = {"address": query, "benchmark": "Public_AR_Current", "format": "json"}
+    try:
+        data = census_get(CENSUS_ADDRESS_URL, params, "onelineaddress", deadline).json()
+    except Exception as e:
+        if not quiet:
+            print(" Census geocode request failed:", e)
+        return None, None
+
+    try:
+        matches = data['result']['addressMatches']
+        coords = matches[0]['coordinates']
+    except IndexError:
+        remember_no_match(address)  # a clean "no match", not a bad response
+        return None, None
+    except (KeyError, TypeError):
+        return None, None
+    if key:
+        coordinates_cache[key] = (coords['x'], coords['y'])
+        if store is not None:
+            store.put_geocode(key, query, coords['x'], coords['y'])
+        if refresh:
+            forget_no_match(key)
+    return coords['x'], coords['y']
+
+@traced()
+def get_census_geographies(lon, lat, quiet=False, deadline=None):
+    """The geographies dict for a point ('Places', 'County Subdivisions', ...), or None."""
+    key = (round(lon, 6), round(lat, 6))
+    if key in geographies_cache:
+        metrics.GEOGRAPHIES_CACHE.inc("hit")
+        return geographies_cache[key]
+    metrics.GEOGRAPHIES_CACHE.inc("miss")
+
+    geo_params = {"x": lon, "y": lat, "benchmark": "Public_AR_Current", "vintage": "Current_Current", "format": "json"}
+    try:
+        geographies = census_get(CENSUS_GEOGRAPHIES_URL, geo_params, "geographies", deadline).json()['result']['geographies']
+    except Exception as e:
+        if not quiet:
+            print(" Census geography request failed:", e)
+        return None
+    geographies_cache[key] = geographies
+    return geographies
+
+@traced()
+def get_census_municipality(address, quiet=False, deadline=None):
+    lon, lat = get_census_coordinates(address, quiet, deadline)
+    if lon is None:
+        return None
+    geographies = get_census_geographies(lon, lat, quiet, deadline)
+    if not geographies:
+        return None
+    if geographies.get('Places'):
+        return geographies['Places'][0]['NAME']
+    elif geographies.get('County Subdivisions'):
+        return geographies['County Subdivisions'][0]['NAME']
+    return None
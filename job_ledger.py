@@ -0,0 +1,111 @@
+# -------------------------------
+# Processing ledger: what the pipeline already did for each job, so a re-run only
+# redoes the parts whose inputs changed.
+#
+# Every stage result is stored next to a hash of everything that stage read:
+#   resolve  canonical address + polygon files          -> township, source
+#   fee      township + work details + fee table/rules  -> quote
+#   render   job record + quote + script/template files  -> output files and their hashes
+# A stage whose hash still matches is skipped and its stored result reused.
+# -------------------------------
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import asdict
+
+# -------------------------------
+# Hashing
+# -------------------------------
+def hash_values(*values):
+    """Stable hash of JSON-able values."""
+    text = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hash_files(paths):
+    """Hash of the contents of several files (a missing file hashes as missing)."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(block)
+        else:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+def job_key(job):
+    """Ledger key: the Service Titan job number, or the record itself when there isn't one."""
+    return job.job_number.strip() or "record:" + hash_values(asdict(job))[:16]
+
+# -------------------------------
+# Ledger
+# -------------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_number   TEXT PRIMARY KEY,
+    input_hash   TEXT,
+    resolve_hash TEXT,
+    township     TEXT,
+    source       TEXT,
+    fee_hash     TEXT,
+    quote        TEXT,
+    render_hash  TEXT,
+    files        TEXT,
+    status       TEXT,
+    reason       TEXT,
+    updated      TEXT
+)
+"""
+COLUMNS = ["job_number", "input_hash", "resolve_hash", "township", "source", "fee_hash", "quote",
+           "render_hash", "files", "status", "reason", "updated"]
+
+class JobLedger:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE job_number = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(zip(COLUMNS, row))
+        entry["quote"] = json.loads(entry["quote"]) if entry["quote"] else None
+        entry["files"] = json.loads(entry["files"]) if entry["files"] else {}
+        return entry
+
+    def put(self, entry):
+        values = dict(entry)
+        values["quote"] = json.dumps(values.get("quote")) if values.get("quote") is not None else None
+        values["files"] = json.dumps(values.get("files") or {})
+        values["updated"] = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                [values.get(c) for c in COLUMNS],
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def files_intact(files):
+    """True if every recorded output file is still there with the same contents."""
+    for path, digest in files.items():
+        if not os.path.isfile(path):
+            return False
+        with open(path, "rb") as f:
+            if hash_bytes(f.read()) != digest:
+                return False
+    return True
@@ -0,0 +1,124 @@
+# -------------------------------
+# Job records: one typed record per customer job, read from
+#   - the legacy 7-line Customer_data.txt
+#   - a CSV export (ServiceTitan or our own column names)
+#   - a JSONL file (one JSON object per line)
+# Records are yielded one at a time so a whole day's export is never held in memory.
+# -------------------------------
+import csv
+import json
+import os
+from dataclasses import dataclass, field, fields
+
+# -------------------------------
+# Record
+# -------------------------------
+@dataclass
+class JobRecord:
+    customer_name: str = ""
+    job_address: str = ""
+    phone: str = ""
+    job_number: str = ""
+    install_date: str = ""
+    technician: str = ""
+    secondary_address: str = ""  # where the customer lives if not at the job (landlords)
+    # Optional batch columns; interactive scripts prompt for these instead
+    work_type: str = ""          # F, AC, FAC or B
+    ac_type: str = ""            # N or R
+    installation_cost: str = ""  # for townships priced by installation cost
+    estimated_cost: str = ""
+    job_description: str = ""
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def last_name(self):
+        return self.customer_name.split()[-1] if self.customer_name.split() else "Customer"
+
+LEGACY_ORDER = ["customer_name", "job_address", "phone", "job_number", "install_date",
+                "technician", "secondary_address"]
+
+# Column headers we accept (lower-cased, punctuation dropped) -> record field
+COLUMN_ALIASES = {
+    "customer name": "customer_name", "customer": "customer_name", "name": "customer_name",
+    "job address": "job_address", "address": "job_address", "location address": "job_address",
+    "service address": "job_address", "location": "job_address",
+    "phone": "phone", "phone number": "phone", "customer phone": "phone",
+    "job number": "job_number", "job": "job_number", "job #": "job_number", "job id": "job_number",
+    "service titan job number": "job_number",
+    "install date": "install_date", "date": "install_date", "date of installation": "install_date",
+    "scheduled date": "install_date", "job date": "install_date",
+    "technician": "technician", "tech": "technician", "technicians": "technician",
+    "secondary address": "secondary_address", "billing address": "secondary_address",
+    "owner address": "secondary_address", "customer address": "secondary_address",
+    "work type": "work_type", "ac type": "ac_type",
+    "installation cost": "installation_cost", "install cost": "installation_cost",
+    "estimated cost": "estimated_cost", "job cost": "estimated_cost", "estimate": "estimated_cost",
+    "job description": "job_description", "description": "job_description", "summary": "job_description",
+}
+
+# -------------------------------
+# Parsing
+# -------------------------------
+def normalize_header(header):
+    return " ".join(header.replace("_", " ").replace(":", " ").strip().lower().split())
+
+def record_from_mapping(row):
+    """Build a record from a dict with any of the accepted column names."""
+    record_fields = {f.name for f in fields(JobRecord)}
+    values = {}
+    extra = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        value = "" if value is None else str(value).strip()
+        name = key if key in record_fields else COLUMN_ALIASES.get(normalize_header(key))
+        if name and name != "extra":
+            values[name] = value
+        else:
+            extra[key] = value
+    values["work_type"] = values.get("work_type", "").upper()
+    values["ac_type"] = values.get("ac_type", "").upper()[:1]
+    return JobRecord(extra=extra, **values)
+
+def parse_legacy_lines(raw_lines):
+    """
+    The legacy file is one value per line in LEGACY_ORDER. Blank lines are kept
+    in place so a blank phone or secondary address doesn't shift everything after
+    it, unless the file is longer than 7 lines (blank separators between values),
+    in which case blank lines are dropped.
+    """
+    lines = [line.strip() for line in raw_lines]
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    if len(lines) > len(LEGACY_ORDER):
+        lines = [line for line in lines if line]
+    values = dict(zip(LEGACY_ORDER, lines))
+    return JobRecord(**values)
+
+def load_legacy_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_legacy_lines(f.readlines())
+
+def iter_job_records(path):
+    """Yield JobRecords from a legacy .txt, .csv or .jsonl file, one at a time."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                if any((v or "").strip() for v in row.values() if isinstance(v, str)):
+                    yield record_from_mapping(row)
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield record_from_mapping(json.loads(line))
+    else:
+        yield load_legacy_file(path)
+
+def load_job_record(path):
+    """The first (usually only) record in a job file."""
+    for record in iter_job_records(path):
+        return record
+    raise ValueError(f"No job records in {path}")
@@ -0,0 +1,155 @@
+# -------------------------------
+# Counters and histograms for batch and daemon runs, in Prometheus text format.
+#
+# How often does resolution fall through to Census, or to "Enter manually"? How
+# slow is Census this week? The scripts count it here as they go, and a run
+# writes the totals with write_textfile() (for node_exporter's textfile
+# collector, or just to read) or serves them live on /metrics with serve().
+# -------------------------------
+import http.server
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# -------------------------------
+# Config
+# -------------------------------
+METRICS_FILE = "permit_metrics.prom"
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RENDER_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+LOCK = threading.Lock()
+REGISTRY = []
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def label_text(names, values, extra=()):
+    pairs = [f'{n}="{escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# -------------------------------
+# Metric types
+# -------------------------------
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        with LOCK:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values):
+        return self.values.get(label_values, 0)
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in sorted(self.values.items()):
+            yield f"{self.name}{label_text(self.labels, label_values)} {number(value)}"
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=HTTP_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, seconds, *label_values):
+        with LOCK:
+            row = self.values.setdefault(label_values, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    row[i] += 1
+            row[-2] += seconds
+            row[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, row in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, row):
+                le = ("le", number(bound) if bound != float("inf") else "+Inf")
+                yield f"{self.name}_bucket{label_text(self.labels, label_values, [le])} {count}"
+            yield f"{self.name}_sum{label_text(self.labels, label_values)} {row[-2]!r}"
+            yield f"{self.name}_count{label_text(self.labels, label_values)} {row[-1]}"
+
+def counter(name, help_text, labels=()):
+    metric = Counter(name, help_text, labels)
+    REGISTRY.append(metric)
+    return metric
+
+def histogram(name, help_text, labels=(), buckets=HTTP_BUCKETS):
+    metric = Histogram(name, help_text, labels, buckets)
+    REGISTRY.append(metric)
+    return metric
+
+# -------------------------------
+# What the scripts count
+# -------------------------------
+GEOCODE_CACHE = counter("permit_geocode_cache_total", "Address geocode lookups by where the answer came from (memory, store, no match, miss).", ("result",))
+GEOGRAPHIES_CACHE = counter("permit_geographies_cache_total", "Census geographies lookups by cache result (hit, miss).", ("result",))
+CENSUS_REQUESTS = counter("permit_census_requests_total", "Census HTTP requests by endpoint and HTTP status (or error).", ("endpoint", "status"))
+CENSUS_SECONDS = histogram("permit_census_request_seconds", "Census HTTP request time.", ("endpoint",))
+HEDGES = counter("permit_census_hedges_total", "Duplicate Census requests sent for slow calls, by outcome (won, lost, capped).", ("endpoint", "outcome"))
+POLYGON_OVERRIDES = counter("permit_polygon_override_total", "Addresses settled by an override polygon instead of Census.", ("township",))
+RESOLUTIONS = counter("permit_township_resolutions_total", "Township lookups by how they were settled (saved, zip, street range, entered earlier, polygon, County Subdivision, Place, manual, needs review).", ("source",))
+MANUAL_FALLBACKS = counter("permit_manual_township_total", "Times the township had to be typed in, by why.", ("reason",))
+RENDER_SECONDS = histogram("permit_render_seconds", "Time to fill and render one permit PDF.", ("script",), RENDER_BUCKETS)
+JOBS = counter("permit_jobs_total", "Pipeline jobs finished, by status.", ("status",))
+
+# -------------------------------
+# Export
+# -------------------------------
+def render():
+    with LOCK:
+        lines = [line for metric in REGISTRY for line in metric.lines()]
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path=METRICS_FILE):
+    """Write atomically, so a scraper never reads half a file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+    return path
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        data = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics on a background thread for as long as the run lasts."""
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
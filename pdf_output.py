@@ -0,0 +1,193 @@
+import io
+import os
+import sys
+import zlib
+import tempfile
+import subprocess
+from pdfrw import PdfWriter, PdfDict, PdfArray, PdfName
+from profiling import span
+
+# -------------------------------
+# Config
+# -------------------------------
+COMPRESS_LEVEL = 9
+
+# Which print backend to use: "lp", "startfile" or "file:<folder>" (folder sink for testing)
+PRINTER = os.environ.get("PERMIT_PRINTER", "startfile" if sys.platform == "win32" else "lp")
+
+# Template objects that only matter to screen readers / editors, never to a printed permit
+UNUSED_ROOT_KEYS = ["StructTreeRoot", "MarkInfo", "Metadata", "PieceInfo", "ADBE_FillSignInfo"]
+UNUSED_PAGE_KEYS = ["StructParents", "PieceInfo", "Thumb", "Metadata"]
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def iter_objects(pdf):
+    """Yield every reachable object in the PDF once (dicts and arrays)."""
+    stack = [pdf.Root]
+    seen = set()
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, PdfDict):
+            yield obj
+            stack.extend(v for k, v in obj.items() if k != "/Parent")
+        elif isinstance(obj, PdfArray):
+            yield obj
+            stack.extend(obj)
+
+def compress_streams(pdf, level=COMPRESS_LEVEL):
+    """Flate-compress raw streams and recompress Flate streams if that makes them smaller."""
+    for obj in iter_objects(pdf):
+        if not isinstance(obj, PdfDict) or obj.stream is None:
+            continue
+        raw_filter = obj.Filter
+        if raw_filter is None:
+            data = obj.stream.encode("latin-1")
+        elif raw_filter == "/FlateDecode" and obj.DecodeParms is None:
+            try:
+                data = zlib.decompress(obj.stream.encode("latin-1"))
+            except zlib.error:
+                continue
+        else:
+            continue
+        packed = zlib.compress(data, level)
+        if len(packed) < len(obj.stream):
+            obj.stream = packed.decode("latin-1")
+            obj.Filter = PdfName.FlateDecode
+
+def dedupe_objects(pdf):
+    """Point identical self-contained streams (same dict and same bytes) at one shared copy."""
+    canonical = {}
+    replace = {}
+    for obj in iter_objects(pdf):
+        if not isinstance(obj, PdfDict) or obj.stream is None:
+            continue
+        items = []
+        for k, v in obj.items():
+            if isinstance(v, (PdfDict, PdfArray)):
+                break
+            if k != "/Length":
+                items.append((k, str(v)))
+        else:
+            key = (tuple(sorted(items)), obj.stream)
+            if key in canonical:
+                replace[id(obj)] = canonical[key]
+            else:
+                canonical[key] = obj
+    if not replace:
+        return 0
+
+    for obj in iter_objects(pdf):
+        if isinstance(obj, PdfDict):
+            for k, v in list(obj.items()):
+                if id(v) in replace:
+                    obj[k] = replace[id(v)]
+        elif isinstance(obj, PdfArray):
+            for i, v in enumerate(obj):
+                if id(v) in replace:
+                    obj[i] = replace[id(v)]
+    return len(replace)
+
+def strip_unused(pdf):
+    """Drop tagging, metadata and thumbnails that the printed permit never shows."""
+    for key in UNUSED_ROOT_KEYS:
+        setattr(pdf.Root, key, None)
+    for page in pdf.pages:
+        for key in UNUSED_PAGE_KEYS:
+            setattr(page, key, None)
+
+# -------------------------------
+# Main entry point
+# -------------------------------
+def render_compact_pdf(pdf, strip=True):
+    """Return the compacted PDF as bytes."""
+    with span("compact"):
+        if strip:
+            strip_unused(pdf)
+        dedupe_objects(pdf)
+        compress_streams(pdf)
+    buffer = io.BytesIO()
+    with span("PdfWriter.write"):
+        PdfWriter(compress=True).write(buffer, pdf)
+    return buffer.getvalue()
+
+def save_atomic(data, output_path):
+    """Write bytes next to the target and rename into place, so nobody sees half a PDF."""
+    with span("save file", file=output_path):
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, output_path)
+
+def write_compact_pdf(pdf, output_path, strip=True):
+    """Write a compressed, deduplicated copy of the PDF in one write and report its size."""
+    data = render_compact_pdf(pdf, strip=strip)
+    save_atomic(data, output_path)
+    print(f" {len(data) / 1024:.0f} KB written to '{os.path.basename(output_path)}'")
+    return len(data)
+
+# -------------------------------
+# Print backends
+# -------------------------------
+def print_with_lp(data, name):
+    """Spool the PDF bytes straight to CUPS."""
+    subprocess.run(["lp", "-t", name, "-"], input=data, check=True, capture_output=True)
+
+def print_with_startfile(data, name):
+    """Windows: hand a local temp copy to the default PDF app (never the network Desktop)."""
+    local_path = os.path.join(tempfile.gettempdir(), name)
+    with open(local_path, "wb") as f:
+        f.write(data)
+    os.startfile(local_path, "print")
+
+def print_to_folder(data, name, folder):
+    """Stand-in printer for testing: drop the bytes into a local folder."""
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "wb") as f:
+        f.write(data)
+
+PRINT_BACKENDS = {
+    "lp": print_with_lp,
+    "startfile": print_with_startfile,
+}
+
+def send_to_printer(data, name, printer=None):
+    printer = printer or PRINTER
+    if printer.startswith("file:"):
+        print_to_folder(data, name, printer[len("file:"):])
+    else:
+        PRINT_BACKENDS[printer](data, name)
+
+# -------------------------------
+# Finish a permit: print and/or keep
+# -------------------------------
+def finish_pdf(pdf, output_path, allow_print=True, printer=None):
+    """Render in memory, optionally print, and only touch the Desktop if the user keeps it."""
+    data = render_compact_pdf(pdf)
+    output_filename = os.path.basename(output_path)
+    print(f" PDF created for '{output_filename}' ({len(data) / 1024:.0f} KB)")
+
+    if allow_print:
+        print_now = input("Do you want to print this PDF? (y/n): ").strip().lower()
+        if print_now == "y":
+            try:
+                send_to_printer(data, output_filename, printer)
+                print(" Sent to printer.")
+            except Exception as e:
+                print(f" Could not print file: {e}")
+        else:
+            print(" Printing skipped.")
+
+    keep_pdf = input(f"Do you want to save '{output_filename}' to Desktop? (y/n): ").strip().lower()
+    if keep_pdf == "y":
+        try:
+            save_atomic(data, output_path)
+            print(f" '{output_filename}' saved as '{output_path}'")
+        except Exception as e:
+            print(f" Could not save file: {e}")
+    else:
+        print(f" '{output_filename}' not saved.")
+    return data
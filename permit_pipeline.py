@@ -0,0 +1,560 @@
+# -------------------------------
+# Whole-day pipeline: a jobs export in, finished permits out, nobody re-typing fees.
+#
+#   python permit_pipeline.py jobs.csv --out permits_today
+#
+# Each job flows through staged workers connected by bounded queues:
+#   parse -> geocode -> polygon -> fee -> render -> output
+# so Census lookups for later jobs overlap with rendering earlier ones. Jobs the
+# pipeline can't finish on its own (no township, missing AC type or installation
+# cost) are listed as "needs review" in the summary instead of prompting.
+#
+# With --combined permits.pdf the output stage appends every permit to one PDF as it
+# is rendered (batch_writer.py) instead of saving a file per permit; --per-file N
+# starts a new file (permits_001.pdf, permits_002.pdf, ...) every N permits.
+# -------------------------------
+import argparse
+import csv
+import importlib
+import os
+import queue
+import threading
+import time
+
+import Permit_cost
+import geocode
+import form_fill
+import metrics
+import pdf_output
+import profiling
+import resolve_queue
+import street_segments
+from dataclasses import asdict
+from address_parser import parse_address, canonical_address
+from geocode import get_census_coordinates, use_store, Deadline, known_no_match
+from job_records import iter_job_records
+from pdf_output import render_compact_pdf, save_atomic, strip_unused
+from batch_writer import RollingPdfWriter
+from job_ledger import JobLedger, hash_values, hash_files, hash_bytes, job_key, files_intact
+from permit_store import PermitStore, polygons_hash
+from zip_table import zip_township
+
+# -------------------------------
+# Config
+# -------------------------------
+# township (lower case, as in Permit_fee_check.txt) -> script that fills its permit
+TOWNSHIP_SCRIPTS = {
+    "amherst town": "Amherst_permit",
+    "cheektowaga town": "Cheektowaga_permit",
+    "clarence town": "Clarence_permit",
+    "lockport city": "Lockport_permit",
+    "niagara falls city": "Niagara_falls_permit",
+    "orchard park town": "Orchard_park_permit",
+    "williamsville": "williamsville_permit",
+}
+COVER_SHEET_SCRIPT = "permit_cover_sheet"
+LEDGER_FILE = "permit_ledger.db"  # kept in the --out folder
+QUEUE_SIZE = 16
+GEOCODE_WORKERS = 4   # network bound
+POLYGON_WORKERS = 2   # Census geographies call when no polygon matches
+STATS_INTERVAL = 0.05  # seconds between queue-depth samples
+STOP = object()
+
+# -------------------------------
+# Stages
+# -------------------------------
+class Stage:
+    """Worker threads taking items from in_queue, running func on each and passing them on."""
+
+    def __init__(self, name, func, in_queue, out_queue, workers=1):
+        self.name = name
+        self.func = func
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.workers = workers
+        self.remaining = workers
+        self.lock = threading.Lock()
+        self.count = 0
+        self.busy = 0.0
+        self.depth_samples = []
+        self.max_depth = 0
+        self.threads = [threading.Thread(target=self.run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+
+    def run(self):
+        while True:
+            item = self.in_queue.get()
+            if item is STOP:
+                self.in_queue.put(STOP)  # let the sibling workers see it too
+                with self.lock:
+                    self.remaining -= 1
+                    last = self.remaining == 0
+                if last:
+                    self.out_queue.put(STOP)
+                return
+            start = time.perf_counter()
+            if item["status"] == "ok":
+                try:
+                    self.func(item)
+                except Exception as e:
+                    item["status"] = "error"
+                    item["reason"] = f"{self.name}: {e}"
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.busy += elapsed
+            self.out_queue.put(item)
+
+    def sample(self):
+        depth = self.in_queue.qsize()
+        self.depth_samples.append(depth)
+        self.max_depth = max(self.max_depth, depth)
+
+class PermitPipeline:
+    def __init__(self, out_dir, permit_data, polygons, queue_size=QUEUE_SIZE,
+                 geocode_workers=GEOCODE_WORKERS, polygon_workers=POLYGON_WORKERS, ledger=None, store=None,
+                 budget=Permit_cost.RESOLVE_BUDGET, refresh=False, offline_first=False, combined=None, per_file=0):
+        self.out_dir = out_dir
+        self.permit_data = permit_data
+        self.polygons = polygons
+        self.ledger = ledger
+        self.store = store  # shared geocodes/townships/permit history (permit_store.py)
+        self.budget = budget  # seconds of lookups per address before it goes to "needs review"
+        self.refresh = refresh  # ignore saved and cached townships and ask Census again
+        self.offline_first = offline_first  # Census down: provisional township, retried in the background
+        self.combined = combined  # one PDF for the whole batch instead of a file per permit
+        self.per_file = per_file  # with combined: permits per file before starting the next (0: all in one)
+        self.writer = None
+        # What each stage's results depend on besides the job itself
+        self.polygons_hash = polygons_hash(polygons)
+        self.rules_hash = hash_files([Permit_cost.__file__])  # special-calc formulas live in the code
+        self.script_hashes = {}
+        self.results = []
+        self.scripts = {}
+        self.templates = {}
+        self.template_lock = threading.Lock()
+
+        steps = [
+            ("geocode", self.geocode, geocode_workers),
+            ("polygon", self.polygon, polygon_workers),
+            ("fee", self.fee, 1),
+            ("render", self.render, 1),
+            ("output", self.output, 1),
+        ]
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in steps]
+        self.finished = queue.Queue()  # unbounded: the collector never holds the pipeline up
+        self.stages = []
+        for i, (name, func, workers) in enumerate(steps):
+            out_queue = self.queues[i + 1] if i + 1 < len(steps) else self.finished
+            self.stages.append(Stage(name, func, self.queues[i], out_queue, workers))
+        self.parse_count = 0
+        self.parse_busy = 0.0
+        self.elapsed = 0.0
+
+    # --- helpers ---
+    def script(self, name):
+        if name not in self.scripts:
+            self.scripts[name] = importlib.import_module(name)
+        return self.scripts[name]
+
+    def template(self, module):
+        """Template bytes are read from disk once; each job parses its own copy."""
+        with self.template_lock:
+            if module.TEMPLATE not in self.templates:
+                with open(module.TEMPLATE, "rb") as f:
+                    self.templates[module.TEMPLATE] = f.read()
+        return form_fill.load_template(module.TEMPLATE, self.templates[module.TEMPLATE])
+
+    def script_hash(self, name):
+        """Hash of a script, its template and the shared fill/output code (anything that changes the PDF)."""
+        if name not in self.script_hashes:
+            module = self.script(name)
+            self.script_hashes[name] = hash_files([module.__file__, module.TEMPLATE, form_fill.__file__, pdf_output.__file__])
+        return self.script_hashes[name]
+
+    def batch_filename(self, item, module):
+        """The script's file name, led by the job number so two jobs for the same surname don't overwrite each other."""
+        prefix = item["job"].job_number.strip() or item["key"].split(":")[-1][:8]
+        return f"{prefix} {os.path.basename(module.output_path(item['job']))}"
+
+    def reusable(self, item, stage, stage_hash):
+        """Record the stage's input hash; True if the ledger holds a result for exactly these inputs."""
+        item["hashes"][stage] = stage_hash
+        prev = item["prev"]
+        if prev is not None and prev.get(f"{stage}_hash") == stage_hash:
+            item["reused"].append(stage)
+            return True
+        return False
+
+    def needs_review(self, item, reason):
+        item["status"] = "needs review"
+        item["reason"] = reason
+
+    def provisional(self, item, why):
+        """Offline-first: Census isn't answering, so queue the job and carry on with a provisional township."""
+        if not self.offline_first or self.store is None:
+            return False
+        address = item["job"].job_address
+        known = [row["Township"].strip() for row in self.permit_data.values()]
+        township, guess = resolve_queue.provisional_township(address, self.store, self.polygons_hash, known)
+        resolve_queue.enqueue(self.store, item["job"].job_number, address, township, guess)
+        if not township:
+            return False  # queued, but nothing to go on meanwhile
+        item["township"], item["source"] = township, f"provisional ({guess})"
+        item["provisional"] = True
+        item["reason"] = f"{why}; provisional township, queued to check with Census"
+        metrics.RESOLUTIONS.inc("provisional")
+        return True
+
+    # --- stage functions ---
+    def known_township(self, item):
+        """(township, source) from an earlier answer that needs no lookup, or None."""
+        address = item["job"].job_address
+        if self.store is not None and item["canonical"]:
+            saved = self.store.get_township(item["canonical"], self.polygons_hash)
+            if saved:
+                metrics.RESOLUTIONS.inc("saved")
+                return saved
+        township, zip_code = zip_township(address, self.polygons_hash)
+        if township:
+            metrics.RESOLUTIONS.inc("zip")
+            return township, f"ZIP {zip_code}"
+        township, span = street_segments.segment_township(address, self.store, self.polygons_hash, self.polygons)
+        if township:
+            metrics.RESOLUTIONS.inc("street range")
+            return township, f"street range {span[0]}-{span[1]}"
+        no_match = known_no_match(address)
+        if no_match and no_match[1]:
+            metrics.RESOLUTIONS.inc("entered earlier")
+            return no_match[1], "entered by hand (no Census match)"
+        return None
+
+    def geocode(self, item):
+        resolve_hash = hash_values(item["canonical"], self.polygons_hash)
+        if self.refresh:
+            item["hashes"]["resolve"] = resolve_hash
+        else:
+            if self.reusable(item, "resolve", resolve_hash):
+                item["township"], item["source"] = item["prev"]["township"], item["prev"]["source"]
+                metrics.RESOLUTIONS.inc("saved")
+                return
+            known = self.known_township(item)
+            if known:
+                item["township"], item["source"] = known
+                return
+        deadline = Deadline(self.budget)
+        lon, lat = get_census_coordinates(item["job"].job_address, quiet=True, deadline=deadline, refresh=self.refresh)
+        if lon is None:
+            if not deadline.allows_request():
+                reason = f"no answer from Census within {self.budget:g} s"
+            elif known_no_match(item["job"].job_address):
+                reason = "Census has no match for the address (new build?); resolve it once in Permit_cost.py"
+            else:
+                reason = "Census could not geocode the address"
+            if reason.startswith("Census has no match") or not self.provisional(item, reason):
+                metrics.RESOLUTIONS.inc("needs review")
+                self.needs_review(item, reason)
+            return
+        item["lon"], item["lat"] = lon, lat
+        item["budget_left"] = deadline.remaining()  # time spent queued for the polygon stage doesn't count
+
+    def polygon(self, item):
+        if item["township"]:
+            return  # reused from the ledger
+        township = Permit_cost.polygon_township(item["lon"], item["lat"], self.polygons)
+        if township:
+            item["township"], item["source"] = township, "polygon"
+            metrics.RESOLUTIONS.inc("polygon")
+        else:
+            township, source = Permit_cost.census_township(item["lon"], item["lat"], quiet=True,
+                                                           deadline=Deadline(item["budget_left"]))
+            if not township:
+                reason = f"no township from Census ({source})"
+                if source == "no match" or not self.provisional(item, reason):
+                    metrics.RESOLUTIONS.inc("needs review")
+                    self.needs_review(item, reason)
+                return
+            item["township"], item["source"] = township, f"Census {source}"
+            metrics.RESOLUTIONS.inc(source)
+        if self.store is not None and item["canonical"]:
+            self.store.put_township(item["canonical"], self.polygons_hash, item["township"], item["source"])
+            street_segments.record_point(item["job"].job_address, item["township"], item["lon"], item["lat"],
+                                         self.polygons, self.store, self.polygons_hash)
+
+    def fee(self, item):
+        job = item["job"]
+        if job.work_type not in ["F", "AC", "FAC", "B"]:
+            self.needs_review(item, "work type missing (F, AC, FAC or B)")
+            return
+        installation_cost = Permit_cost.safe_float(job.installation_cost) if job.installation_cost else None
+        # Only this township's row of the fee table matters, so editing another town's fee changes nothing here
+        fee_row = self.permit_data.get(Permit_cost.normalize_township(item["township"]))
+        fee_hash = hash_values(item["township"], job.work_type, job.ac_type, installation_cost, fee_row, self.rules_hash)
+        if self.reusable(item, "fee", fee_hash):
+            quote = item["prev"]["quote"]
+        else:
+            quote = Permit_cost.calc_permit(item["township"], job.work_type, self.permit_data,
+                                            job.ac_type or None, installation_cost)
+            quote["notes"] += Permit_cost.township_notes(item["township"])
+        item["quote"] = quote
+        if not quote["found"]:
+            self.needs_review(item, quote["notes"][0])
+        elif quote["needs"]:
+            self.needs_review(item, f"{quote['needs'].replace('_', ' ')} missing")
+
+    def render(self, item):
+        quote = item["quote"]
+        key = Permit_cost.normalize_township(item["township"])
+        names = []
+        row = self.permit_data.get(key) or {}
+        if quote["required"] and (row.get("Cover_sheet") or "").strip().lower() == "yes":
+            names.append(COVER_SHEET_SCRIPT)
+        if quote["required"] and key in TOWNSHIP_SCRIPTS:
+            names.append(TOWNSHIP_SCRIPTS[key])
+
+        render_hash = hash_values(item["input_hash"], quote, [self.script_hash(name) for name in names])
+        prev_files = (item["prev"] or {}).get("files") or {}
+        # Only this job's own outputs count: the paths it would write now, untouched since
+        own_paths = {os.path.join(self.out_dir, self.batch_filename(item, self.script(name))) for name in names}
+        # A combined PDF is written afresh each run, so every permit goes into it again
+        if (not self.combined and self.reusable(item, "render", render_hash) and set(prev_files) == own_paths
+                and files_intact(prev_files)):
+            item["files"] = list(prev_files)
+            item["file_hashes"] = dict(prev_files)
+            return
+        if "render" in item["reused"]:
+            item["reused"].remove("render")  # outputs were moved or edited; make them again
+        for name in names:
+            module = self.script(name)
+            job = item["job"]
+            with metrics.RENDER_SECONDS.time(name):
+                pdf = module.build_permit(job, module.batch_answers(job, quote), self.template(module))
+                if self.combined:
+                    strip_unused(pdf)
+                    item["pdfs"].append((self.batch_filename(item, module), pdf))  # appended by the output stage
+                else:
+                    item["pdfs"].append((self.batch_filename(item, module), render_compact_pdf(pdf)))
+
+    def combined_writer(self):
+        """Writer for --combined: one file, or a new one every per_file permits."""
+        path = self.combined if os.path.isabs(self.combined) else os.path.join(self.out_dir, self.combined)
+        if self.per_file:
+            stem, ext = os.path.splitext(path)
+            return RollingPdfWriter(f"{stem}_{{:03d}}{ext or '.pdf'}", self.per_file)
+        return RollingPdfWriter(path, float("inf"))
+
+    def output(self, item):
+        if self.writer is not None:
+            for _, pdf in item["pdfs"]:
+                with profiling.span("append to combined PDF"):
+                    self.writer.add_pdf(pdf)
+                if self.writer.paths[-1] not in item["files"]:
+                    item["files"].append(self.writer.paths[-1])
+            item["pdfs"] = []  # this job's pages are on disk; let its objects go
+            return
+        for filename, data in item["pdfs"]:
+            path = os.path.join(self.out_dir, filename)
+            save_atomic(data, path)
+            item["files"].append(path)
+            item["file_hashes"][path] = hash_bytes(data)
+        item["pdfs"] = []  # bytes are on disk now
+
+    # --- running ---
+    def run(self, jobs):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.combined:
+            self.writer = self.combined_writer()
+        if self.store is not None:
+            street_segments.invalidate(self.store, self.polygons_hash)  # street ranges from older polygons
+        retry_worker = None
+        if self.offline_first and self.store is not None:
+            retry_worker = resolve_queue.RetryWorker(
+                self.store, Permit_cost.census_resolver(self.polygons, self.polygons_hash, self.store))
+            retry_worker.start()
+        for stage in self.stages:
+            for thread in stage.threads:
+                thread.start()
+
+        done = threading.Event()
+        def monitor():
+            while not done.wait(STATS_INTERVAL):
+                for stage in self.stages:
+                    stage.sample()
+        monitor_thread = threading.Thread(target=monitor, daemon=True)
+        monitor_thread.start()
+
+        started = time.perf_counter()
+        collector = threading.Thread(target=self.collect, daemon=True)
+        collector.start()
+        try:
+            for job in jobs:  # parse stage: reading and parsing the export
+                start = time.perf_counter()
+                address = parse_address(job.job_address)
+                item = {"index": self.parse_count, "job": job, "address": address, "canonical": canonical_address(address),
+                        "status": "ok", "reason": "",
+                        "township": "", "source": "", "quote": None, "pdfs": [], "files": [], "file_hashes": {},
+                        "key": job_key(job), "input_hash": hash_values(asdict(job)), "prev": None, "hashes": {}, "reused": []}
+                if self.ledger is not None:
+                    item["prev"] = self.ledger.get(item["key"])
+                self.parse_busy += time.perf_counter() - start
+                self.parse_count += 1
+                self.queues[0].put(item)
+        finally:
+            # A broken export still lets the jobs already read finish (and reach the ledger) before the error goes up
+            self.queues[0].put(STOP)
+            for stage in self.stages:
+                for thread in stage.threads:
+                    thread.join()
+            collector.join()
+            if retry_worker is not None:
+                retry_worker.stop()
+            done.set()
+            monitor_thread.join()
+            if self.writer is not None:
+                self.writer.close()
+        self.elapsed = time.perf_counter() - started
+        self.results.sort(key=lambda item: item["index"])  # workers finish out of order
+        return self.results
+
+    def collect(self):
+        while True:
+            item = self.finished.get()
+            if item is STOP:
+                return
+            metrics.JOBS.inc(item["status"])
+            if self.ledger is not None:
+                self.record(item)
+            if self.store is not None and item["files"] and "render" not in item["reused"]:
+                job, quote = item["job"], item["quote"]
+                self.store.add_permit(job.job_number, job.customer_name, item["canonical"], item["township"],
+                                      job.work_type, quote["required"], quote["price"], item["files"])
+            self.results.append(item)
+
+    def record(self, item):
+        """Store the stage results that completed, each with the hash of its inputs."""
+        hashes = item["hashes"]
+        resolved = bool(item["township"]) and not item.get("provisional")  # look provisional ones up again next run
+        quote = item["quote"]
+        priced = quote is not None and quote["found"] and not quote["needs"]
+        rendered = item["status"] == "ok"
+        self.ledger.put({
+            "job_number": item["key"],
+            "input_hash": item["input_hash"],
+            "resolve_hash": hashes.get("resolve") if resolved else None,
+            "township": item["township"],
+            "source": item["source"],
+            "fee_hash": hashes.get("fee") if priced else None,
+            "quote": quote,
+            "render_hash": hashes.get("render") if rendered else None,
+            "files": item["file_hashes"] if rendered else {},
+            "status": item["status"],
+            "reason": item["reason"],
+        })
+
+    def report(self):
+        wall = self.elapsed or 1e-9
+        print(f"{'stage':10s} {'workers':>7s} {'items':>6s} {'items/s':>8s} {'busy s':>7s} {'ms/item':>8s} "
+              f"{'queue avg':>9s} {'queue max':>9s}")
+        print(f"{'parse':10s} {1:7d} {self.parse_count:6d} {self.parse_count / wall:8.1f} {self.parse_busy:7.2f} "
+              f"{self.parse_busy / max(self.parse_count, 1) * 1000:8.1f} {'-':>9s} {'-':>9s}")
+        for stage in self.stages:
+            samples = stage.depth_samples or [0]
+            print(f"{stage.name:10s} {stage.workers:7d} {stage.count:6d} {stage.count / wall:8.1f} {stage.busy:7.2f} "
+                  f"{stage.busy / max(stage.count, 1) * 1000:8.1f} {sum(samples) / len(samples):9.1f} {stage.max_depth:9d}")
+        print(f" {self.parse_count} jobs in {wall:.1f} s")
+        if self.ledger is not None:
+            unchanged = sum(1 for item in self.results if item["reused"] == ["resolve", "fee", "render"])
+            partial = sum(1 for item in self.results if item["reused"]) - unchanged
+            print(f" Ledger: {unchanged} unchanged, {partial} partly reused, {len(self.results) - unchanged - partial} processed fresh")
+
+# -------------------------------
+# Summary
+# -------------------------------
+SUMMARY_COLUMNS = ["Job Number", "Customer", "Address", "Township", "Source", "Permit Required",
+                   "Price", "Status", "Reason", "Notes", "Files", "Reused"]
+
+def summary_rows(results):
+    for item in results:
+        job, quote = item["job"], item["quote"] or {}
+        required = quote.get("required")
+        yield {
+            "Job Number": job.job_number,
+            "Customer": job.customer_name,
+            "Address": job.job_address,
+            "Township": item["township"],
+            "Source": item["source"],
+            "Permit Required": "" if required is None else ("Yes" if required else "No"),
+            "Price": "" if quote.get("price") is None else f"{quote['price']:.2f}",
+            "Status": item["status"],
+            "Reason": item["reason"],
+            "Notes": " | ".join(n.strip() for n in quote.get("notes", [])),
+            "Files": " | ".join(os.path.basename(f) for f in item["files"]),
+            "Reused": " ".join(item["reused"]),
+        }
+
+def write_summary(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(summary_rows(results))
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a jobs export through township lookup, fee calculation and permit filling.")
+    parser.add_argument("jobs", help="jobs export (.csv, .jsonl or a Customer_data.txt-style file)")
+    parser.add_argument("--out", default="permits_out", help="folder for finished PDFs and summary.csv")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="items allowed between two stages")
+    parser.add_argument("--geocode-workers", type=int, default=GEOCODE_WORKERS)
+    parser.add_argument("--polygon-workers", type=int, default=POLYGON_WORKERS)
+    parser.add_argument("--ledger", help=f"ledger database (default: {LEDGER_FILE} in the --out folder)")
+    parser.add_argument("--no-ledger", action="store_true", help="redo every job from scratch")
+    parser.add_argument("--store", default=None, help="shared geocode/permit history database (default: permit_store.db next to the scripts)")
+    parser.add_argument("--budget", type=float, default=Permit_cost.RESOLVE_BUDGET,
+                        help="seconds of Census lookups per address before it is marked needs review")
+    parser.add_argument("--hedge", action="store_true", help="send a duplicate of Census calls slower than the usual p95")
+    parser.add_argument("--profile", action="store_true", help=f"time each step and write a Chrome trace ({profiling.TRACE_FILE} in --out)")
+    parser.add_argument("--metrics-file", help=f"Prometheus text file written at the end (default: {metrics.METRICS_FILE} in --out)")
+    parser.add_argument("--metrics-port", type=int, help="also serve live metrics on http://127.0.0.1:PORT/metrics during the run")
+    parser.add_argument("--no-store", action="store_true", help="don't read or write the shared store")
+    parser.add_argument("--refresh", action="store_true", help="look every address up again instead of using saved or cached answers")
+    parser.add_argument("--offline-first", action="store_true",
+                        help="if Census is down, use a provisional township and retry Census in the background")
+    parser.add_argument("--combined", help="append every permit to this one PDF (in --out) instead of a file per permit")
+    parser.add_argument("--per-file", type=int, default=0, help="with --combined, start a new file every N permits")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.profile:
+        profiling.enable()
+    if args.hedge:
+        geocode.enable_hedging()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    ledger = None if args.no_ledger else JobLedger(args.ledger or os.path.join(args.out, LEDGER_FILE))
+    store = None if args.no_store else PermitStore(args.store) if args.store else PermitStore()
+    use_store(store)
+    pipeline = PermitPipeline(args.out, Permit_cost.load_permit_data(Permit_cost.PERMIT_FILE),
+                              Permit_cost.load_polygons(Permit_cost.POLYGONS), args.queue_size,
+                              args.geocode_workers, args.polygon_workers, ledger, store, args.budget, args.refresh,
+                              args.offline_first, args.combined, args.per_file)
+    results = pipeline.run(iter_job_records(args.jobs))
+    if ledger is not None:
+        ledger.close()
+    if store is not None:
+        if args.offline_first:
+            resolve_queue.report_changes(store)  # provisional townships that Census has since corrected
+            print(f" {store.pending_lookups()} lookup(s) still waiting for Census (python resolve_queue.py run retries them)")
+        store.close()
+    summary_path = os.path.join(args.out, "summary.csv")
+    write_summary(results, summary_path)
+
+    for item in results:
+        if item["status"] != "ok":
+            print(f" {item['job'].job_number or '?'} {item['job'].customer_name}: {item['status']} ({item['reason']})")
+    print()
+    pipeline.report()
+    print(f" Metrics written to '{metrics.write_textfile(args.metrics_file or os.path.join(args.out, metrics.METRICS_FILE))}'")
+    if args.profile:
+        profiling.report(os.path.join(args.out, profiling.TRACE_FILE))
+    print(f" Summary written to '{summary_path}'")
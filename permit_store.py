@@ -0,0 +1,342 @@
+# -------------------------------
+# Shared store for everyone running the scripts off the same folder:
+# geocode results (and addresses Census couldn't match), resolved townships, house
+# numbers resolved along each street (see street_segments.py), lookups waiting for
+# Census to come back (see resolve_queue.py) and the history of permits filled.
+#
+# One SQLite file. Readers never wait on writers (WAL), writes are queued and
+# committed in batches, and a batch that hits "database is locked" backs off and
+# retries instead of failing.
+# -------------------------------
+import datetime
+import getpass
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from job_ledger import hash_values
+
+# -------------------------------
+# Config
+# -------------------------------
+DEFAULT_PATH = os.environ.get("PERMIT_STORE") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "permit_store.db")
+JOURNAL_MODE = os.environ.get("PERMIT_STORE_JOURNAL", "").upper()  # e.g. DELETE to force it; empty: WAL unless on a network drive
+DRIVE_REMOTE = 4  # GetDriveTypeW answer for a mapped network drive
+BATCH_SIZE = 50          # queued writes before an automatic flush
+BUSY_TIMEOUT_MS = 5000   # how long SQLite itself waits on a lock
+WRITE_RETRIES = 6
+RETRY_BASE_DELAY = 0.05  # seconds, doubled each retry (plus jitter)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS geocodes (
+        address_key TEXT PRIMARY KEY,
+        query       TEXT,
+        lon         REAL,
+        lat         REAL,
+        fetched     TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS no_matches (
+        address_key TEXT PRIMARY KEY,
+        query       TEXT,
+        missed      TEXT,
+        township    TEXT,
+        entered_by  TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS townships (
+        address_key   TEXT PRIMARY KEY,
+        polygons_hash TEXT,
+        township      TEXT,
+        source        TEXT,
+        resolved      TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS townships_township ON townships (township)",
+    """CREATE TABLE IF NOT EXISTS street_points (
+        street        TEXT,
+        zip           TEXT,
+        parity        INTEGER,
+        number        INTEGER,
+        township      TEXT,
+        clear         INTEGER,
+        polygons_hash TEXT,
+        resolved      TEXT,
+        lon           REAL,
+        lat           REAL,
+        PRIMARY KEY (street, zip, parity, number)
+    )""",
+    """CREATE TABLE IF NOT EXISTS lookup_queue (
+        id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_number         TEXT,
+        address            TEXT,
+        address_key        TEXT,
+        provisional        TEXT,
+        provisional_source TEXT,
+        queued             TEXT,
+        queued_by          TEXT,
+        attempts           INTEGER DEFAULT 0,
+        next_try           REAL,
+        last_error         TEXT,
+        final              TEXT,
+        final_source       TEXT,
+        resolved           TEXT,
+        reported           INTEGER DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS lookup_queue_next_try ON lookup_queue (resolved, next_try)",
+    """CREATE TABLE IF NOT EXISTS permits (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_number  TEXT,
+        customer    TEXT,
+        address_key TEXT,
+        township    TEXT,
+        work_type   TEXT,
+        required    INTEGER,
+        price       REAL,
+        files       TEXT,
+        issued      TEXT,
+        issued_by   TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS permits_job_number ON permits (job_number)",
+    "CREATE INDEX IF NOT EXISTS permits_address_key ON permits (address_key)",
+    "CREATE INDEX IF NOT EXISTS permits_township ON permits (township)",
+]
+
+# Columns added since the table was first shipped: (table, column, type), added to older databases on open
+ADDED_COLUMNS = [
+    ("street_points", "lon", "REAL"),
+    ("street_points", "lat", "REAL"),
+]
+
+def create_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+    for table, column, kind in ADDED_COLUMNS:
+        if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+def now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+def polygons_hash(polygons):
+    """Saved townships are only trusted while the override polygons are unchanged."""
+    return hash_values({name: geom.wkb_hex for name, geom in polygons.items()})
+
+def is_network_path(path):
+    """
+    UNC paths (\\\\server\\share\\...) and drive letters mapped to a share (Z:\\) - WAL needs
+    shared memory, which network file systems don't give us.
+    """
+    path = os.path.abspath(path)
+    if path.startswith(("\\\\", "//")):
+        return True
+    drive = os.path.splitdrive(path)[0]
+    if os.name == "nt" and drive:
+        import ctypes
+        return ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == DRIVE_REMOTE
+    return False
+
+def journal_mode(path):
+    """PERMIT_STORE_JOURNAL if set, else the rollback journal on a network drive and WAL anywhere else."""
+    if JOURNAL_MODE and JOURNAL_MODE not in ("WAL", "DELETE", "TRUNCATE", "PERSIST"):
+        raise ValueError(f"PERMIT_STORE_JOURNAL must be WAL, DELETE, TRUNCATE or PERSIST, not {JOURNAL_MODE!r}")
+    return JOURNAL_MODE or ("DELETE" if is_network_path(path) else "WAL")
+
+def is_locked_error(error):
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+# -------------------------------
+# Store
+# -------------------------------
+class PermitStore:
+    def __init__(self, path=DEFAULT_PATH, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.local = threading.local()   # one connection per thread
+        self.pending = []                # (sql, params) waiting for the next flush
+        self.pending_lock = threading.Lock()
+        self.retries = 0
+        conn = self.connection()
+        # WAL: readers never block and are never blocked. On a network share fall back to the
+        # rollback journal (SQLite's WAL is unsafe over SMB); the busy timeout and retries still apply.
+        self.journal_mode = conn.execute(f"PRAGMA journal_mode={journal_mode(path)}").fetchone()[0]
+        self.write(create_schema)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    # --- writing ---
+    def write(self, work):
+        """Run work(conn) in one transaction, retrying with backoff while another user holds the lock."""
+        conn = self.connection()
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                with conn:  # commits, or rolls back on error
+                    conn.execute("BEGIN IMMEDIATE")
+                    work(conn)
+                return
+            except sqlite3.OperationalError as e:
+                if not is_locked_error(e) or attempt == WRITE_RETRIES:
+                    raise
+                self.retries += 1
+                time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.random()))
+
+    def queue(self, sql, params):
+        with self.pending_lock:
+            self.pending.append((sql, params))
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.pending_lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        def work(conn):
+            for sql, params in batch:
+                conn.execute(sql, params)
+        try:
+            self.write(work)
+        except sqlite3.Error as e:
+            print(f" Could not save {len(batch)} record(s) to {self.path}: {e}")
+            return 0
+        return len(batch)
+
+    def close(self):
+        self.flush()
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    # --- geocodes ---
+    def get_geocode(self, address_key):
+        row = self.connection().execute(
+            "SELECT lon, lat FROM geocodes WHERE address_key = ?", (address_key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_geocode(self, address_key, query, lon, lat):
+        self.queue("INSERT OR REPLACE INTO geocodes (address_key, query, lon, lat, fetched) VALUES (?, ?, ?, ?, ?)",
+                   (address_key, query, lon, lat, now()))
+
+    # --- addresses Census couldn't match ---
+    def get_no_match(self, address_key):
+        """(when it last failed to match, epoch seconds; township entered for it or None)."""
+        row = self.connection().execute(
+            "SELECT missed, township FROM no_matches WHERE address_key = ?", (address_key,)).fetchone()
+        return (datetime.datetime.fromisoformat(row[0]).timestamp(), row[1]) if row else None
+
+    def put_no_match(self, address_key, query, township=None):
+        self.queue("INSERT OR REPLACE INTO no_matches (address_key, query, missed, township, entered_by) "
+                   "VALUES (?, ?, ?, ?, ?)", (address_key, query, now(), township, getpass.getuser() if township else None))
+
+    def drop_no_match(self, address_key):
+        self.queue("DELETE FROM no_matches WHERE address_key = ?", (address_key,))
+
+    # --- townships ---
+    def get_township(self, address_key, polygons_hash):
+        """Saved (township, source) for an address, if it was resolved with the same override polygons."""
+        row = self.connection().execute(
+            "SELECT township, source FROM townships WHERE address_key = ? AND polygons_hash = ?",
+            (address_key, polygons_hash)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put_township(self, address_key, polygons_hash, township, source):
+        self.queue("INSERT OR REPLACE INTO townships (address_key, polygons_hash, township, source, resolved) "
+                   "VALUES (?, ?, ?, ?, ?)", (address_key, polygons_hash, township, source, now()))
+
+    def resolved_addresses(self):
+        """[(address key, township, polygons hash)] for every address resolved so far."""
+        return self.connection().execute("SELECT address_key, township, polygons_hash FROM townships").fetchall()
+
+    # --- street segments ---
+    def get_street_points(self, street, zip_code, parity, polygons_hash):
+        """
+        [(house number, township, clear of every polygon boundary, lon, lat)] on one side of a
+        street, by number. lon/lat are None for points saved before they were recorded.
+        """
+        rows = self.connection().execute(
+            "SELECT number, township, clear, lon, lat FROM street_points WHERE street = ? AND zip = ? AND parity = ? "
+            "AND polygons_hash = ? ORDER BY number", (street, zip_code, parity, polygons_hash)).fetchall()
+        return [(number, township, bool(clear), lon, lat) for number, township, clear, lon, lat in rows]
+
+    def put_street_point(self, street, zip_code, parity, number, township, clear, polygons_hash, lon, lat):
+        self.queue("INSERT OR REPLACE INTO street_points (street, zip, parity, number, township, clear, polygons_hash, "
+                   "resolved, lon, lat) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                   (street, zip_code, parity, number, township, int(clear), polygons_hash, now(), lon, lat))
+
+    def drop_street_points(self, keep_polygons_hash):
+        """Forget street points resolved with other override polygons; returns how many went."""
+        self.flush()
+        deleted = []
+        self.write(lambda c: deleted.append(
+            c.execute("DELETE FROM street_points WHERE polygons_hash != ?", (keep_polygons_hash,)).rowcount))
+        return deleted[0]
+
+    # --- lookups waiting for Census ---
+    def queue_lookup(self, job_number, address, address_key, provisional, provisional_source):
+        """Written at once (not batched) so a retry worker in another process sees it."""
+        self.write(lambda c: c.execute(
+            "INSERT INTO lookup_queue (job_number, address, address_key, provisional, provisional_source, queued, "
+            "queued_by, next_try) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_number, address, address_key, provisional, provisional_source, now(), getpass.getuser(), time.time())))
+
+    def due_lookups(self, limit=20):
+        """(id, job_number, address, attempts) still unresolved and due for another try, oldest first."""
+        return self.connection().execute(
+            "SELECT id, job_number, address, attempts FROM lookup_queue WHERE resolved IS NULL AND next_try <= ? "
+            "ORDER BY next_try LIMIT ?", (time.time(), limit)).fetchall()
+
+    def next_lookup_due(self):
+        row = self.connection().execute("SELECT MIN(next_try) FROM lookup_queue WHERE resolved IS NULL").fetchone()
+        return row[0]
+
+    def retry_lookup_later(self, lookup_id, next_try, error):
+        self.write(lambda c: c.execute(
+            "UPDATE lookup_queue SET attempts = attempts + 1, next_try = ?, last_error = ? WHERE id = ?",
+            (next_try, error, lookup_id)))
+
+    def finish_lookup(self, lookup_id, township, source):
+        self.write(lambda c: c.execute(
+            "UPDATE lookup_queue SET attempts = attempts + 1, final = ?, final_source = ?, resolved = ? WHERE id = ?",
+            (township, source, now(), lookup_id)))
+
+    def changed_lookups(self, unreported_only=True):
+        """Finished lookups whose answer differs from the provisional one (or that Census couldn't answer at all)."""
+        return self.connection().execute(
+            "SELECT id, job_number, address, provisional, provisional_source, final, final_source, resolved "
+            "FROM lookup_queue WHERE resolved IS NOT NULL AND (final IS NULL OR provisional IS NULL "
+            "OR lower(final) != lower(provisional))" + (" AND reported = 0" if unreported_only else "") +
+            " ORDER BY id").fetchall()
+
+    def mark_lookups_reported(self, lookup_ids):
+        self.write(lambda c: c.executemany(
+            "UPDATE lookup_queue SET reported = 1 WHERE id = ?", [(i,) for i in lookup_ids]))
+
+    def pending_lookups(self):
+        return self.connection().execute("SELECT COUNT(*) FROM lookup_queue WHERE resolved IS NULL").fetchone()[0]
+
+    # --- permit history ---
+    def add_permit(self, job_number, customer, address_key, township, work_type, required, price, files=()):
+        self.queue("INSERT INTO permits (job_number, customer, address_key, township, work_type, required, price, "
+                   "files, issued, issued_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                   (job_number, customer, address_key, township, work_type,
+                    None if required is None else int(bool(required)), price,
+                    json.dumps([os.path.basename(f) for f in files]), now(), getpass.getuser()))
+
+    def permits_for_job(self, job_number):
+        return self.connection().execute(
+            "SELECT township, work_type, price, files, issued, issued_by FROM permits WHERE job_number = ? ORDER BY id",
+            (job_number,)).fetchall()
+
+    def permits_at(self, address_key):
+        return self.connection().execute(
+            "SELECT job_number, township, work_type, price, issued FROM permits WHERE address_key = ? ORDER BY id",
+            (address_key,)).fetchall()
@@ -0,0 +1,244 @@
+# -------------------------------
+# Watch-folder daemon: drop a job file (a Customer_data.txt-style file, a CSV
+# export or JSONL) into the inbox and it is run through permit_pipeline.py -
+# township lookup, fee calculation and permit filling - without anyone starting
+# a script.
+#
+#   python permit_watch.py --inbox inbox --outbox outbox
+#
+# Each file gets its own folder in the outbox with the PDFs, summary.csv and
+# its job ledger, and outbox/watch_log.csv has a line per file.
+#
+# Exactly once, even across restarts:
+#   - a file is claimed by moving it to inbox/processing/ (an atomic rename, so
+#     two daemons on the same folder never both take it)
+#   - the batch's permit_ledger.db records every finished job, so after a crash
+#     the claimed file is run again and only the jobs that hadn't finished are done
+#   - once the summary is written the file's hash goes in outbox/processed.json and
+#     the file moves to inbox/done/; the same contents dropped again are skipped
+#   - a file that can't be processed (a broken JSONL line, say) moves to inbox/failed/
+#     with its traceback next to it, is recorded as failed, and the daemon carries on
+# -------------------------------
+import argparse
+import csv
+import datetime
+import json
+import os
+import time
+import traceback
+
+import Permit_cost
+import metrics
+from geocode import use_store
+from job_ledger import JobLedger, hash_bytes
+from job_records import iter_job_records
+from permit_pipeline import PermitPipeline, write_summary, LEDGER_FILE, QUEUE_SIZE, GEOCODE_WORKERS, POLYGON_WORKERS
+from permit_store import PermitStore
+
+# -------------------------------
+# Config
+# -------------------------------
+POLL_SECONDS = 2
+SETTLE_SECONDS = 3     # a file must be unchanged this long before it's picked up (still being saved otherwise)
+JOB_FILE_TYPES = (".txt", ".csv", ".jsonl", ".ndjson")
+PROCESSED_FILE = "processed.json"
+LOG_FILE = "watch_log.csv"
+LOG_COLUMNS = ["finished", "file", "hash", "jobs", "ok", "needs review", "folder"]
+
+def is_job_file(name):
+    """Job files only; skip editor temp files and half-copied downloads."""
+    return (name.lower().endswith(JOB_FILE_TYPES) and not name.startswith((".", "~$"))
+            and not name.lower().endswith((".tmp", ".part")))
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+# -------------------------------
+# Daemon
+# -------------------------------
+class WatchFolder:
+    def __init__(self, inbox, outbox, store=None, geocode_workers=GEOCODE_WORKERS, polygon_workers=POLYGON_WORKERS,
+                 budget=Permit_cost.RESOLVE_BUDGET, offline_first=False):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processing = os.path.join(inbox, "processing")
+        self.done = os.path.join(inbox, "done")
+        self.failed = os.path.join(inbox, "failed")
+        self.store = store
+        self.geocode_workers = geocode_workers
+        self.polygon_workers = polygon_workers
+        self.budget = budget
+        self.offline_first = offline_first
+        self.sizes = {}  # name -> (size, mtime) at the last poll
+        for folder in (inbox, outbox, self.processing, self.done, self.failed):
+            os.makedirs(folder, exist_ok=True)
+        self.processed = self.load_processed()
+
+    # --- bookkeeping ---
+    def load_processed(self):
+        try:
+            with open(os.path.join(self.outbox, PROCESSED_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def mark_processed(self, digest, entry):
+        self.processed[digest] = entry
+        path = os.path.join(self.outbox, PROCESSED_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.processed, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def log(self, row):
+        path = os.path.join(self.outbox, LOG_FILE)
+        new = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=LOG_COLUMNS)
+            if new:
+                writer.writeheader()
+            writer.writerow(row)
+
+    # --- finding and claiming files ---
+    def settled_files(self):
+        """Job files in the inbox left alone for SETTLE_SECONDS and unchanged since the last poll."""
+        ready, seen = [], {}
+        for name in sorted(os.listdir(self.inbox)):
+            path = os.path.join(self.inbox, name)
+            if not os.path.isfile(path) or not is_job_file(name):
+                continue
+            stat = os.stat(path)
+            seen[name] = (stat.st_size, stat.st_mtime)
+            if self.sizes.get(name, seen[name]) == seen[name] and time.time() - stat.st_mtime >= SETTLE_SECONDS:
+                ready.append(name)
+        self.sizes = seen
+        return ready
+
+    def claim(self, name):
+        """Move the file to processing/; None if someone else got it first."""
+        target = os.path.join(self.processing, name)
+        try:
+            os.replace(os.path.join(self.inbox, name), target)
+        except FileNotFoundError:
+            return None
+        return target
+
+    # --- processing ---
+    def batch_folder(self, name, digest):
+        return os.path.join(self.outbox, f"{os.path.splitext(name)[0]}_{digest[:8]}")
+
+    def process(self, path):
+        """Run one claimed file through the pipeline and file it under done/ (failed/ if it breaks)."""
+        name = os.path.basename(path)
+        digest = file_hash(path)
+        if digest in self.processed:
+            earlier = self.processed[digest]
+            print(f" {name}: same contents as {earlier['file']}, already {'failed' if earlier.get('failed') else 'processed'}; skipping.")
+            self.file_away(path, self.failed if earlier.get("failed") else self.done)
+            return
+        try:
+            self.run_file(path, name, digest)
+        except Exception:
+            self.fail(path, name, digest, traceback.format_exc())
+            return
+        self.file_away(path, self.done)
+
+    def run_file(self, path, name, digest):
+        """Pipeline, summary and bookkeeping for one file; raises if the file can't be processed."""
+        out_dir = self.batch_folder(name, digest)
+        os.makedirs(out_dir, exist_ok=True)
+        print(f" {name}: processing into {out_dir}")
+        ledger = JobLedger(os.path.join(out_dir, LEDGER_FILE))
+        try:
+            pipeline = PermitPipeline(out_dir, Permit_cost.load_permit_data(Permit_cost.PERMIT_FILE),
+                                      Permit_cost.load_polygons(Permit_cost.POLYGONS), QUEUE_SIZE,
+                                      self.geocode_workers, self.polygon_workers, ledger, self.store,
+                                      self.budget, offline_first=self.offline_first)
+            results = pipeline.run(iter_job_records(path))
+        finally:
+            ledger.close()
+        if self.store is not None:
+            self.store.flush()
+        write_summary(results, os.path.join(out_dir, "summary.csv"))
+        metrics.write_textfile(os.path.join(self.outbox, metrics.METRICS_FILE))  # totals since the daemon started
+        ok = sum(1 for item in results if item["status"] == "ok")
+        finished = datetime.datetime.now().isoformat(timespec="seconds")
+        self.mark_processed(digest, {"file": name, "folder": os.path.basename(out_dir), "finished": finished})
+        self.log({"finished": finished, "file": name, "hash": digest[:12], "jobs": len(results), "ok": ok,
+                  "needs review": len(results) - ok, "folder": os.path.basename(out_dir)})
+        print(f" {name}: {len(results)} job(s), {ok} ok, {len(results) - ok} need review")
+
+    def fail(self, path, name, digest, error):
+        """The file broke the pipeline: move it to failed/ with its traceback, so a restart doesn't hit it again."""
+        target = self.file_away(path, self.failed)
+        with open(target + ".error.txt", "w", encoding="utf-8") as f:
+            f.write(error)
+        finished = datetime.datetime.now().isoformat(timespec="seconds")
+        reason = error.strip().splitlines()[-1]
+        self.mark_processed(digest, {"file": name, "folder": "", "finished": finished, "failed": True, "error": reason})
+        self.log({"finished": finished, "file": name, "hash": digest[:12], "jobs": "", "ok": "",
+                  "needs review": "", "folder": "failed: " + reason})
+        print(f" {name}: failed ({reason}); moved to {target}")
+
+    def file_away(self, path, folder):
+        """Move a file to done/ or failed/, keeping earlier files of the same name; returns where it went."""
+        name = os.path.basename(path)
+        target = os.path.join(folder, name)
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(name)
+            target = os.path.join(folder, f"{stem}_{datetime.datetime.now():%Y%m%d_%H%M%S}{ext}")
+        os.replace(path, target)
+        return target
+
+    def resume(self):
+        """Files claimed by a run that stopped part way: finish them first."""
+        for name in sorted(os.listdir(self.processing)):
+            path = os.path.join(self.processing, name)
+            if os.path.isfile(path):
+                print(f" Resuming {name} (interrupted last time)")
+                self.process(path)
+
+    def poll(self):
+        for name in self.settled_files():
+            path = self.claim(name)
+            if path:
+                self.process(path)
+
+    def run(self, once=False):
+        self.resume()
+        while True:
+            self.poll()
+            if once:
+                return
+            time.sleep(POLL_SECONDS)
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a folder for job files and fill their permits.")
+    parser.add_argument("--inbox", default="inbox", help="folder job files are dropped into")
+    parser.add_argument("--outbox", default="outbox", help="folder for each file's PDFs and summary")
+    parser.add_argument("--geocode-workers", type=int, default=GEOCODE_WORKERS)
+    parser.add_argument("--polygon-workers", type=int, default=POLYGON_WORKERS)
+    parser.add_argument("--budget", type=float, default=Permit_cost.RESOLVE_BUDGET,
+                        help="seconds of Census lookups per address before it is marked needs review")
+    parser.add_argument("--offline-first", action="store_true",
+                        help="if Census is down, use a provisional township and retry Census in the background")
+    parser.add_argument("--no-store", action="store_true", help="don't read or write the shared store")
+    parser.add_argument("--once", action="store_true", help="process what's in the inbox now and exit")
+    args = parser.parse_args()
+
+    # Write every store change straight away: a permit filled just before a crash isn't lost from the history
+    store = None if args.no_store else PermitStore(batch_size=1)
+    use_store(store)
+    watcher = WatchFolder(args.inbox, args.outbox, store, args.geocode_workers, args.polygon_workers,
+                          args.budget, args.offline_first)
+    print(f" Watching {os.path.abspath(args.inbox)} (Ctrl+C to stop)")
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        print(" Stopped; anything part way through is picked up again next start.")
+    finally:
+        if store is not None:
+            store.close()
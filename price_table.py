@@ -0,0 +1,277 @@
+# -------------------------------
+# Price table: every fee calc_permit can give, worked out once per fee table.
+#
+# For each township in Permit_fee_check.txt (and the special-calc towns) and each
+# kind of work - F, AC, FAC and B, with the AC new / replacement answer or without
+# it - the quote is computed up front and kept in flat arrays. Niagara Falls city
+# and North Tonawanda city price by installation cost rounded up to the next $1000,
+# so they get a cell per $1000 bucket up to MAX_BUCKET (and one for "cost not given
+# yet"). A lookup is then a dict get and an array index, with no string parsing.
+#
+# Anything outside the table (an unknown township, a cost above MAX_BUCKET * $1000)
+# is computed as before. The table is rebuilt when the fee table's contents change,
+# so an edited Permit_fee_check.txt is picked up by the next load_permit_data().
+#
+#   python price_table.py sheet [--out rate_sheet.pdf] [--csv rate_sheet.csv]
+#   python price_table.py show "niagara falls city" F --cost 4500
+# -------------------------------
+import json
+import math
+import threading
+from array import array
+
+from job_ledger import hash_values
+
+# -------------------------------
+# Config
+# -------------------------------
+MAX_BUCKET = 100  # cost buckets kept for cost-priced towns: up to $100,000
+BUCKET_SIZE = 1000
+
+# Columns of the table: (work type, AC new/replacement answer or None if not given)
+KINDS = [("F", None), ("AC", None), ("AC", "N"), ("AC", "R"), ("FAC", None), ("FAC", "N"), ("FAC", "R"), ("B", None)]
+KIND_INDEX = {kind: i for i, kind in enumerate(KINDS)}
+NEEDS = [None, "ac_type", "installation_cost"]
+
+lock = threading.Lock()
+current = None  # the table for the fee table last asked about
+
+def kind_index(work_type, ac_type):
+    """Column for a work type; an AC answer other than N/R counts as not given, as in calc_permit."""
+    if work_type not in ("AC", "FAC") or ac_type not in ("N", "R"):
+        ac_type = None
+    return KIND_INDEX.get((work_type, ac_type))
+
+def bucket(installation_cost):
+    """0 for no cost yet, else 1 + the cost rounded up to the next $1000, in thousands."""
+    if installation_cost is None:
+        return 0
+    return 1 + max(0, math.ceil(installation_cost / BUCKET_SIZE))
+
+# -------------------------------
+# Table
+# -------------------------------
+class PriceTable:
+    def __init__(self, permit_data, compute, townships=()):
+        """
+        compute(township, work_type, permit_data, ac_type, installation_cost) -> quote dict
+        (Permit_cost.compute_permit). townships: extra names to cover besides the fee table's rows.
+        """
+        self.source = permit_data
+        self.fingerprint = fingerprint(permit_data)
+        self.rows = {}             # township key -> (first cell, cells per kind; 1, or MAX_BUCKET + 2 if priced by cost)
+        self.names = {}            # township key -> name as written in the fee table
+        self.required = array("b")  # 1 / 0, -1 where calc_permit gives None
+        self.price = array("d")     # NaN where calc_permit gives None
+        self.flags = array("B")     # bit 0 found, bit 1 special, bits 2-3 index into NEEDS
+        self.note_ids = array("H")  # index into self.notes
+        self.notes = []
+        note_index = {}
+
+        keys = list(permit_data) + [name for name in townships if name not in permit_data]
+        for key in keys:
+            name = permit_data[key]["Township"].strip() if key in permit_data else key
+            if not compute(name, "F", permit_data, None, None)["found"]:
+                continue  # not a township calc_permit knows; its "not found" note names it as typed
+            by_cost = any(compute(name, work_type, permit_data, ac_type, None)["needs"] == "installation_cost"
+                          for work_type, ac_type in KINDS)
+            slots = MAX_BUCKET + 2 if by_cost else 1
+            self.rows[key] = (len(self.price), slots)
+            self.names[key] = name
+            for work_type, ac_type in KINDS:
+                for slot in range(slots):
+                    cost = None if slot == 0 else (slot - 1) * BUCKET_SIZE
+                    quote = compute(name, work_type, permit_data, ac_type, cost)
+                    notes = tuple(quote["notes"])
+                    if notes not in note_index:
+                        note_index[notes] = len(self.notes)
+                        self.notes.append(notes)
+                    self.required.append(-1 if quote["required"] is None else int(quote["required"]))
+                    self.price.append(math.nan if quote["price"] is None else quote["price"])
+                    self.flags.append(int(quote["found"]) | int(quote["special"]) << 1 | NEEDS.index(quote["needs"]) << 2)
+                    self.note_ids.append(note_index[notes])
+
+    def __len__(self):
+        return len(self.price)
+
+    def cell(self, township_key, work_type, ac_type=None, installation_cost=None):
+        """Index of the cell for this quote, or None if it isn't in the table."""
+        row = self.rows.get(township_key)
+        kind = kind_index(work_type, ac_type)
+        if row is None or kind is None:
+            return None
+        start, slots = row
+        slot = 0
+        if slots > 1:
+            slot = bucket(installation_cost)
+            if slot >= slots:
+                return None
+        return start + kind * slots + slot
+
+    def quote(self, township, township_key, work_type, ac_type=None, installation_cost=None):
+        """The same dict calc_permit returns, or None if the table doesn't cover it."""
+        i = self.cell(township_key, work_type, ac_type, installation_cost)
+        if i is None:
+            return None
+        flags, required, price = self.flags[i], self.required[i], self.price[i]
+        return {"township": township, "found": bool(flags & 1), "special": bool(flags & 2),
+                "required": None if required < 0 else bool(required),
+                "price": None if math.isnan(price) else price,
+                "notes": list(self.notes[self.note_ids[i]]), "needs": NEEDS[flags >> 2]}
+
+def fingerprint(permit_data):
+    return hash_values(json.dumps(permit_data, sort_keys=True))
+
+def table_for(permit_data, compute, townships=()):
+    """The table for this fee table, built the first time it is seen and again whenever its contents change."""
+    global current
+    table = current
+    if table is not None and table.source is permit_data:
+        return table
+    with lock:
+        if current is None or fingerprint(permit_data) != current.fingerprint:
+            current = PriceTable(permit_data, compute, townships)
+        current.source = permit_data  # same contents, newer copy: skip the fingerprint next time
+        return current
+
+# -------------------------------
+# Rate sheet
+# -------------------------------
+SHEET_COLUMNS = [("Furnace", ("F", None)), ("AC new", ("AC", "N")), ("AC replace", ("AC", "R")),
+                 ("Furnace + AC new", ("FAC", "N")), ("Furnace + AC repl.", ("FAC", "R")), ("Boiler", ("B", None))]
+SHEET_COSTS = [1000, 2000, 3000, 5000, 7500, 10000, 15000, 20000]  # sample costs shown for cost-priced towns
+
+def price_text(quote):
+    if quote is None or not quote["found"]:
+        return "-"
+    if quote["needs"] == "installation_cost":
+        return "by cost"
+    if not quote["required"]:
+        return "none"
+    return f"${quote['price']:.2f}"
+
+def sheet_rows(table, township_notes=None):
+    """[(township, [price per SHEET_COLUMNS], notes)] in township order; township_notes(name) adds office notes."""
+    rows = []
+    for key in sorted(table.rows, key=lambda key: table.names[key].lower()):
+        name = table.names[key]
+        quotes = [table.quote(name, key, work_type, ac_type) for _, (work_type, ac_type) in SHEET_COLUMNS]
+        notes = [note.strip() for note in township_notes(name)] if township_notes else []
+        cost = SHEET_COSTS[0] if table.rows[key][1] > 1 else None  # cost-priced towns only note their formula with a cost
+        for _, (work_type, ac_type) in SHEET_COLUMNS:
+            for note in table.quote(name, key, work_type, ac_type, cost)["notes"]:
+                if note.strip() and note.strip() not in notes and not note.startswith(" "):
+                    notes.append(note.strip())
+        rows.append((name, [price_text(quote) for quote in quotes], notes))
+    return rows
+
+def cost_rows(table):
+    """[(township, [furnace price at each of SHEET_COSTS])] for the towns priced by installation cost."""
+    rows = []
+    for key in sorted(table.rows, key=lambda key: table.names[key].lower()):
+        if table.rows[key][1] > 1:
+            name = table.names[key]
+            rows.append((name, [price_text(table.quote(name, key, "F", None, cost)) for cost in SHEET_COSTS]))
+    return rows
+
+def write_csv(table, path, township_notes=None):
+    import csv
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Township"] + [label for label, _ in SHEET_COLUMNS] + ["Notes"])
+        for name, prices, notes in sheet_rows(table, township_notes):
+            writer.writerow([name] + prices + ["; ".join(notes)])
+        for name, prices in cost_rows(table):
+            writer.writerow([])
+            writer.writerow([f"{name} by installation cost"] + [f"${cost:,}" for cost in SHEET_COSTS])
+            writer.writerow([""] + prices)
+
+def write_pdf(table, path, title="Permit rate sheet", township_notes=None):
+    import datetime
+    import textwrap
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.pdfgen import canvas
+
+    width, height = landscape(letter)
+    pdf = canvas.Canvas(path, pagesize=(width, height))
+    columns = [36, 150, 205, 265, 325, 405, 480, 530]  # x of each column: township, six prices, notes
+
+    def header():
+        pdf.setFont("Helvetica-Bold", 14)
+        pdf.drawString(36, height - 40, title)
+        pdf.setFont("Helvetica", 8)
+        pdf.drawRightString(width - 36, height - 40, f"Permit_fee_check.txt as of {datetime.date.today():%m/%d/%Y}")
+        pdf.setFont("Helvetica-Bold", 8)
+        for x, label in zip(columns, ["Township"] + [label for label, _ in SHEET_COLUMNS] + ["Notes"]):
+            pdf.drawString(x, height - 62, label)
+        pdf.line(36, height - 66, width - 36, height - 66)
+        pdf.setFont("Helvetica", 8)
+        return height - 80
+
+    y = header()
+    for name, prices, notes in sheet_rows(table, township_notes):
+        lines = [line for note in notes for line in textwrap.wrap(note, 54)] or [""]
+        if y - 11 * len(lines) < 40:
+            pdf.showPage()
+            y = header()
+        for x, text in zip(columns, [name] + prices):
+            pdf.drawString(x, y, text)
+        for note in lines:
+            pdf.drawString(columns[-1], y, note)
+            y -= 11
+        y -= 2
+
+    by_cost = cost_rows(table)
+    if by_cost:
+        if y < 60 + 22 * len(by_cost):
+            pdf.showPage()
+            y = header()
+        y -= 10
+        pdf.setFont("Helvetica-Bold", 8)
+        pdf.drawString(36, y, "Priced by installation cost (rounded up to the next $1000; furnace shown, the same for every kind of work)")
+        y -= 14
+        for i, cost in enumerate(SHEET_COSTS):
+            pdf.drawString(150 + i * 60, y, f"${cost:,}")
+        pdf.setFont("Helvetica", 8)
+        for name, prices in by_cost:
+            y -= 12
+            pdf.drawString(36, y, name)
+            for i, text in enumerate(prices):
+                pdf.drawString(150 + i * 60, y, text)
+    pdf.save()
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    import argparse
+    import time
+    import Permit_cost
+
+    parser = argparse.ArgumentParser(description="Print the permit rate sheet or look up one price.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sheet = sub.add_parser("sheet", help="write a printable rate sheet")
+    sheet.add_argument("--out", default="rate_sheet.pdf")
+    sheet.add_argument("--csv", help="also write the sheet as CSV")
+    show = sub.add_parser("show", help="look up one price")
+    show.add_argument("township")
+    show.add_argument("work_type", choices=["F", "AC", "FAC", "B"])
+    show.add_argument("--ac-type", choices=["N", "R"])
+    show.add_argument("--cost", type=float, help="installation cost")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = Permit_cost.price_table(Permit_cost.load_permit_data(Permit_cost.PERMIT_FILE))
+    print(f" {len(table.rows)} townships, {len(table)} prices built in {(time.perf_counter() - started) * 1000:.0f} ms")
+    if args.command == "sheet":
+        write_pdf(table, args.out, township_notes=Permit_cost.township_notes)
+        print(f" Rate sheet written to {args.out}")
+        if args.csv:
+            write_csv(table, args.csv, Permit_cost.township_notes)
+            print(f" CSV written to {args.csv}")
+    else:
+        quote = Permit_cost.calc_permit(args.township, args.work_type, table.source, args.ac_type, args.cost)
+        for note in quote["notes"]:
+            print(note)
+        print(f"{quote['township']}: required {quote['required']}, price {quote['price']}"
+              f"{', needs ' + quote['needs'] if quote['needs'] else ''}")
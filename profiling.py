@@ -0,0 +1,124 @@
+# -------------------------------
+# Timing spans for "why is it slow today?"
+#
+#   with span("template load"):          # around a block
+#   @traced("get_census_coordinates")    # around a whole function
+#
+# Nothing is recorded unless profiling is on (--profile on Permit_cost.py,
+# Address_check_for_permit.py, permit_pipeline.py and render_benchmark.py). When it
+# is off a span is one flag check and a shared do-nothing context manager.
+# At the end the per-span totals are printed and every span is written as a
+# Chrome trace (open permit_profile.json in chrome://tracing or ui.perfetto.dev).
+# -------------------------------
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# -------------------------------
+# Config
+# -------------------------------
+TRACE_FILE = "permit_profile.json"
+
+ENABLED = False
+events = []  # (name, start_ns, duration_ns, thread id, args); list.append is thread-safe
+START_NS = time.perf_counter_ns()
+
+# -------------------------------
+# Spans
+# -------------------------------
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        events.append((self.name, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+def span(name, **args):
+    """Time a block; args (e.g. file=...) show up on the span in the trace viewer."""
+    if not ENABLED:
+        return NULL_SPAN
+    return Span(name, args)
+
+def traced(name=None):
+    """Decorator: time every call of the function as one span."""
+    def wrap(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with Span(label, {}):
+                return func(*args, **kwargs)
+        return inner
+    return wrap
+
+# -------------------------------
+# Switching on and reporting
+# -------------------------------
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def start_from_argv(trace_file=TRACE_FILE):
+    """Turn profiling on if the script was started with --profile; report when it exits."""
+    if "--profile" not in sys.argv:
+        return False
+    sys.argv.remove("--profile")
+    enable()
+    atexit.register(report, trace_file)
+    return True
+
+def summary():
+    """name -> (count, total s, mean ms, max ms), slowest total first."""
+    grouped = {}
+    for name, _, duration, _, _ in events:
+        grouped.setdefault(name, []).append(duration)
+    rows = {}
+    for name, durations in sorted(grouped.items(), key=lambda kv: -sum(kv[1])):
+        total = sum(durations)
+        rows[name] = (len(durations), total / 1e9, total / len(durations) / 1e6, max(durations) / 1e6)
+    return rows
+
+def print_summary():
+    rows = summary()
+    if not rows:
+        print(" Profile: no spans recorded.")
+        return
+    print(f"\n{'span':28s} {'calls':>6s} {'total s':>8s} {'mean ms':>8s} {'max ms':>8s}")
+    for name, (count, total, mean, longest) in rows.items():
+        print(f"{name:28s} {count:6d} {total:8.3f} {mean:8.2f} {longest:8.2f}")
+
+def write_trace(path=TRACE_FILE):
+    """Chrome trace format: one complete ("X") event per span, times in microseconds."""
+    pid = os.getpid()
+    trace = [{"name": name, "ph": "X", "ts": (start - START_NS) / 1000, "dur": duration / 1000,
+              "pid": pid, "tid": tid, "args": {k: str(v) for k, v in args.items()}}
+             for name, start, duration, tid, args in list(events)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+    print(f" Trace with {len(trace)} spans written to '{path}'")
+
+def report(trace_file=TRACE_FILE):
+    print_summary()
+    write_trace(trace_file)
@@ -0,0 +1,295 @@
+# -------------------------------
+# Render benchmark + golden layout check for every permit template
+#
+#   python render_benchmark.py                  check against golden/ and write render_report.json
+#   python render_benchmark.py --update-golden  accept the current output as the new golden files
+#   python render_benchmark.py --profile        also break each render into template load / fill / write spans
+# -------------------------------
+import argparse
+import builtins
+import contextlib
+import datetime
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pdfrw import PdfReader, PdfTokens, PdfArray
+from pdfrw.errors import PdfParseError
+
+import pdf_output
+import profiling
+from job_records import load_job_record
+
+# -------------------------------
+# Config
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(BASE_DIR, "golden")
+REPORT_FILE = os.path.join(BASE_DIR, "render_report.json")
+POSITION_TOLERANCE = 0.5  # points
+
+SAMPLE_CUSTOMER = [
+    "John Smith",
+    "69 N Cayuga Rd, Williamsville, NY 14221",
+    "(716) 555-1234",
+    "12345678",
+    "10/20/2026",
+    "Bob Tech",
+    "140 Cooper Ave, Tonawanda, NY 14150",
+]
+
+# script -> answers to its ask_questions() prompts, in order
+CASES = {
+    "Amherst_permit.py": ["5000", "Replace furnace and AC", "101.75", "y", "y", "new"],
+    "Cheektowaga_permit.py": ["5000", "n"],
+    "Clarence_permit.py": ["Replace furnace", "5000"],
+    "Lockport_permit.py": ["5000", "y", "n"],
+    "Niagara_falls_permit.py": ["45", "Replace furnace"],
+    "Orchard_park_permit.py": ["5000", "y", "y", "r"],
+    "williamsville_permit.py": ["5000", "y", "y", "new"],
+    "permit_cover_sheet.py": ["Clarence town", "9am", "Replace furnace", "100"],
+}
+
+# -------------------------------
+# Text extraction (text runs + where they land on the page)
+# -------------------------------
+def stream_text(obj):
+    data = obj.stream or ""
+    if obj.Filter == "/FlateDecode":
+        data = zlib.decompress(data.encode("latin-1")).decode("latin-1")
+    elif obj.Filter is not None:
+        return ""  # other filters never hold text we drew
+    return data
+
+def multiply(m, n):
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return [a * a2 + b * c2, a * b2 + b * d2, c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2]
+
+def pdf_string(token):
+    if token.startswith("("):
+        return token[1:-1].replace("\\(", "(").replace("\\)", ")").replace("\\\\", "\\")
+    return token
+
+def extract_runs(streams, resources, ctm=None, runs=None):
+    """Walk content streams (and the form XObjects they paint) collecting text runs."""
+    ctm = ctm or [1, 0, 0, 1, 0, 0]
+    runs = [] if runs is None else runs
+    stack = []
+    operands = []
+    tm = [1, 0, 0, 1, 0, 0]
+    size = 0.0
+    text = "".join(stream_text(s) for s in streams)
+    try:
+        tokens = list(PdfTokens(text))
+    except PdfParseError:
+        return runs  # binary junk (inline images etc.) in a template stream
+    for token in tokens:
+        if token[0] in "(<[/" or re.match(r"^[-+.\d]", token) or token in ("]", "true", "false", "null"):
+            operands.append(token)
+            continue
+        op = token
+        if op == "q":
+            stack.append(list(ctm))
+        elif op == "Q" and stack:
+            ctm = stack.pop()
+        elif op == "cm" and len(operands) >= 6:
+            ctm = multiply([float(v) for v in operands[-6:]], ctm)
+        elif op == "BT":
+            tm = [1, 0, 0, 1, 0, 0]
+        elif op == "Tf" and len(operands) >= 2:
+            size = float(operands[-1])
+        elif op == "Td" and len(operands) >= 2:
+            tm = multiply([1, 0, 0, 1, float(operands[-2]), float(operands[-1])], tm)
+        elif op == "Tm" and len(operands) >= 6:
+            tm = [float(v) for v in operands[-6:]]
+        elif op in ("Tj", "'", '"') and operands:
+            m = multiply(tm, ctm)
+            runs.append({"text": pdf_string(operands[-1]), "x": round(m[4], 1), "y": round(m[5], 1),
+                         "size": round(size * m[3], 1)})
+        elif op == "Do" and operands:
+            xobj = (resources.XObject or {}).get(operands[-1]) if resources else None
+            if xobj is not None and xobj.Subtype == "/Form":
+                form_ctm = ctm
+                if xobj.Matrix:
+                    form_ctm = multiply([float(v) for v in xobj.Matrix], ctm)
+                extract_runs([xobj], xobj.Resources or resources, form_ctm, runs)
+        operands = []
+    return runs
+
+def page_runs(page):
+    contents = page.Contents
+    streams = list(contents) if isinstance(contents, PdfArray) else [contents]
+    return extract_runs(streams, page.Resources)
+
+def filled_layout(output_bytes, template_path):
+    """Text runs that the fill added, i.e. output runs minus the blank template's runs."""
+    output = PdfReader(io.BytesIO(output_bytes))
+    template = PdfReader(template_path)
+    layout = []
+    for page_number, (page, blank) in enumerate(zip(output.pages, template.pages)):
+        blank_runs = [json.dumps(r, sort_keys=True) for r in page_runs(blank)]
+        for run in page_runs(page):
+            key = json.dumps(run, sort_keys=True)
+            if key in blank_runs:
+                blank_runs.remove(key)
+                continue
+            run["page"] = page_number
+            layout.append(run)
+    return layout
+
+def mask_today(layout, today):
+    """Dates change every day; swap today's date for a marker so golden files stay stable."""
+    volatile = {today.strftime("%m/%d/%Y"), today.strftime("%m/%d/%y"),
+                today.strftime("%m"), today.strftime("%d"), today.strftime("%y")}
+    for run in layout:
+        if run["text"] in volatile:
+            run["text"] = "{today}"
+    return layout
+
+# -------------------------------
+# Running a script with scripted answers
+# -------------------------------
+def template_of(script):
+    with open(os.path.join(BASE_DIR, script), encoding="utf-8") as f:
+        return re.search(r'^TEMPLATE = "(.+)"', f.read(), re.M).group(1)
+
+def prepare_workdir(workdir):
+    with open(os.path.join(workdir, "Customer_data.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(SAMPLE_CUSTOMER) + "\n")
+    for script in CASES:
+        shutil.copy(os.path.join(BASE_DIR, template_of(script)), workdir)
+
+@contextlib.contextmanager
+def in_workdir(workdir):
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        os.chdir(cwd)
+
+def load_script(script, answers, workdir):
+    """Import one permit script and answer its prompts; returns (module globals, job, answers)."""
+    pending = list(answers)
+    real_input = builtins.input
+    builtins.input = lambda prompt="": pending.pop(0)
+    try:
+        with in_workdir(workdir):
+            module = runpy.run_path(os.path.join(BASE_DIR, script), run_name="render_benchmark_case")
+            job = load_job_record(module["INPUT"])
+            return module, job, module["ask_questions"](job)
+    finally:
+        builtins.input = real_input
+
+def benchmark(script, answers, workdir, repeat):
+    module, job, answers = load_script(script, answers, workdir)
+    build_permit = module["build_permit"]
+
+    timings = []
+    with in_workdir(workdir):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pdf = build_permit(job, answers)
+            data = pdf_output.render_compact_pdf(pdf)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        pdf_output.render_compact_pdf(build_permit(job, answers))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return data, timings, peak
+
+# -------------------------------
+# Golden comparison
+# -------------------------------
+def golden_path(script):
+    return os.path.join(GOLDEN_DIR, os.path.splitext(script)[0] + ".json")
+
+def compare_layout(expected, actual):
+    problems = []
+    if len(expected) != len(actual):
+        problems.append(f"expected {len(expected)} text runs, got {len(actual)}")
+    for want, got in zip(expected, actual):
+        if want["text"] != got["text"] or want["page"] != got["page"]:
+            problems.append(f"text {want['text']!r} on page {want['page']} became {got['text']!r} on page {got['page']}")
+        elif (abs(want["x"] - got["x"]) > POSITION_TOLERANCE or abs(want["y"] - got["y"]) > POSITION_TOLERANCE
+              or abs(want["size"] - got["size"]) > POSITION_TOLERANCE):
+            problems.append(f"{want['text']!r} moved from ({want['x']}, {want['y']}, {want['size']}pt) "
+                            f"to ({got['x']}, {got['y']}, {got['size']}pt)")
+    return problems
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every permit template and check it against golden files.")
+    parser.add_argument("--update-golden", action="store_true", help="write current output as the golden files")
+    parser.add_argument("--repeat", type=int, default=3, help="timed renders per template")
+    parser.add_argument("--report", default=REPORT_FILE, help="where to write the JSON report")
+    parser.add_argument("--profile", action="store_true", help=f"print per-span timings and write {profiling.TRACE_FILE}")
+    parser.add_argument("scripts", nargs="*", help="only run these scripts")
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable()
+
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    today = datetime.date.today()
+    report = {"date": today.isoformat(), "templates": {}}
+    failed = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_workdir(workdir)
+        for script, answers in CASES.items():
+            if args.scripts and script not in args.scripts:
+                continue
+            data, timings, peak = benchmark(script, answers, workdir, args.repeat)
+            layout = mask_today(filled_layout(data, os.path.join(BASE_DIR, template_of(script))), today)
+
+            if args.update_golden:
+                with open(golden_path(script), "w", encoding="utf-8") as f:
+                    json.dump(layout, f, indent=1)
+                problems = []
+            elif os.path.isfile(golden_path(script)):
+                with open(golden_path(script), encoding="utf-8") as f:
+                    problems = compare_layout(json.load(f), layout)
+            else:
+                problems = ["no golden file (run with --update-golden)"]
+
+            failed = failed or bool(problems)
+            report["templates"][script] = {
+                "template": template_of(script),
+                "render_seconds": round(statistics.median(timings), 4),
+                "render_seconds_all": [round(t, 4) for t in timings],
+                "peak_memory_kb": round(peak / 1024),
+                "output_bytes": len(data),
+                "text_runs": len(layout),
+                "golden_ok": not problems,
+                "golden_problems": problems,
+            }
+            status = "OK  " if not problems else "FAIL"
+            print(f"{status} {script:28s} {statistics.median(timings) * 1000:7.1f} ms "
+                  f"{peak / 1024 / 1024:6.1f} MB peak {len(data) / 1024:6.0f} KB")
+            for problem in problems:
+                print(f"       {problem}")
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to '{args.report}'")
+    if args.profile:
+        report["profile"] = {name: {"calls": count, "total_seconds": round(total, 4)}
+                             for name, (count, total, _, _) in profiling.summary().items()}
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        profiling.report(os.path.join(BASE_DIR, profiling.TRACE_FILE))
+    sys.exit(1 if failed else 0)
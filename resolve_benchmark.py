@@ -0,0 +1,271 @@
+# -------------------------------
+# Township resolution benchmark: is every test address still resolved to the
+# right jurisdiction, and how fast?
+#
+#   python resolve_benchmark.py                                 Test addresses via the replay server
+#   python resolve_benchmark.py --offline                       same, straight from the fixtures (no HTTP)
+#   python resolve_benchmark.py --latency lognormal:120,0.5 --error-rate 0.02
+#   python resolve_benchmark.py --synthetic 10000 --workers 8   throughput on 10k jittered addresses
+#   python resolve_benchmark.py --base-url https://geocoding.geo.census.gov   the real thing
+#
+# Each address goes through the same steps as Permit_cost.py (geocode, override
+# polygons, then Census County Subdivision / Place) and the result is checked
+# against the label it has in "Test addresses.txt". Reports accuracy, p50/p95/p99
+# latency per address, HTTP calls per address and cache hit rates; results go to
+# resolve_report.json.
+# -------------------------------
+import argparse
+import concurrent.futures
+import json
+import ntpath
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+
+import Permit_cost
+import census_replay
+import geocode
+import metrics
+import profiling
+from address_parser import canonical_address
+
+# -------------------------------
+# Config
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_FILE = os.path.join(BASE_DIR, "resolve_report.json")
+POLYGONS = {name: os.path.join(BASE_DIR, ntpath.basename(path)) for name, path in Permit_cost.POLYGONS.items()}
+JITTER_DEGREES = 0.001  # about 100 m
+REPEAT_SHARE = 0.3      # share of synthetic addresses that retype an earlier one
+
+# Labels in "Test addresses.txt" that don't spell out their row in Permit_fee_check.txt
+LABEL_TOWNSHIPS = {
+    "east aurora": "aurora town",
+    "niagara falls (town)": "niagara town",
+}
+
+# -------------------------------
+# Expected answers
+# -------------------------------
+def expected_township(label, permit_data):
+    """The Permit_fee_check.txt row a test label stands for ("Lockport(city) smaller" -> "lockport city")."""
+    name = re.sub(r"\b(smaller|bigger)\b", "", label.lower()).strip()
+    name = re.sub(r"\s*\((city|town|village)\)", r" (\1)", name)
+    if name in LABEL_TOWNSHIPS:
+        return LABEL_TOWNSHIPS[name]
+    name = name.replace("(", "").replace(")", "")
+    for candidate in (name, name + " town", name + " city"):
+        if candidate in permit_data:
+            return candidate
+    return name
+
+# -------------------------------
+# Address sets
+# -------------------------------
+ABBREVIATIONS = [(r"\bRd\b", "Road"), (r"\bSt\b", "Street"), (r"\bAve\b", "Avenue"), (r"\bCt\b", "Court"),
+                 (r"\bCir\b", "Circle"), (r"\bN\b", "North"), (r"\bS\b", "South")]
+
+def retype(address, rng):
+    """The same address the way someone else might type it."""
+    style = rng.randrange(5)
+    if style == 0:
+        return address.upper()
+    if style == 1:
+        return address.replace(",", "")
+    if style == 2:
+        for pattern, full in ABBREVIATIONS:
+            address = re.sub(pattern, full, address)
+        return address
+    if style == 3:
+        street, rest = address.split(",", 1)
+        return f"{street} Apt {rng.randint(1, 9)},{rest}"
+    return re.sub(r"\s+\d{5}$", "", address)  # no ZIP
+
+def synthetic_set(entries, count, polygons, seed=0):
+    """
+    count jittered addresses built from the fixtures: a new house number and a point
+    nudged nearby (kept on the same side of every override polygon), plus retyped
+    repeats of earlier ones. Returns (fixture entries, [(label, address)]).
+    """
+    rng = random.Random(seed)
+    fixtures, cases, originals, used = [], [], [], set()
+    while len(cases) < count:
+        if originals and rng.random() < REPEAT_SHARE:
+            label, address = rng.choice(originals)
+            cases.append((label, retype(address, rng)))
+            continue
+        base = rng.choice(entries)
+        address = re.sub(r"^\d+", str(rng.randint(1, 9999)), base["address"])
+        if canonical_address(address) in used:
+            continue
+        used.add(canonical_address(address))
+        x = base["x"] + rng.uniform(-JITTER_DEGREES, JITTER_DEGREES)
+        y = base["y"] + rng.uniform(-JITTER_DEGREES, JITTER_DEGREES)
+        if Permit_cost.polygon_township(x, y, polygons) != Permit_cost.polygon_township(base["x"], base["y"], polygons):
+            x, y = base["x"], base["y"]
+        fixtures.append(dict(base, address=address, matched_address=address.upper(), x=x, y=y))
+        originals.append((base["label"], address))
+        cases.append((base["label"], address))
+    return fixtures, cases
+
+# -------------------------------
+# Resolution
+# -------------------------------
+class OfflineCensus:
+    """Answers straight from the fixture entries, for timing everything except HTTP."""
+    def __init__(self, entries):
+        self.by_address = {canonical_address(e["address"]): e for e in entries}
+        self.by_point = {census_replay.point_key(e["x"], e["y"]): e for e in entries}
+
+    def coordinates(self, address, quiet=False):
+        entry = self.by_address.get(canonical_address(address))
+        return (entry["x"], entry["y"]) if entry else (None, None)
+
+    def geographies(self, lon, lat, quiet=False):
+        entry = self.by_point.get(census_replay.point_key(lon, lat))
+        if entry is None:
+            return {}
+        layers = {"County Subdivisions": entry.get("county_subdivision"), "Places": entry.get("place")}
+        return {layer: [{"NAME": name}] for layer, name in layers.items() if name}
+
+def resolve(address, polygons, coordinates, geographies):
+    """(township, source, cache hits, cache lookups) the way Permit_cost.resolve_township gets there, without prompting."""
+    hits, lookups = 0, 1
+    key = canonical_address(address)
+    hits += key in geocode.coordinates_cache
+    lon, lat = coordinates(address, quiet=True)
+    if lon is None:
+        return None, "no geocode", hits, lookups
+    township = Permit_cost.polygon_township(lon, lat, polygons)
+    if township:
+        return township, "polygon", hits, lookups
+    lookups += 1
+    hits += (round(lon, 6), round(lat, 6)) in geocode.geographies_cache
+    found = geographies(lon, lat, quiet=True)
+    if found is None:
+        return None, "request failed", hits, lookups
+    township, source = Permit_cost.township_from_geographies(found)
+    return township, source, hits, lookups
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+def run(cases, polygons, permit_data, coordinates, geographies, workers=1):
+    """Resolve every (label, address); returns per-address results and the wall time."""
+    def one(case):
+        label, address = case
+        start = time.perf_counter()
+        township, source, hits, lookups = resolve(address, polygons, coordinates, geographies)
+        elapsed = time.perf_counter() - start
+        expected = expected_township(label, permit_data)
+        got = Permit_cost.normalize_township(township) if township else None
+        return {"label": label, "address": address, "expected": expected, "township": township,
+                "source": source, "correct": got == expected, "seconds": elapsed,
+                "cache_hits": hits, "cache_lookups": lookups}
+
+    started = time.perf_counter()
+    if workers > 1:
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(one, cases))
+    else:
+        results = [one(case) for case in cases]
+    return results, time.perf_counter() - started
+
+def summarize(results, wall, http_calls):
+    latencies = sorted(r["seconds"] for r in results)
+    n = len(results) or 1
+    lookups = sum(r["cache_lookups"] for r in results) or 1
+    return {
+        "addresses": len(results),
+        "correct": sum(r["correct"] for r in results),
+        "accuracy": round(sum(r["correct"] for r in results) / n, 4),
+        "unresolved": sum(1 for r in results if r["township"] is None),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "http_calls": http_calls,
+        "http_calls_per_address": round(http_calls / n, 3),
+        "cache_hit_rate": round(sum(r["cache_hits"] for r in results) / lookups, 4),
+        "wall_seconds": round(wall, 3),
+        "addresses_per_second": round(len(results) / wall, 1) if wall else None,
+    }
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time township resolution over the test addresses.")
+    parser.add_argument("--offline", action="store_true", help="answer from the fixtures directly, no HTTP")
+    parser.add_argument("--base-url", help="use this geocoder instead of starting the replay server")
+    parser.add_argument("--latency", default="0", help="replay server latency (see census_replay.py)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hedge", action="store_true", help="hedge slow Census calls (geocode.Hedger)")
+    parser.add_argument("--hedge-percentile", type=int, default=geocode.HEDGE_PERCENTILE)
+    parser.add_argument("--synthetic", type=int, default=0, help="use this many jittered addresses instead")
+    parser.add_argument("--workers", type=int, default=1, help="addresses resolved at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", default=REPORT_FILE)
+    args = parser.parse_args()
+
+    permit_data = Permit_cost.load_permit_data(os.path.join(BASE_DIR, "Permit_fee_check.txt"))
+    polygons = Permit_cost.load_polygons(POLYGONS)
+    entries = census_replay.load_fixtures()[0]
+    if args.synthetic:
+        entries, cases = synthetic_set(entries, args.synthetic, polygons, args.seed)
+    else:
+        cases = census_replay.read_test_addresses()
+
+    server = None
+    if args.offline:
+        offline = OfflineCensus(entries)
+        coordinates, geographies = offline.coordinates, offline.geographies
+        mode = "offline"
+    else:
+        if args.base_url:
+            geocode.set_base_url(args.base_url)
+            mode = args.base_url
+        else:
+            with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+                json.dump({"entries": entries}, f)
+            server = census_replay.start_replay(fixtures=f.name, latency=args.latency, error_rate=args.error_rate,
+                                                timeout_rate=args.timeout_rate, seed=args.seed)
+            os.remove(f.name)
+            geocode.set_base_url(server.base_url)
+            mode = f"replay ({args.latency} ms latency, {args.error_rate:.0%} errors, {args.timeout_rate:.0%} timeouts)"
+        coordinates, geographies = geocode.get_census_coordinates, geocode.get_census_geographies
+
+    if args.hedge:
+        geocode.enable_hedging(args.hedge_percentile)
+        mode += f", hedged at p{args.hedge_percentile}"
+    profiling.enable()  # HTTP calls are counted from the "census request" spans
+    results, wall = run(cases, polygons, permit_data, coordinates, geographies, args.workers)
+    http_calls = sum(1 for event in profiling.events if event[0] == "census request")
+    http_calls += sum(n for (_, outcome), n in metrics.HEDGES.values.items() if outcome != "capped")  # duplicates
+    if server is not None:
+        server.shutdown()
+
+    summary = summarize(results, wall, http_calls)
+    if not args.synthetic:
+        for r in results:
+            mark = "OK  " if r["correct"] else "FAIL"
+            print(f"{mark} {r['label']:32s} {str(r['township']):22s} {r['source']:20s} {r['seconds'] * 1000:7.1f} ms")
+    else:
+        for r in [r for r in results if not r["correct"]][:20]:
+            print(f"FAIL {r['label']:32s} {r['address']:45s} -> {r['township']} ({r['source']})")
+    print(f"\n Mode: {mode}, {args.workers} worker(s)")
+    print(f" Accuracy: {summary['correct']}/{summary['addresses']} ({summary['accuracy']:.1%}), {summary['unresolved']} unresolved")
+    print(f" Latency per address: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+    print(f" HTTP calls: {summary['http_calls']} ({summary['http_calls_per_address']} per address), "
+          f"cache hit rate {summary['cache_hit_rate']:.1%}")
+    print(f" {summary['addresses']} addresses in {summary['wall_seconds']} s ({summary['addresses_per_second']}/s)")
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump({"mode": mode, "workers": args.workers, "summary": summary,
+                   "misses": [r for r in results if not r["correct"]][:200]}, f, indent=2)
+    print(f" Report written to '{args.report}'")
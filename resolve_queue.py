@@ -0,0 +1,174 @@
+# -------------------------------
+# Offline-first lookups: when Census is down, don't stop and ask for the township.
+# Give a provisional answer from what we already know, queue the address (with its
+# job number) in permit_store.db, and let a background worker keep retrying Census
+# with backoff until it answers. Jobs whose final township differs from the
+# provisional one are reported, since their permit may be for the wrong town.
+#
+#   python resolve_queue.py status    what's waiting, and answers that changed
+#   python resolve_queue.py run       retry the queue now, until it's empty or Census fails again
+#   python resolve_queue.py report    list changed answers not yet reported, and mark them reported
+#
+# Provisional answers, best first:
+#   - the nearest known house number on the same street and ZIP (street_segments.py)
+#   - the township most addresses in the ZIP resolved to (zip_jurisdictions.json)
+#   - the city as written in the address, if the fee table has a township by that name
+# -------------------------------
+import random
+import threading
+import time
+
+import street_segments
+import zip_table
+from address_parser import parse_address, canonical_address
+
+# -------------------------------
+# Config
+# -------------------------------
+RETRY_BASE_SECONDS = 30        # first retry; doubled per failed attempt...
+RETRY_MAX_SECONDS = 30 * 60    # ...up to this
+IDLE_POLL_SECONDS = 15         # how often the worker checks an empty queue
+
+# Failures that mean Census may answer later; any other answer is final
+RETRYABLE = ("request failed", "out of time", "geocode failed")
+
+# -------------------------------
+# Provisional answers
+# -------------------------------
+def provisional_township(address, store, polygons_hash, known_townships=()):
+    """(township, how it was guessed) from data already on hand, or (None, None)."""
+    parsed = parse_address(address)
+    key = street_segments.segment_key(parsed)
+    if key is not None and store is not None:
+        street, zip_code, parity, number = key
+        nearby = street_segments.known_points(store, street, zip_code, parity, polygons_hash) + \
+            street_segments.known_points(store, street, zip_code, 1 - parity, polygons_hash)
+        if nearby:
+            nearest = min(nearby, key=lambda point: abs(point[0] - number))
+            return nearest[1], f"nearest known number on the street ({nearest[0]})"
+
+    table = zip_table.load_zip_table()
+    entry = table["zips"].get(parsed.zip) if table and table.get("polygons_hash") == polygons_hash else None
+    if entry and entry["townships"]:
+        township = max(entry["townships"], key=entry["townships"].get)
+        return township, f"most resolved addresses in ZIP {parsed.zip}"
+
+    city = " ".join(parsed.city.split()).lower()
+    if city:
+        for name in (city, f"{city} town", f"{city} city", f"{city} village"):
+            for township in known_townships:
+                if township.strip().lower() == name:
+                    return township, "city in the address"
+    return None, None
+
+def enqueue(store, job_number, address, provisional, source):
+    store.queue_lookup(job_number, address, canonical_address(address), provisional, source)
+
+def retry_delay(attempts):
+    """Seconds until the next try after this many failed attempts (with jitter so users don't retry in step)."""
+    return min(RETRY_BASE_SECONDS * (2 ** attempts), RETRY_MAX_SECONDS) * (0.75 + random.random() / 2)
+
+# -------------------------------
+# Retrying
+# -------------------------------
+def retry_due(store, resolver, limit=20):
+    """
+    One pass over the lookups that are due. resolver(address) -> (township, source), or
+    (None, reason) where a reason in RETRYABLE means Census is still unreachable.
+    Stops at the first retryable failure: if Census is down, the rest would fail too.
+    Returns (how many were resolved, seconds to back off if Census failed else None).
+    """
+    done = 0
+    for lookup_id, job_number, address, attempts in store.due_lookups(limit):
+        township, source = resolver(address)
+        if township is None and source in RETRYABLE:
+            delay = retry_delay(attempts)
+            store.retry_lookup_later(lookup_id, time.time() + delay, source)
+            return done, delay
+        store.finish_lookup(lookup_id, township, source)
+        done += 1
+    return done, None
+
+class RetryWorker(threading.Thread):
+    """Retries the queue in the background until stop() is called."""
+
+    def __init__(self, store, resolver):
+        super().__init__(name="lookup retry", daemon=True)
+        self.store = store
+        self.resolver = resolver
+        self.stopping = threading.Event()
+        self.resolved = 0
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                done, backoff = retry_due(self.store, self.resolver)
+                self.resolved += done
+                next_due = self.store.next_lookup_due()
+            except Exception as e:  # a locked or unreachable store must not kill the worker
+                print(f" Lookup retry failed: {e}")
+                backoff, next_due = None, None
+            if backoff is not None:
+                wait = backoff  # Census is still down; leave it alone for a while
+            elif next_due is None:
+                wait = IDLE_POLL_SECONDS
+            else:
+                wait = min(max(next_due - time.time(), 0), IDLE_POLL_SECONDS)
+            self.stopping.wait(wait)
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+# -------------------------------
+# Reporting
+# -------------------------------
+def report_changes(store, mark=True):
+    """Print jobs whose final township differs from the provisional one; returns how many."""
+    rows = store.changed_lookups()
+    for _, job_number, address, provisional, guess, final, final_source, resolved in rows:
+        if final is None:
+            print(f" Job {job_number or '?'} ({address}): provisional {provisional or '-'}, "
+                  f"Census still has no answer ({final_source}); check it by hand.")
+        else:
+            print(f" Job {job_number or '?'} ({address}): township is {final} ({final_source}), "
+                  f"not the provisional {provisional or '-'} ({guess or 'entered by hand'}); check its permit.")
+    if rows and mark:
+        store.mark_lookups_reported([row[0] for row in rows])
+    return len(rows)
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    import argparse
+    import Permit_cost
+    from geocode import use_store
+    from permit_store import PermitStore, polygons_hash
+
+    parser = argparse.ArgumentParser(description="Lookups queued while Census was unreachable.")
+    parser.add_argument("command", choices=["status", "run", "report"])
+    args = parser.parse_args()
+
+    store = PermitStore()
+    use_store(store)
+    if args.command == "status":
+        print(f" {store.pending_lookups()} lookup(s) waiting for Census.")
+        for _, job_number, address, provisional, guess, final, final_source, resolved in store.changed_lookups(False):
+            print(f" {resolved[:16]}  job {job_number or '?'}: {address}: {provisional or '-'} -> {final or '(no answer)'}")
+    elif args.command == "run":
+        polygons = Permit_cost.load_polygons(Permit_cost.POLYGONS)
+        resolver = Permit_cost.census_resolver(polygons, polygons_hash(polygons), store)
+        total = 0
+        while True:
+            done, backoff = retry_due(store, resolver)
+            total += done
+            if backoff is not None or not done:
+                break
+        print(f" Resolved {total}; {store.pending_lookups()} still waiting"
+              f"{' (Census is still not answering)' if backoff is not None else ''}.")
+        report_changes(store)
+    else:
+        if not report_changes(store):
+            print(" No changed answers to report.")
+    store.close()
@@ -0,0 +1,163 @@
+# -------------------------------
+# Street-segment cache: jobs cluster, so once several house numbers on one side of
+# a street are known to be in the same jurisdiction, the numbers between them are
+# answered without geocoding.
+#
+# Every resolved address with a lon/lat is remembered as a point: (street, ZIP,
+# odd/even side, house number) -> township, and whether it sits at least
+# MARGIN_DEGREES from every override polygon boundary, along with its lon/lat.
+# Neighbouring points that are clear of the boundaries, agree on the township, are
+# at most MAX_GAP numbers apart and have no boundary within MARGIN_DEGREES of the
+# line between them form a range (two clear points can still lie either side of a
+# small village polygon). A new number inside a range gets that township; a number
+# outside every range is looked up as usual. So ranges widen as lookups land
+# beyond their ends, and split where a point near a boundary or in another
+# township falls inside them.
+#
+#   python street_segments.py show ["main st"]   list the ranges
+#   python street_segments.py invalidate         forget points from old polygons
+#
+# Points are kept in permit_store.db with the polygon hash they were resolved
+# with; changing the override polygons invalidates them.
+# -------------------------------
+import bisect
+import re
+import threading
+
+from shapely.geometry import LineString, Point
+
+from address_parser import parse_address, canonical_street
+
+# -------------------------------
+# Config
+# -------------------------------
+MARGIN_DEGREES = 0.0015  # about 120-160 m from any override polygon boundary
+MAX_GAP = 100            # house numbers between two points for the range to span them
+
+HOUSE_NUMBER_RE = re.compile(r"^(\d+)[A-Z]?(?:-\d+)?\s+(.+)$")
+
+points = {}  # (polygons hash, street, zip, parity) -> sorted [(number, township, clear, lon, lat)]
+points_lock = threading.Lock()
+
+def segment_key(address):
+    """(street without the number, ZIP, 0 even / 1 odd, number), or None when there's no number or ZIP."""
+    parsed = parse_address(address) if isinstance(address, str) else address
+    match = HOUSE_NUMBER_RE.match(canonical_street(parsed.street))
+    if not match or not parsed.zip:
+        return None
+    number = int(match.group(1))
+    return match.group(2), parsed.zip, number % 2, number
+
+def boundary_margin(lon, lat, polygons):
+    """Distance (degrees) from the point to the nearest override polygon boundary."""
+    point = Point(lon, lat)
+    return min((geom.boundary.distance(point) for geom in polygons.values()), default=float("inf"))
+
+def segment_clear(below, above, polygons):
+    """The line between two points keeps MARGIN_DEGREES from every override polygon boundary."""
+    if below[3] is None or above[3] is None:
+        return False  # saved before points kept their lon/lat: look it up instead
+    line = LineString([(below[3], below[4]), (above[3], above[4])])
+    return all(geom.boundary.distance(line) >= MARGIN_DEGREES for geom in polygons.values())
+
+def known_points(store, street, zip_code, parity, polygons_hash):
+    key = (polygons_hash, street, zip_code, parity)
+    with points_lock:
+        if key in points:
+            return points[key]
+    loaded = store.get_street_points(street, zip_code, parity, polygons_hash)
+    with points_lock:
+        return points.setdefault(key, loaded)
+
+def ranges(side_points, polygons):
+    """[(low, high, township)]: runs of clear, agreeing points no more than MAX_GAP apart with clear lines between."""
+    runs = []
+    previous = None
+    for point in side_points:
+        number, township, clear = point[:3]
+        if not clear:
+            runs.append(None)  # splits whatever run it lands in
+        elif (runs and runs[-1] and runs[-1][2] == township and number - runs[-1][1] <= MAX_GAP
+              and segment_clear(previous, point, polygons)):
+            runs[-1] = (runs[-1][0], number, township)
+        else:
+            runs.append((number, number, township))
+        previous = point
+    return [run for run in runs if run]
+
+# -------------------------------
+# Lookup and record
+# -------------------------------
+def segment_township(address, store, polygons_hash, polygons):
+    """(township, (low, high)) if the house number falls inside a known range on its street, else (None, None)."""
+    key = segment_key(address)
+    if key is None or store is None:
+        return None, None
+    street, zip_code, parity, number = key
+    side = known_points(store, street, zip_code, parity, polygons_hash)
+    with points_lock:
+        # Only the two points either side of the number matter
+        i = bisect.bisect_left(side, (number,))
+        if i < len(side) and side[i][0] == number:
+            below = above = side[i]
+        elif 0 < i < len(side):
+            below, above = side[i - 1], side[i]
+        else:
+            return None, None
+    if not (below[2] and above[2]) or below[1] != above[1] or above[0] - below[0] > MAX_GAP:
+        return None, None
+    if below is not above and not segment_clear(below, above, polygons):
+        return None, None  # the street between them passes near a boundary
+    return below[1], (below[0], above[0])
+
+def record_point(address, township, lon, lat, polygons, store, polygons_hash):
+    """Remember a freshly resolved address (polygon or Census, never a guess or a manual entry)."""
+    key = segment_key(address)
+    if key is None or store is None or not township:
+        return
+    street, zip_code, parity, number = key
+    clear = boundary_margin(lon, lat, polygons) >= MARGIN_DEGREES
+    side = known_points(store, street, zip_code, parity, polygons_hash)
+    with points_lock:
+        i = bisect.bisect_left(side, (number,))
+        if i < len(side) and side[i][0] == number:
+            side[i] = (number, township, clear, lon, lat)
+        else:
+            side.insert(i, (number, township, clear, lon, lat))
+    store.put_street_point(street, zip_code, parity, number, township, clear, polygons_hash, lon, lat)
+
+def invalidate(store, polygons_hash):
+    """Drop points resolved with any other override polygons."""
+    with points_lock:
+        for key in [key for key in points if key[0] != polygons_hash]:
+            del points[key]
+    return store.drop_street_points(polygons_hash)
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    import argparse
+    import Permit_cost
+    from permit_store import PermitStore, polygons_hash as hash_polygons
+
+    parser = argparse.ArgumentParser(description="Show or invalidate the street-segment cache in permit_store.db.")
+    parser.add_argument("command", choices=["show", "invalidate"])
+    parser.add_argument("street", nargs="?", help="only streets containing this text")
+    args = parser.parse_args()
+
+    store = PermitStore()
+    polygons = Permit_cost.load_polygons(Permit_cost.POLYGONS)
+    current = hash_polygons(polygons)
+    if args.command == "invalidate":
+        print(f" Dropped {invalidate(store, current)} point(s) resolved with older polygons.")
+    else:
+        like = f"%{(args.street or '').upper()}%"
+        sides = store.connection().execute(
+            "SELECT DISTINCT street, zip, parity FROM street_points WHERE polygons_hash = ? AND street LIKE ? "
+            "ORDER BY street, zip, parity", (current, like)).fetchall()
+        for street, zip_code, parity in sides:
+            for low, high, township in ranges(known_points(store, street, zip_code, parity, current), polygons):
+                if low < high:
+                    print(f"{street}, {zip_code} ({'odd' if parity else 'even'}) {low}-{high}: {township}")
+    store.close()
@@ -0,0 +1,90 @@
+# -------------------------------
+# parse_address / canonical_address on the shapes of address the job exports hold:
+# units, directionals, spelled-out suffixes and addresses missing the ZIP or city.
+#
+#   python -m pytest -q test_address_parser.py
+# -------------------------------
+import json
+
+import pytest
+
+from address_parser import CORPUS_FILE, FIELDS, parse_address, canonical_address, canonical_prefix
+
+# input, (street, unit, city, state, zip), canonical key
+CASES = [
+    # units
+    ("12 Main Street Apt 4, Williamsville NY 14221",
+     ("12 Main Street", "Apt 4", "Williamsville", "NY", "14221"), "12 MAIN ST, WILLIAMSVILLE, NY"),
+    ("500 Elmwood Ave #3B, Buffalo, NY 14222",
+     ("500 Elmwood Ave", "#3B", "Buffalo", "NY", "14222"), "500 ELMWOOD AVE, BUFFALO, NY"),
+    ("45 Oak St Upper, Lockport, NY 14094",
+     ("45 Oak St", "Upper", "Lockport", "NY", "14094"), "45 OAK ST, LOCKPORT, NY"),
+    ("7 Pine Ct Suite 200, Amherst, NY 14228",
+     ("7 Pine Ct", "Suite 200", "Amherst", "NY", "14228"), "7 PINE CT, AMHERST, NY"),
+    ("3 Lake Shore Rd Lot 12, Angola, NY 14006",
+     ("3 Lake Shore Rd", "Lot 12", "Angola", "NY", "14006"), "3 LAKE SHORE RD, ANGOLA, NY"),
+    # directionals
+    ("69 N Cayuga Rd Apt 2, Williamsville, NY 14221",
+     ("69 N Cayuga Rd", "Apt 2", "Williamsville", "NY", "14221"), "69 N CAYUGA RD, WILLIAMSVILLE, NY"),
+    ("200 South Transit Road, Lockport, NY 14094",
+     ("200 South Transit Road", "", "Lockport", "NY", "14094"), "200 S TRANSIT RD, LOCKPORT, NY"),
+    ("12 West Ave, Lockport, NY 14094",  # West is the street's name here
+     ("12 West Ave", "", "Lockport", "NY", "14094"), "12 WEST AVE, LOCKPORT, NY"),
+    ("100 Main St E, Akron, NY 14001",
+     ("100 Main St E", "", "Akron", "NY", "14001"), "100 MAIN ST E, AKRON, NY"),
+    # suffixes, state and ZIP spellings
+    ("8 Maple Drive, Clarence, New York 14031",
+     ("8 Maple Drive", "", "Clarence", "NY", "14031"), "8 MAPLE DR, CLARENCE, NY"),
+    ("77 Sheridan Parkway, Tonawanda, NY 14150-1234",
+     ("77 Sheridan Parkway", "", "Tonawanda", "NY", "14150"), "77 SHERIDAN PKWY, TONAWANDA, NY"),
+    ("10 Park Blvd., Orchard Park, N.Y. 14127",
+     ("10 Park Blvd", "", "Orchard Park", "NY", "14127"), "10 PARK BLVD, ORCHARD PARK, NY"),
+    ("1 Niagara Falls Blvd, Amherst, NY 14226, USA",
+     ("1 Niagara Falls Blvd", "", "Amherst", "NY", "14226"), "1 NIAGARA FALLS BLVD, AMHERST, NY"),
+    # no ZIP, no state, no commas, no city
+    ("123 N. Forest Rd, Amherst, NY",
+     ("123 N. Forest Rd", "", "Amherst", "NY", ""), "123 N FOREST RD, AMHERST, NY"),
+    ("9 Harris Hill Rd, Lancaster",
+     ("9 Harris Hill Rd", "", "Lancaster", "", ""), "9 HARRIS HILL RD, LANCASTER, NY"),
+    ("69 North Cayuga Road Williamsville",
+     ("69 North Cayuga Road", "", "Williamsville", "", ""), "69 N CAYUGA RD, WILLIAMSVILLE, NY"),
+    ("5 Elm st 14221",  # the ZIP stands in for the missing city
+     ("5 Elm st", "", "", "", "14221"), "5 ELM ST, 14221, NY"),
+    ("", ("", "", "", "", ""), ""),
+]
+
+@pytest.mark.parametrize("text, parts, canonical", CASES, ids=[case[0] or "empty" for case in CASES])
+def test_parse_and_canonical(text, parts, canonical):
+    parsed = parse_address(text)
+    assert tuple(getattr(parsed, field) for field in FIELDS) == parts
+    assert canonical_address(text) == canonical
+
+def test_units_and_spellings_share_one_key():
+    assert len({canonical_address(text) for text in [
+        "69 N Cayuga Rd, Williamsville, NY 14221",
+        "69 North Cayuga Road Apt 2, Williamsville, NY 14221",
+        "69 n. cayuga rd #2, WILLIAMSVILLE, New York",
+        "69 North Cayuga Road Williamsville",
+    ]}) == 1
+
+def test_missing_zip_costs_confidence():
+    assert parse_address("33 Willow Lane, Clarence, NY 14031").confidence == 1.0
+    assert parse_address("33 Willow Lane, Clarence, NY").confidence == 0.8
+
+@pytest.mark.parametrize("typed, prefix", [
+    ("12 North Forest", "12 N FOREST"),
+    ("12 main ", "12 MAIN "),
+    ("12 Main Street, william", "12 MAIN ST, WILLIAM"),
+])
+def test_canonical_prefix(typed, prefix):
+    assert canonical_prefix(typed) == prefix
+
+with open(CORPUS_FILE, encoding="utf-8") as f:
+    CORPUS = json.load(f)
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["input"] for case in CORPUS])
+def test_corpus(case):
+    parsed = parse_address(case["input"])
+    assert {field: getattr(parsed, field) for field in FIELDS} == {field: case.get(field, "") for field in FIELDS}
+    if "canonical" in case:
+        assert canonical_address(case["input"]) == case["canonical"]
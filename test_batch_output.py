@@ -0,0 +1,71 @@
+# -------------------------------
+# --combined / --per-file: every permit of a batch appended to one PDF, or to a
+# series of PDFs that rolls over every N permits.
+#
+#   python -m pytest -q test_batch_output.py
+#
+# Townships are saved in a scratch store first, so nothing goes to Census.
+# -------------------------------
+import os
+
+from pdfrw import PdfReader
+
+import Permit_cost
+from address_parser import canonical_address
+from job_records import JobRecord
+from permit_pipeline import PermitPipeline
+from permit_store import PermitStore, polygons_hash
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Each job makes a Clarence permit and a cover sheet: six permits in all
+JOBS = [
+    JobRecord(customer_name=f"Customer {n}", job_address=f"{n}0 Main St, Clarence, NY 14031",
+              job_number=f"20{n:02d}", work_type="F")
+    for n in range(1, 4)
+]
+
+def run_batch(tmp_path, name, **options):
+    store = PermitStore(str(tmp_path / f"{name}.db"))
+    for job in JOBS:
+        store.put_township(canonical_address(job.job_address), polygons_hash({}), "Clarence town", "polygon")
+    store.flush()
+    try:
+        pipeline = PermitPipeline(str(tmp_path / name), Permit_cost.load_permit_data("Permit_fee_check.txt"), {},
+                                  store=store, **options)
+        results = pipeline.run(JOBS)
+    finally:
+        store.close()
+    assert [item["status"] for item in results] == ["ok"] * len(JOBS)
+    return results
+
+def pages(paths):
+    return sum(len(PdfReader(path).pages) for path in paths)
+
+def separate_pages(tmp_path):
+    """Pages in the batch when every permit is saved to its own file."""
+    files = [path for item in run_batch(tmp_path, "separate") for path in item["files"]]
+    assert len(files) == 2 * len(JOBS)
+    return pages(files)
+
+def test_combined_pdf_holds_every_page(tmp_path, monkeypatch):
+    monkeypatch.chdir(HERE)  # templates are found relative to the scripts
+    expected = separate_pages(tmp_path)
+    results = run_batch(tmp_path, "combined", combined="permits.pdf")
+
+    combined = str(tmp_path / "combined" / "permits.pdf")
+    assert all(item["files"] == [combined] for item in results)
+    assert sorted(os.listdir(tmp_path / "combined")) == ["permits.pdf"]
+    assert pages([combined]) == expected
+
+def test_per_file_rolls_over(tmp_path, monkeypatch):
+    monkeypatch.chdir(HERE)
+    expected = separate_pages(tmp_path)
+    results = run_batch(tmp_path, "rolling", combined="permits.pdf", per_file=4)
+
+    out_dir = tmp_path / "rolling"
+    assert sorted(os.listdir(out_dir)) == ["permits_001.pdf", "permits_002.pdf"]  # 4 permits, then the last 2
+    paths = [str(out_dir / name) for name in ("permits_001.pdf", "permits_002.pdf")]
+    assert pages(paths) == expected
+    assert pages(paths[:1]) == 2 * pages(paths[1:])  # two whole jobs, then the third
+    assert {path for item in results for path in item["files"]} == set(paths)
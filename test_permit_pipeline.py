@@ -0,0 +1,106 @@
+# -------------------------------
+# Re-running the pipeline reuses what the ledger says is unchanged and redoes the
+# rest: a changed job, fee table or template, or a permit file that went missing.
+#
+#   python -m pytest -q test_permit_pipeline.py
+#
+# Townships are saved in a scratch store first, so nothing goes to Census.
+# -------------------------------
+import copy
+import dataclasses
+import os
+import shutil
+
+import pytest
+
+import Clarence_permit
+import Permit_cost
+from address_parser import canonical_address
+from job_ledger import JobLedger
+from job_records import JobRecord
+from permit_pipeline import PermitPipeline, LEDGER_FILE
+from permit_store import PermitStore, polygons_hash
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PERMIT_DATA = Permit_cost.load_permit_data(os.path.join(HERE, "Permit_fee_check.txt"))
+
+# Same surname, same township: both jobs make a Clarence permit and a cover sheet
+JOBS = [
+    JobRecord(customer_name="John Smith", job_address="10 Main St, Clarence, NY 14031", job_number="1001", work_type="F"),
+    JobRecord(customer_name="Jane Smith", job_address="20 Main St, Clarence, NY 14031", job_number="1002", work_type="F"),
+]
+ALL_REUSED = ["resolve", "fee", "render"]
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(HERE)  # templates are found relative to the scripts
+    store = PermitStore(str(tmp_path / "permit_store.db"))
+    for job in JOBS:
+        store.put_township(canonical_address(job.job_address), polygons_hash({}), "Clarence town", "polygon")
+    store.flush()
+    yield store
+    store.close()
+
+def run_batch(out_dir, store, jobs=JOBS, permit_data=PERMIT_DATA):
+    os.makedirs(out_dir, exist_ok=True)
+    ledger = JobLedger(os.path.join(out_dir, LEDGER_FILE))
+    try:
+        return PermitPipeline(out_dir, permit_data, {}, ledger=ledger, store=store).run(jobs)
+    finally:
+        ledger.close()
+
+def test_second_unchanged_run_reuses_every_job(tmp_path, store):
+    out_dir = str(tmp_path / "out")
+    first = run_batch(out_dir, store)
+    second = run_batch(out_dir, store)
+
+    assert [item["status"] for item in first] == ["ok", "ok"]
+    files = [path for item in first for path in item["files"]]
+    assert len(files) == 4 and len(set(files)) == 4  # no job overwrote another's PDFs
+    assert [item["reused"] for item in second] == [ALL_REUSED] * 2
+    assert [item["files"] for item in second] == [item["files"] for item in first]
+
+def test_changed_job_is_rendered_again(tmp_path, store):
+    out_dir = str(tmp_path / "out")
+    first = run_batch(out_dir, store)
+    jobs = [dataclasses.replace(JOBS[0], job_description="Replace furnace and humidifier"), JOBS[1]]
+    second = run_batch(out_dir, store, jobs)
+
+    assert second[0]["hashes"]["render"] != first[0]["hashes"]["render"]
+    assert second[0]["hashes"]["resolve"] == first[0]["hashes"]["resolve"]
+    assert [item["reused"] for item in second] == [["resolve", "fee"], ALL_REUSED]
+
+def test_changed_fee_table_is_priced_and_rendered_again(tmp_path, store):
+    out_dir = str(tmp_path / "out")
+    first = run_batch(out_dir, store)
+    permit_data = copy.deepcopy(PERMIT_DATA)
+    permit_data["clarence town"]["Furnace_Cost"] = "125"
+    second = run_batch(out_dir, store, permit_data=permit_data)
+
+    assert [item["hashes"]["fee"] != before["hashes"]["fee"] for item, before in zip(second, first)] == [True, True]
+    assert [item["reused"] for item in second] == [["resolve"]] * 2
+    assert [item["quote"]["price"] for item in second] == [125.0] * 2
+
+def test_changed_template_is_rendered_again(tmp_path, store, monkeypatch):
+    template = str(tmp_path / "Clarence HVAC permit.pdf")
+    shutil.copyfile(os.path.join(HERE, Clarence_permit.TEMPLATE), template)
+    monkeypatch.setattr(Clarence_permit, "TEMPLATE", template)
+    out_dir = str(tmp_path / "out")
+    first = run_batch(out_dir, store)
+    with open(template, "ab") as f:
+        f.write(b"\n% revised form\n")
+    second = run_batch(out_dir, store)
+
+    assert [item["hashes"]["render"] != before["hashes"]["render"] for item, before in zip(second, first)] == [True, True]
+    assert [item["reused"] for item in second] == [["resolve", "fee"]] * 2
+
+def test_deleted_permit_is_rendered_again(tmp_path, store):
+    out_dir = str(tmp_path / "out")
+    first = run_batch(out_dir, store)
+    missing = first[1]["files"][0]
+    os.remove(missing)
+    second = run_batch(out_dir, store)
+
+    assert second[1]["hashes"]["render"] == first[1]["hashes"]["render"]  # same inputs, but the file is gone
+    assert [item["reused"] for item in second] == [ALL_REUSED, ["resolve", "fee"]]
+    assert os.path.exists(missing)
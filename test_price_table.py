@@ -0,0 +1,46 @@
+# -------------------------------
+# The precomputed price table gives exactly what compute_permit works out, for every
+# township in the fee sheet, every kind of work and costs across every $1000 bucket.
+#
+#   python -m pytest -q test_price_table.py
+# -------------------------------
+import copy
+import os
+
+import Permit_cost
+import price_table
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PERMIT_DATA = Permit_cost.load_permit_data(os.path.join(HERE, "Permit_fee_check.txt"))
+
+TOWNSHIPS = ([row["Township"].strip() for row in PERMIT_DATA.values()] + Permit_cost.SPECIAL_CALC_TOWNS
+             + ["Niagara Falls city", "NORTH TONAWANDA CITY", "  Amherst ", "Nowhere"])
+WORK = [("F", None), ("AC", None), ("AC", "N"), ("AC", "R"), ("AC", "x"), ("FAC", None), ("FAC", "N"),
+        ("FAC", "R"), ("B", None), ("X", None)]
+# No cost yet, either side of every bucket edge, past the end of the table and below zero
+COSTS = ([None, 0, 0.5, -5, -2500] + [edge + step for edge in range(1000, (price_table.MAX_BUCKET + 2) * 1000, 1000)
+                                      for step in (-0.01, 0, 0.01, 500)] + [250000])
+
+def test_table_matches_compute_permit_over_the_fee_sheet():
+    table = Permit_cost.price_table(PERMIT_DATA)
+    checked = 0
+    for township in TOWNSHIPS:
+        for work_type, ac_type in WORK:
+            for cost in COSTS:
+                expected = Permit_cost.compute_permit(township, work_type, PERMIT_DATA, ac_type, cost)
+                assert Permit_cost.calc_permit(township, work_type, PERMIT_DATA, ac_type, cost) == expected, \
+                    (township, work_type, ac_type, cost)
+                quote = table.quote(township, Permit_cost.normalize_township(township), work_type, ac_type, cost)
+                if quote is not None:
+                    assert quote == expected, (township, work_type, ac_type, cost)
+                    checked += 1
+    assert checked > len(PERMIT_DATA) * len(price_table.KINDS)  # most of these came from the table
+
+def test_edited_fee_sheet_rebuilds_the_table():
+    edited = copy.deepcopy(PERMIT_DATA)
+    key = next(key for key, row in edited.items() if Permit_cost.safe_float(row["Furnace_Cost"]))
+    edited[key]["Furnace_Cost"] = "12345"
+    township = edited[key]["Township"]
+
+    assert Permit_cost.calc_permit(township, "F", edited)["price"] == 12345.0
+    assert Permit_cost.calc_permit(township, "F", PERMIT_DATA) == Permit_cost.compute_permit(township, "F", PERMIT_DATA)
@@ -0,0 +1,77 @@
+# -------------------------------
+# Street ranges: a number between two clear points is only answered from them when
+# the street between the points stays clear of every override polygon.
+#
+#   python -m pytest -q test_street_segments.py
+# -------------------------------
+import sqlite3
+
+from shapely.geometry import box
+
+import street_segments
+from permit_store import PermitStore, polygons_hash
+
+# A small village on Main St, with the town on both sides of it
+POLYGONS = {"Williamsville village": box(-78.70, 42.95, -78.69, 42.96)}
+WEST = (-78.71, 42.955)   # 0.01 degrees outside the village
+EAST = (-78.68, 42.955)
+NORTH = (-78.695, 42.97)  # same distance out, but north of it
+
+def record(store, number, lon_lat):
+    street_segments.record_point(f"{number} Main St, Amherst, NY 14221", "Amherst town", *lon_lat,
+                                 POLYGONS, store, polygons_hash(POLYGONS))
+
+def lookup(store, number):
+    return street_segments.segment_township(f"{number} Main St, Amherst, NY 14221", store,
+                                            polygons_hash(POLYGONS), POLYGONS)
+
+def test_range_across_a_polygon_is_not_trusted(tmp_path, monkeypatch):
+    monkeypatch.setattr(street_segments, "points", {})
+    store = PermitStore(str(tmp_path / "permit_store.db"))
+    try:
+        record(store, 10, WEST)
+        record(store, 60, EAST)
+        assert lookup(store, 30) == (None, None)  # both ends clear, but the village lies between them
+        record(store, 80, (EAST[0] + 0.005, EAST[1]))
+        assert lookup(store, 70) == ("Amherst town", (60, 80))
+        assert [run[:2] for run in street_segments.ranges(
+            street_segments.known_points(store, "MAIN ST", "14221", 0, polygons_hash(POLYGONS)), POLYGONS)] == \
+            [(10, 10), (60, 80)]
+    finally:
+        store.close()
+
+def test_points_keep_their_location(tmp_path, monkeypatch):
+    monkeypatch.setattr(street_segments, "points", {})
+    path = str(tmp_path / "permit_store.db")
+    store = PermitStore(path)
+    try:
+        record(store, 10, WEST)
+        record(store, 30, NORTH)
+        store.flush()
+    finally:
+        store.close()
+
+    monkeypatch.setattr(street_segments, "points", {})  # as a fresh run would load them
+    store = PermitStore(path)
+    try:
+        assert lookup(store, 20) == ("Amherst town", (10, 30))
+    finally:
+        store.close()
+
+def test_points_saved_without_a_location_are_not_trusted(tmp_path, monkeypatch):
+    monkeypatch.setattr(street_segments, "points", {})
+    path = str(tmp_path / "permit_store.db")
+    conn = sqlite3.connect(path)  # a database from before points kept their lon/lat
+    conn.execute("CREATE TABLE street_points (street TEXT, zip TEXT, parity INTEGER, number INTEGER, township TEXT, "
+                 "clear INTEGER, polygons_hash TEXT, resolved TEXT, PRIMARY KEY (street, zip, parity, number))")
+    conn.executemany("INSERT INTO street_points VALUES ('MAIN ST', '14221', 0, ?, 'Amherst town', 1, ?, '')",
+                     [(10, polygons_hash(POLYGONS)), (30, polygons_hash(POLYGONS))])
+    conn.commit()
+    conn.close()
+
+    store = PermitStore(path)
+    try:
+        assert lookup(store, 20) == (None, None)
+        assert lookup(store, 30) == ("Amherst town", (30, 30))  # a clear point still answers its own number
+    finally:
+        store.close()
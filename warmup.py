@@ -0,0 +1,49 @@
+# -------------------------------
+# Startup warm-up: the slow loading (fee table, polygons, permit template, the
+# signature image, the first connection to Census) runs on background threads
+# as soon as a script starts, so the first question shows straight away and the
+# loading happens while it is being answered.
+#
+#   warmup.start("fee table", load_permit_data, PERMIT_FILE)
+#   ...prompt...
+#   permit_data = warmup.get("fee table")    # waits only if it isn't done yet
+#
+# An error in a warm-up task comes out of get(), where the script would have hit
+# it anyway.
+# -------------------------------
+import concurrent.futures
+
+import form_fill
+import geocode
+
+pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="warm-up")
+tasks = {}  # name -> Future
+
+def start(name, func, *args, **kwargs):
+    tasks[name] = pool.submit(func, *args, **kwargs)
+    return tasks[name]
+
+def get(name):
+    return tasks.pop(name).result()
+
+def prepare_template(path):
+    """Parse a permit template now; the next form_fill.load_template(path) gets this copy."""
+    form_fill.parsed_ahead[path] = start(f"template {path}", form_fill.parse_template, path)
+
+def prepare_signature(path):
+    """Read and decode a signature image now (a missing file is reported when the permit is drawn)."""
+    def decode():
+        try:
+            form_fill.signature_image(path)
+        except Exception:
+            pass
+    start(f"signature {path}", decode)
+
+def prepare_census():
+    start("census connection", geocode.warm_connection)
+
+def prepare_permit(template, signature=None):
+    """A permit script's template and signature, ready by the time the questions are answered."""
+    prepare_template(template)
+    if signature:
+        prepare_signature(signature)
@@ -1,148 +1,87 @@
 import os
-import re
 from datetime import datetime
-from pdfrw import PdfReader, PdfWriter, PageMerge
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
-import io
+from pdf_output import finish_pdf
+from form_fill import fill_template, load_template, signature_image
+from job_records import iter_job_records
+from warmup import prepare_permit
+from address_parser import parse_address
 
 TEMPLATE = "Williamsville HVAC permit.pdf"
 INPUT = "Customer_data.txt"
 SIGNATURE = "signature.png"
 
-# --- Read Customer Data ---
-with open(INPUT, "r") as f:
-    lines = [line.strip() for line in f if line.strip()]
-
-# Customer info
-customer_name = lines[0]
-
-# Street address (number + street only)
-street_address_full = lines[1].split(",")[0].strip()
-
-# Check for second address line (if exists at end of file)
-second_address = ""
-if len(lines) > 6:
-    second_address = lines[-1].strip()
-
-# Phone number format XXX XXX-XXXX
-phone_number_raw = lines[2].replace("(", "").replace(")", "").replace(" ", "")
-phone_number = f"{phone_number_raw[:3]} {phone_number_raw[3:]}"  # keeps dash intact
-
-# Date of job (from file)
-date_of_job = lines[4]  # MM/DD/YYYY
-
 # --- Prompts ---
-estimated_cost = input("Enter estimated cost: ")
-
-heat_check = input("Repair/replace heating? (y/n): ").strip().lower() == "y"
-ac_check = input("Doing AC work? (y/n): ").strip().lower() == "y"
-
-ac_new = ac_replace = False
-if ac_check:
-    ac_type = input("Is it new or replacement AC? (new/replace): ").strip().lower()
-    ac_new = ac_type == "new"
-    ac_replace = ac_type == "replace"
-
-# Today's date (MM/DD/YY)
-today = datetime.now().strftime("%m/%d/%y")
-
-# --- Load template for page size ---
-template_pdf = PdfReader(TEMPLATE)
-page0 = template_pdf.pages[0]
-try:
-    llx = float(page0.MediaBox[0])
-    lly = float(page0.MediaBox[1])
-    urx = float(page0.MediaBox[2])
-    ury = float(page0.MediaBox[3])
-    page_width_pts = urx - llx
-    page_height_pts = ury - lly
-except Exception:
-    page_width_pts, page_height_pts = letter
-
-def to_points_top_origin(x_in_inches, y_in_inches):
-    x_pts = x_in_inches * 72.0
-    y_pts_from_top = y_in_inches * 72.0
-    y_pts = page_height_pts - y_pts_from_top
-    return x_pts, y_pts
-
-# --- Create overlay PDF ---
-packet = io.BytesIO()
-c = canvas.Canvas(packet, pagesize=(page_width_pts, page_height_pts))
-c.setFont("Helvetica", 10)
-
-# Draw text fields
-c.drawString(*to_points_top_origin(1.65, 2.71), street_address_full)
-c.drawString(*to_points_top_origin(1.52, 4.03), estimated_cost)
-c.drawString(*to_points_top_origin(1.02, 4.72), customer_name)
-
-# Second address or same as job address
-if second_address:
-    c.drawString(*to_points_top_origin(1.14, 5.00), second_address)
-else:
-    c.drawString(*to_points_top_origin(1.14, 5.00), street_address_full)
-
-# Phone number
-c.drawString(*to_points_top_origin(5.78, 4.68), phone_number)
-
-# Job date
-c.drawString(*to_points_top_origin(1.96, 6.49), date_of_job)
-
-# Today's date
-c.drawString(*to_points_top_origin(6.46, 9.00), today)
-
-# Draw signature
-try:
-    sig = ImageReader(SIGNATURE)
-    c.drawImage(sig, *to_points_top_origin(1.84, 9.36), width=100, height=50, mask='auto')
-except Exception as e:
-    print(f"⚠️ Could not add signature image: {e}")
-
-# --- Checkboxes ---
-checkbox_size = 8
-
-# Always checked box
-c.rect(*to_points_top_origin(2.53, 5.47), checkbox_size, checkbox_size, fill=1)
-
-if heat_check:
-    c.rect(*to_points_top_origin(5.02, 5.93), checkbox_size, checkbox_size, fill=1)
-if ac_new:
-    c.rect(*to_points_top_origin(2.51, 6.20), checkbox_size, checkbox_size, fill=1)
-if ac_replace:
-    c.rect(*to_points_top_origin(5.02, 6.20), checkbox_size, checkbox_size, fill=1)
-
-c.save()
-packet.seek(0)
-overlay_pdf = PdfReader(packet)
-
-# --- Merge overlay onto template ---
-for page, overlay in zip(template_pdf.pages, overlay_pdf.pages):
-    merger = PageMerge(page)
-    merger.add(overlay).render()
+def ask_questions(job):
+    answers = {"estimated_cost": job.estimated_cost or input("Enter estimated cost: ")}
+
+    answers["heat_check"] = input("Repair/replace heating? (y/n): ").strip().lower() == "y"
+    ac_check = input("Doing AC work? (y/n): ").strip().lower() == "y"
+
+    answers["ac_new"] = answers["ac_replace"] = False
+    if ac_check:
+        ac_type = input("Is it new or replacement AC? (new/replace): ").strip().lower()
+        answers["ac_new"] = ac_type == "new"
+        answers["ac_replace"] = ac_type == "replace"
+    return answers
+
+# --- Answers for unattended (pipeline) runs ---
+def batch_answers(job, quote):
+    doing_ac = job.work_type in ["AC", "FAC"]
+    return {
+        "estimated_cost": job.estimated_cost,
+        "heat_check": job.work_type in ["F", "FAC", "B"],
+        "ac_new": doing_ac and job.ac_type == "N",
+        "ac_replace": doing_ac and job.ac_type == "R",
+    }
+
+# --- Fill the permit for one job ---
+def build_permit(job, answers, template_pdf=None):
+    # Street address (number + street only)
+    street_address_full = parse_address(job.job_address).street_line
+
+    # Phone number format XXX XXX-XXXX
+    phone_number_raw = job.phone.replace("(", "").replace(")", "").replace(" ", "")
+    phone_number = f"{phone_number_raw[:3]} {phone_number_raw[3:]}"  # keeps dash intact
+
+    # Today's date (MM/DD/YY)
+    today = datetime.now().strftime("%m/%d/%y")
+
+    # --- Form fields: name -> (value, x, y) with x/y in inches (overlay fallback only) ---
+    text_fields = {
+        "Jobsite Location": (street_address_full, 1.65, 2.71),
+        "Estimated Cost": (answers["estimated_cost"], 1.52, 4.03),
+        "Name_2": (job.customer_name, 1.02, 4.72),
+        # Second address or same as job address
+        "Address_2": (job.secondary_address or street_address_full, 1.14, 5.00),
+        "Phone_2": (phone_number, 5.78, 4.68),
+        "Date Work Will Begin": (job.install_date, 1.96, 6.49),  # MM/DD/YYYY
+        "Date": (today, 6.46, 9.00),
+    }
+    checkboxes = {
+        "Residential": (True, 2.53, 5.47),  # Always checked box
+        "Repair or Replace Heating Equipment": (answers["heat_check"], 5.02, 5.93),
+        "New AC Equipment Install": (answers["ac_new"], 2.51, 6.20),
+        "Repair or Replace AC Equipment": (answers["ac_replace"], 5.02, 6.20),
+    }
+
+    def draw_signature(c, to_points_top_origin):
+        try:
+            sig = signature_image(SIGNATURE)
+            c.drawImage(sig, *to_points_top_origin(1.84, 9.36), width=100, height=50, mask='auto')
+        except Exception as e:
+            print(f"⚠️ Could not add signature image: {e}")
+
+    # --- Fill template ---
+    template_pdf = template_pdf or load_template(TEMPLATE)
+    fill_template(template_pdf, text_fields, checkboxes, font_size=10, draw_extra=draw_signature)
+    return template_pdf
 
 # --- Output File ---
-customer_last_name = customer_name.split()[-1]
-output_filename = f"{customer_last_name} Williamsville permit.pdf"
-PdfWriter().write(output_filename, template_pdf)
-print(f"✅ PDF created and saved as '{output_filename}'")
-
-# --- Ask to print ---
-print_now = input("Do you want to print this PDF? (y/n): ").strip().lower()
-if print_now == "y":
-    os.startfile(output_filename, "print")
-    print("📄 Sent to printer.")
-else:
-    print("❌ Printing skipped. You can review or fix the PDF.")
-
-# --- Ask to delete the PDF ---
-delete_pdf = input(f"Do you want to delete '{output_filename}'? (y/n): ").strip().lower()
-if delete_pdf == "y":
-    try:
-        os.remove(output_filename)
-        print(f"🗑️ '{output_filename}' deleted.")
-    except Exception as e:
-        print(f"⚠️ Could not delete file: {e}")
-else:
-    print(f"✅ '{output_filename}' kept.")
-    print(f"✅ '{output_filename}' kept.")
+def output_path(job):
+    return f"{job.last_name} Williamsville permit.pdf"
+
+if __name__ == "__main__":
+    prepare_permit(TEMPLATE, SIGNATURE)  # loads in the background while the questions are answered
+    for job in iter_job_records(INPUT):
+        answers = ask_questions(job)
+        finish_pdf(build_permit(job, answers), output_path(job))
@@ -0,0 +1,171 @@
+# -------------------------------
+# ZIP fast path: ZIP codes that lie wholly inside one jurisdiction resolve
+# straight from the ZIP, with no geocoding or polygon work.
+#
+#   python zip_table.py build                      rebuild zip_jurisdictions.json from permit_store.db
+#   python zip_table.py build --zcta zcta.geojson  ...also checking real ZIP (ZCTA) boundaries
+#   python zip_table.py show                       list the table
+#
+# A ZIP only counts as unambiguous when the evidence says so:
+#   - every address resolved in it (permit_store.db history) came out the same, and
+#     there are at least MIN_OBSERVATIONS of them (MIN_OBSERVATIONS_WITH_ZCTA with boundaries)
+#   - no override polygon touches it: its ZCTA boundary when one is given, otherwise
+#     the area around the addresses seen in it (buffered by NEARBY_DEGREES)
+#   - it isn't in KNOWN_AMBIGUOUS
+# Anything else goes through full resolution. The table remembers the polygon hash it
+# was built with and is ignored once the override polygons change.
+# -------------------------------
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+
+from shapely.geometry import MultiPoint, shape
+
+from address_parser import parse_address
+
+# -------------------------------
+# Config
+# -------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ZIP_TABLE_FILE = os.path.join(BASE_DIR, "zip_jurisdictions.json")
+MIN_OBSERVATIONS = 25           # agreeing addresses needed when there are no ZIP boundaries
+MIN_OBSERVATIONS_WITH_ZCTA = 5
+NEARBY_DEGREES = 0.01           # about 1 km around the seen addresses
+
+# Split between jurisdictions no matter what the history shows
+KNOWN_AMBIGUOUS = {
+    "14094": "Lockport city, Lockport town and Pendleton",
+    "14127": "Orchard Park town and village",
+    "14150": "Tonawanda city and town",
+    "14120": "North Tonawanda city, Wheatfield and Pendleton",
+}
+
+# -------------------------------
+# Building
+# -------------------------------
+def observations(store_path, polygons_hash):
+    """ZIP -> [(lon, lat, township)] from addresses geocoded and resolved (polygon or Census) with the current polygons."""
+    conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT g.query, g.lon, g.lat, t.township FROM townships t JOIN geocodes g USING (address_key) "
+            "WHERE t.polygons_hash = ? AND (t.source = 'polygon' OR t.source LIKE 'Census%')",
+            (polygons_hash,)).fetchall()
+    finally:
+        conn.close()
+    by_zip = {}
+    for query, lon, lat, township in rows:
+        zip_code = parse_address(query).zip
+        if zip_code and township:
+            by_zip.setdefault(zip_code, []).append((lon, lat, township))
+    return by_zip
+
+def load_zcta(path):
+    """ZIP -> boundary from a ZCTA GeoJSON (Census ZCTA5 features, ZCTA5CE20/ZCTA5CE10/ZIP property)."""
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    zctas = {}
+    for feature in features:
+        props = feature.get("properties") or {}
+        zip_code = props.get("ZCTA5CE20") or props.get("ZCTA5CE10") or props.get("ZIP")
+        if zip_code:
+            zctas[str(zip_code)] = shape(feature["geometry"])
+    return zctas
+
+def classify(zip_code, points, polygons, zcta=None):
+    """The table entry for one ZIP."""
+    townships = {}
+    for _, _, township in points:
+        townships[township] = townships.get(township, 0) + 1
+    entry = {"townships": townships, "observed": len(points), "ambiguous": True}
+
+    if zip_code in KNOWN_AMBIGUOUS:
+        entry["why"] = f"known split: {KNOWN_AMBIGUOUS[zip_code]}"
+        return entry
+    if len(townships) > 1:
+        entry["why"] = "addresses in it resolved to different townships"
+        return entry
+    needed = MIN_OBSERVATIONS if zcta is None else MIN_OBSERVATIONS_WITH_ZCTA
+    if len(points) < needed:
+        entry["why"] = f"only {len(points)} resolved addresses (need {needed})"
+        return entry
+    area = zcta if zcta is not None else MultiPoint([(lon, lat) for lon, lat, _ in points]).convex_hull.buffer(NEARBY_DEGREES)
+    touching = [name for name, geom in polygons.items() if geom.intersects(area)]
+    # A ZIP wholly inside one override polygon (a village with its own ZIP) is still unambiguous
+    if touching and not (len(touching) == 1 and zcta is not None and polygons[touching[0]].contains(zcta)
+                         and touching[0] in townships):
+        entry["why"] = f"overlaps override polygon {', '.join(touching)}"
+        return entry
+
+    entry["ambiguous"] = False
+    entry["township"] = next(iter(townships))
+    return entry
+
+def build_zip_table(store_path, polygons, polygons_hash, zcta_path=None):
+    by_zip = observations(store_path, polygons_hash)
+    zctas = load_zcta(zcta_path) if zcta_path else {}
+    zips = {}
+    for zip_code in sorted(set(by_zip) | set(KNOWN_AMBIGUOUS)):
+        zips[zip_code] = classify(zip_code, by_zip.get(zip_code, []), polygons, zctas.get(zip_code))
+    return {"built": datetime.datetime.now().isoformat(timespec="seconds"), "polygons_hash": polygons_hash,
+            "zcta": os.path.basename(zcta_path) if zcta_path else None, "zips": zips}
+
+# -------------------------------
+# Lookup
+# -------------------------------
+loaded = {}  # path -> (file mtime, table)
+
+def load_zip_table(path=ZIP_TABLE_FILE):
+    """The table, re-read only when the file changes; None if there isn't one."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if path not in loaded or loaded[path][0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            loaded[path] = (mtime, json.load(f))
+    return loaded[path][1]
+
+def zip_township(address, polygons_hash, path=ZIP_TABLE_FILE):
+    """(township, ZIP) if the address's ZIP lies wholly inside one jurisdiction, else (None, ZIP)."""
+    zip_code = parse_address(address).zip if isinstance(address, str) else address.zip
+    table = load_zip_table(path)
+    if not zip_code or table is None or table.get("polygons_hash") != polygons_hash:
+        return None, zip_code
+    entry = table["zips"].get(zip_code)
+    if entry is None or entry["ambiguous"]:
+        return None, zip_code
+    return entry["township"], zip_code
+
+# -------------------------------
+# Main
+# -------------------------------
+if __name__ == "__main__":
+    import Permit_cost
+    from permit_store import DEFAULT_PATH, polygons_hash
+
+    parser = argparse.ArgumentParser(description="Build or show the ZIP -> jurisdiction fast-path table.")
+    parser.add_argument("command", choices=["build", "show"])
+    parser.add_argument("--store", default=DEFAULT_PATH, help="permit_store.db with resolved addresses")
+    parser.add_argument("--zcta", help="ZCTA (ZIP boundary) GeoJSON to check polygons against")
+    parser.add_argument("--out", default=ZIP_TABLE_FILE)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        polygons = Permit_cost.load_polygons(Permit_cost.POLYGONS)
+        table = build_zip_table(args.store, polygons, polygons_hash(polygons), args.zcta)
+        with open(args.out + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(table, f, indent=1)
+        os.replace(args.out + ".tmp", args.out)
+        fast = sum(1 for entry in table["zips"].values() if not entry["ambiguous"])
+        print(f" {len(table['zips'])} ZIPs, {fast} resolve straight from the ZIP; written to '{args.out}'")
+    else:
+        table = load_zip_table(args.out)
+        if table is None:
+            print(f" No table at '{args.out}'; run: python zip_table.py build")
+        else:
+            for zip_code, entry in table["zips"].items():
+                answer = entry.get("township") or "full lookup"
+                print(f"{zip_code}  {answer:22s} {entry['observed']:5d} seen  {entry.get('why', '')}")